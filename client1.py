@@ -820,6 +820,7 @@ def parse_user_query(query: str, available_tools: dict) -> dict:
     "   - 'update product', 'change product price', 'modify product'\n"
     "   - 'delete product', 'remove product', 'delete [ProductName]'\n"
     "   - Any query primarily about products, pricing, or inventory\n"
+    "   - 'check product cache', 'verify products sync' → 'operation': 'check_consistency' (add 'repair': true to fix)\n"
     "\n"
     "2. **CUSTOMER QUERIES** → Use 'sqlserver_crud':\n"
     "   - 'list customers', 'show customers', 'display customers'\n"
@@ -828,6 +829,7 @@ def parse_user_query(query: str, available_tools: dict) -> dict:
     "   - 'update customer', 'change customer email', 'modify customer'\n"
     "   - 'delete customer', 'remove customer', 'delete [CustomerName]'\n"
     "   - Any query primarily about customers, names, or emails\n"
+    "   - 'find duplicate customers', 'dedupe customers' → 'operation': 'dedupe' (add 'merge': true to merge them)\n"
     "\n"
     "3. **SALES/TRANSACTION QUERIES** → Use 'sales_crud':\n"
     "   - 'list sales', 'show sales', 'sales data', 'transactions'\n"
@@ -854,8 +856,14 @@ def parse_user_query(query: str, available_tools: dict) -> dict:
     "   - 'top issue categories', 'service quality metrics'\n"
     "   - Use 'operation': 'analyze' for analytical reports\n"
     "   - Use 'operation': 'read' for raw call log data\n"
+    "   - Use 'operation': 'fetch_transcript' with 'log_id' for one call's full transcript\n"
+    "   - Use 'operation': 'customer_history' with 'customer_name' or 'customer_id' for one customer's calls\n"
     "   - Any query related to call logs, agent performance, or customer service metrics\n\n"
 
+    "6. **FULL CUSTOMER PICTURE** → Use 'customer_360' with action 'read':\n"
+    "   - 'everything about Alice Johnson', 'customer overview', 'profile with purchases and calls'\n"
+    "   - Args: 'customer_name' or 'customer_id'\n\n"
+
     "**ENHANCED CARE PLAN FIELD MAPPING:**\n"
     "The CarePlan table now includes comprehensive real-world fields:\n"
     "- Base: 'actual_release_date', 'name_of_youth', 'race_ethnicity', 'medi_cal_id_number'\n"
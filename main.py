@@ -1,9 +1,30 @@
+import io
 import os
+import re
+import csv
+import json
+import math
+import mmap
+import time
+import uuid
+import heapq
+import queue
+import bisect
+import hashlib
+import sqlite3
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
 import pyodbc
 import psycopg2
 from typing import Any, Optional
 import random
 import pandas as pd
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastmcp import FastMCP
 import mysql.connector
@@ -24,18 +45,96 @@ MYSQL_PORT = int(must_get("MYSQL_PORT"))
 MYSQL_USER = must_get("MYSQL_USER")
 MYSQL_PASSWORD = must_get("MYSQL_PASSWORD")
 MYSQL_DB = must_get("MYSQL_DB")
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "8"))
+
+mysql_pools = {}
+mysql_pool_lock = threading.Lock()
+
+# Per-call routing: tools wrapped by route_reads() set the replica (host, port) each backend's
+# connections should use for this call; None means the primary.
+read_replicas = contextvars.ContextVar("read_replicas", default={})
+# Set by a transactional batch: every get_mysql_conn() for the default database in that call
+# returns this connection, so all steps share one transaction.
+pinned_mysql = contextvars.ContextVar("pinned_mysql", default=None)
+# Set by cached_tool around a tool call it may cache; route_reads records the replicas it
+# chose there so the cache can tell whether the result came from a replica.
+read_route = contextvars.ContextVar("read_route", default=None)
 
 
 def get_mysql_conn(db: str | None = MYSQL_DB):
-    return mysql.connector.connect(
-        host=MYSQL_HOST,
-        port=MYSQL_PORT,
+    pinned = pinned_mysql.get()
+    if pinned is not None and db == MYSQL_DB:
+        return pinned
+    replica = read_replicas.get().get("mysql")
+    if replica:
+        try:
+            return connect_mysql(db, *replica)
+        except mysql.connector.Error:
+            replica_sets["mysql"].mark_down(replica)
+    return connect_mysql(db, MYSQL_HOST, MYSQL_PORT)
+
+
+class PinnedConnection:
+    # Tool code keeps calling commit()/close() and issuing START TRANSACTION/COMMIT; on the
+    # pinned connection those are no-ops so only the batch decides the outcome. Rollbacks pass
+    # through, since a failing step fails the whole batch anyway.
+    IGNORED_STATEMENTS = {"START TRANSACTION", "BEGIN", "COMMIT"}
+
+    def __init__(self, cnxn):
+        self.cnxn = cnxn
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("buffered", True)
+        return PinnedCursor(self.cnxn.cursor(*args, **kwargs))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.cnxn, name)
+
+
+class PinnedCursor:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        if operation.strip().rstrip(";").upper() in PinnedConnection.IGNORED_STATEMENTS:
+            return None
+        return self.cur.execute(operation, params, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self.cur)
+
+    def __getattr__(self, name):
+        return getattr(self.cur, name)
+
+
+def connect_mysql(db: str | None, host: str, port: int):
+    # Connections to the default database come from a shared pool per host (close() hands them
+    # back); another database, a disabled pool or an exhausted one gets a direct connection.
+    settings = dict(
+        host=host,
+        port=port,
         user=MYSQL_USER,
         password=MYSQL_PASSWORD,
         database=db,
         ssl_disabled=False,
         autocommit=True,
     )
+    if db == MYSQL_DB and MYSQL_POOL_SIZE > 0:
+        try:
+            with mysql_pool_lock:
+                if (host, port) not in mysql_pools:
+                    mysql_pools[(host, port)] = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name=f"crud-{host}-{port}"[:64], pool_size=MYSQL_POOL_SIZE, **settings)
+            return mysql_pools[(host, port)].get_connection()
+        except mysql.connector.errors.PoolError:
+            pass
+    return mysql.connector.connect(**settings)
 
 
 PG_HOST = must_get("PG_HOST")
@@ -46,9 +145,19 @@ PG_PASS = must_get("PG_PASSWORD")
 
 
 def get_pg_conn():
+    replica = read_replicas.get().get("pg")
+    if replica:
+        try:
+            return connect_pg(*replica)
+        except psycopg2.OperationalError:
+            replica_sets["pg"].mark_down(replica)
+    return connect_pg(PG_HOST, PG_PORT)
+
+
+def connect_pg(host: str, port: int):
     return psycopg2.connect(
-        host=PG_HOST,
-        port=PG_PORT,
+        host=host,
+        port=port,
         dbname=PG_DB,
         user=PG_USER,
         password=PG_PASS,
@@ -74,7 +183,635 @@ def get_pg_sales_conn():
     )
 
 
-mcp = FastMCP("CRUDServer")
+def parse_replica_hosts(value: str, default_port: int) -> list:
+    hosts = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(":")
+            hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+MYSQL_REPLICA_HOSTS = parse_replica_hosts(os.getenv("MYSQL_REPLICA_HOSTS"), MYSQL_PORT)
+PG_REPLICA_HOSTS = parse_replica_hosts(os.getenv("PG_REPLICA_HOSTS"), PG_PORT)
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "10"))
+
+
+def mysql_replica_lag(host: str, port: int) -> float:
+    conn = mysql.connector.connect(host=host, port=port, user=MYSQL_USER, password=MYSQL_PASSWORD,
+                                   ssl_disabled=False, connection_timeout=2)
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute("SHOW REPLICA STATUS")
+            lag_column = "Seconds_Behind_Source"
+        except mysql.connector.Error:
+            cur.execute("SHOW SLAVE STATUS")
+            lag_column = "Seconds_Behind_Master"
+        row = cur.fetchone()
+        if row is None:
+            return float("inf")
+        lag = dict(zip([d[0] for d in cur.description], row)).get(lag_column)
+        return float("inf") if lag is None else float(lag)
+    finally:
+        conn.close()
+
+
+def pg_replica_lag(host: str, port: int) -> float:
+    # An idle primary leaves the last replay timestamp behind, so a replica that has replayed
+    # everything it received counts as current.
+    conn = psycopg2.connect(host=host, port=port, dbname=PG_DB, user=PG_USER, password=PG_PASS,
+                            sslmode="require", connect_timeout=2)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN NULL
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END
+        """)
+        lag = cur.fetchone()[0]
+        return float("inf") if lag is None else float(lag)
+    finally:
+        conn.close()
+
+
+class ReplicaSet:
+    # Lag of each replica is measured at most every REPLICA_LAG_CHECK_SECONDS; an unreachable
+    # replica counts as infinitely behind until the next check.
+    def __init__(self, hosts: list, measure_lag):
+        self.hosts = hosts
+        self.measure_lag = measure_lag
+        self.lags = {}
+        self.checked_at = {}
+        self.lock = threading.Lock()
+        self.next_index = 0
+
+    def lag(self, host: tuple) -> float:
+        # The probe is a network round trip, so it runs outside the lock; the thread that claims
+        # a due check does it while the others go on with the cached lag.
+        now = time.monotonic()
+        with self.lock:
+            if now - self.checked_at.get(host, float("-inf")) < REPLICA_LAG_CHECK_SECONDS:
+                return self.lags.get(host, float("inf"))
+            self.checked_at[host] = now
+        try:
+            lag = self.measure_lag(*host)
+        except Exception:
+            lag = float("inf")
+        with self.lock:
+            if self.checked_at[host] == now:
+                self.lags[host] = lag
+        return lag
+
+    def mark_down(self, host: tuple):
+        with self.lock:
+            self.lags[host] = float("inf")
+            self.checked_at[host] = time.monotonic()
+
+    def pick(self, max_lag: float) -> Optional[tuple]:
+        with self.lock:
+            first = self.next_index
+        for i in range(len(self.hosts)):
+            host = self.hosts[(first + i) % len(self.hosts)]
+            if self.lag(host) <= max_lag:
+                with self.lock:
+                    self.next_index = (first + i + 1) % len(self.hosts)
+                return host
+        return None
+
+
+replica_sets = {"mysql": ReplicaSet(MYSQL_REPLICA_HOSTS, mysql_replica_lag),
+                "pg": ReplicaSet(PG_REPLICA_HOSTS, pg_replica_lag)}
+session_last_write = {}
+
+ROUTED_READ_OPERATIONS = {
+    "sqlserver_crud": {"read", "describe"},
+    "postgresql_crud": {"read", "describe"},
+    "sales_crud": {"read", "aggregate"},
+    "careplan_crud": {"read"},
+    "calllogs_crud": {"read", "transcript_search", "analyze", "analyze_many", "customer_history", "fetch_transcript"},
+    "customer_360": {"read"},
+}
+# Only these stamp the session for read-your-writes; anything else (ingest_stats, a dedupe
+# preview, ...) leaves its replica routing alone.
+ROUTED_WRITE_OPERATIONS = {
+    "sqlserver_crud": {"create", "update", "delete", "dedupe"},
+    "postgresql_crud": {"create", "update", "delete", "check_consistency"},
+    "sales_crud": {"create", "update", "delete", "sync_replica"},
+    "careplan_crud": set(),
+    "calllogs_crud": {"ingest", "rebuild_rollups", "maintain_partitions", "backfill_markers", "rebuild_anomalies",
+                      "rebuild_sketches", "backfill_signatures"},
+    "customer_360": set(),
+}
+# Operations that only write when this argument is set.
+ROUTED_WRITE_FLAGS = {("sqlserver_crud", "dedupe"): "merge", ("postgresql_crud", "check_consistency"): "repair"}
+
+
+def current_session_id() -> str:
+    try:
+        from fastmcp.server.dependencies import get_context
+        return get_context().session_id or "default"
+    except Exception:
+        return "default"
+
+
+def choose_read_replicas(session_id: str) -> dict:
+    # Read-your-writes: a replica only serves a session once its lag is shorter than the time
+    # since that session's last write.
+    since_write = time.monotonic() - session_last_write.get(session_id, float("-inf"))
+    max_lag = min(REPLICA_MAX_LAG_SECONDS, since_write)
+    return {backend: replicas.pick(max_lag) for backend, replicas in replica_sets.items() if replicas.hosts}
+
+
+def record_session_write(session_id: str):
+    # Re-inserting keeps the dict in write order, so sessions whose last write is older than
+    # REPLICA_MAX_LAG_SECONDS (and so no longer restricts their routing) are dropped from the front.
+    now = time.monotonic()
+    session_last_write.pop(session_id, None)
+    session_last_write[session_id] = now
+    while True:
+        oldest = next(iter(session_last_write))
+        if now - session_last_write[oldest] <= REPLICA_MAX_LAG_SECONDS:
+            break
+        del session_last_write[oldest]
+
+
+def route_reads(tool_name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            operation = kwargs.get("operation", "read")
+            # Incremental keyword analysis persists counts, so it must run on the primary.
+            is_read = operation in ROUTED_READ_OPERATIONS[tool_name] and not kwargs.get("incremental")
+            flag = ROUTED_WRITE_FLAGS.get((tool_name, operation))
+            is_write = operation in ROUTED_WRITE_OPERATIONS[tool_name] and (flag is None or kwargs.get(flag))
+            session_id = current_session_id()
+            replicas = await asyncio.to_thread(choose_read_replicas, session_id) if is_read else {}
+            route = read_route.get()
+            if route is not None:
+                route.update(replicas)
+            token = read_replicas.set(replicas)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                read_replicas.reset(token)
+                if is_write:
+                    record_session_write(session_id)
+        return wrapper
+    return decorator
+
+
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+SWR_MAX_STALENESS = float(os.getenv("SWR_MAX_STALENESS", "900"))
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_TIMEOUT_SECONDS = float(os.getenv("SHARED_CACHE_TIMEOUT_SECONDS", "0.25"))
+
+CALLLOG_READ_TABLES = ("CallLogs", "Customers")
+# Tables each cacheable operation reads; a write to any of them drops the cached result.
+CACHED_OPERATIONS = {
+    "sqlserver_crud": {"read": ("Customers",), "describe": ("Customers",)},
+    "postgresql_crud": {"read": ("products",), "describe": ("products",)},
+    "sales_crud": {"read": ("Sales", "Customers", "ProductsCache", "products"),
+                   "aggregate": ("Sales", "Customers", "ProductsCache", "sales_replica")},
+    "careplan_crud": {"read": ("CarePlan",)},
+    "calllogs_crud": {op: CALLLOG_READ_TABLES for op in ("read", "transcript_search", "analyze", "analyze_many",
+                                                          "customer_history", "fetch_transcript")},
+    "customer_360": {"read": ("Customers", "Sales", "ProductsCache", "CallLogs")},
+}
+# Heavy analytic operations that may be answered from an entry past its TTL (up to
+# SWR_MAX_STALENESS seconds old, and never one a write invalidated) while a refresh runs
+# in the background.
+SWR_OPERATIONS = {
+    "calllogs_crud": {"analyze", "analyze_many"},
+    "sales_crud": {"aggregate"},
+}
+# Tables each write operation touches; write operations not listed here invalidate every
+# table the tool reads.
+WRITE_TABLES = {
+    "sqlserver_crud": {"create": ("Customers",), "update": ("Customers",),
+                       "delete": ("Customers", "Sales", "CallLogs"), "dedupe": ("Customers", "Sales", "CallLogs")},
+    "postgresql_crud": {"create": ("products",), "update": ("products",), "delete": ("products",),
+                        "check_consistency": ("ProductsCache",)},
+    "sales_crud": {"create": ("Sales",), "update": ("Sales",), "delete": ("Sales",), "sync_replica": ("sales_replica",)},
+    "calllogs_crud": {"ingest_stats": ()},
+}
+
+
+def cache_key(tool_name: str, kwargs: dict) -> str:
+    args = {k: v.strip() if isinstance(v, str) else v for k, v in kwargs.items() if v is not None}
+    return tool_name + ":" + json.dumps(args, sort_keys=True, default=str)
+
+
+def write_tables(tool_name: str, operation: str) -> tuple:
+    tables = WRITE_TABLES.get(tool_name, {})
+    if operation in tables:
+        return tables[operation]
+    return tuple({t for read_tables in CACHED_OPERATIONS.get(tool_name, {}).values() for t in read_tables})
+
+
+class ResultCache:
+    # LRU bounded by the JSON size of the cached results. Each table has a generation number
+    # that every write bumps; an entry remembers the generations it was computed under, so a
+    # read that raced a write is never stored, and invalidation is a counter bump rather than
+    # a scan. TTL bounds staleness from writers outside this process.
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.generations = Counter()
+        self.written_at = {}
+        self.lock = threading.Lock()
+        self.counters = Counter()
+
+    def snapshot(self, tables: tuple) -> tuple:
+        with self.lock:
+            return tuple(self.generations[t] for t in tables)
+
+    def get(self, key: str, tables: tuple):
+        return self.get_stale(key, tables, 0)[0]
+
+    def get_stale(self, key: str, tables: tuple, max_staleness: float) -> tuple:
+        # (value, None) for a current entry; (value, age) for one past its TTL but at most
+        # max_staleness old whose tables have not been written since, which the caller may
+        # serve while refreshing it; (None, None) otherwise. An entry a write invalidated is
+        # always dropped, so nobody is served data from before their own write.
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, size, stored_at, generations = entry
+                age = time.monotonic() - stored_at
+                if generations != tuple(self.generations[t] for t in tables):
+                    self._drop(key)
+                    self.counters["invalidated"] += 1
+                elif age <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value, None
+                elif age <= max_staleness:
+                    self.entries.move_to_end(key)
+                    self.counters["stale_served"] += 1
+                    return value, age
+                else:
+                    self._drop(key)
+                    self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None, None
+
+    def put(self, key: str, value, tables: tuple, generations: tuple):
+        size = response_size(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generations != tuple(self.generations[t] for t in tables):
+                self.counters["stale_puts"] += 1
+                return
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, size, time.monotonic(), generations)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def _drop(self, key: str):
+        self.bytes -= self.entries.pop(key)[1]
+
+    def invalidate(self, tables, publish: bool = True):
+        if not tables:
+            return
+        with self.lock:
+            now = time.monotonic()
+            for table in tables:
+                self.generations[table] += 1
+                self.written_at[table] = now
+            self.counters["write_invalidations" if publish else "remote_invalidations"] += 1
+        if publish:
+            shared_cache.publish(tables)
+
+    def replica_may_lag(self, tables: tuple) -> bool:
+        # A replica is only picked while its lag, measured up to REPLICA_LAG_CHECK_SECONDS
+        # ago, is under REPLICA_MAX_LAG_SECONDS; a write to these tables inside that window
+        # may be missing from what it served.
+        horizon = time.monotonic() - REPLICA_MAX_LAG_SECONDS - REPLICA_LAG_CHECK_SECONDS
+        with self.lock:
+            return any(self.written_at.get(t, float("-inf")) > horizon for t in tables)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+                **self.counters,
+            }
+
+
+result_cache = ResultCache(CACHE_MAX_BYTES, CACHE_TTL_SECONDS)
+
+
+class SharedCache:
+    # Optional cache tier shared by every server process, on any Redis-protocol server. An
+    # entry stores the shared table generations it was computed under and is ignored once any
+    # of them moves. Each write bumps the generations and is published, so other processes
+    # drop their local entries as soon as the message arrives.
+    GENERATIONS_KEY = "mcp:generations"
+    CHANNEL = "mcp:invalidate"
+
+    def __init__(self, url: str, ttl: float):
+        self.url = url
+        self.ttl = ttl
+        self.origin = uuid.uuid4().hex
+        self.client = None
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.last_error = None
+        self.retry_at = 0.0
+        self.outbox = queue.SimpleQueue()
+        self.publisher = None
+
+    def connect(self):
+        # An unreachable server is retried every few seconds instead of on every call.
+        if self.client is None and self.url and time.monotonic() >= self.retry_at:
+            with self.lock:
+                if self.client is None:
+                    try:
+                        import redis
+                    except ImportError:
+                        self.last_error = "SHARED_CACHE_URL is set but the redis package is not installed"
+                        self.url = ""
+                        return None
+                    try:
+                        client = redis.Redis.from_url(self.url, socket_timeout=SHARED_CACHE_TIMEOUT_SECONDS)
+                        client.ping()
+                    except Exception as e:
+                        self.last_error = str(e)
+                        self.counters["errors"] += 1
+                        self.retry_at = time.monotonic() + 5
+                        return None
+                    self.client = client
+                    threading.Thread(target=self._listen, args=(redis,), daemon=True).start()
+        return self.client
+
+    def _listen(self, redis):
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(self.url).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                # Messages published while unsubscribed are lost, so nothing cached before
+                # (re)subscribing can be trusted.
+                result_cache.clear()
+                for message in pubsub.listen():
+                    payload = json.loads(message["data"])
+                    if payload["origin"] != self.origin:
+                        result_cache.invalidate(payload["tables"], publish=False)
+                        self.counters["remote_invalidations"] += 1
+            except Exception as e:
+                self.last_error = str(e)
+                self.counters["errors"] += 1
+                time.sleep(1)
+
+    def lookup(self, key: str, tables: tuple) -> tuple:
+        # Returns (value or None, current generations); the generations are the snapshot a
+        # freshly computed value must be stored under.
+        client = self.connect()
+        if client is None:
+            return None, None
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get("mcp:result:" + hashlib.sha1(key.encode("utf-8")).hexdigest())
+            pipe.hmget(self.GENERATIONS_KEY, list(tables))
+            raw, generations = pipe.execute()
+        except Exception as e:
+            self.last_error = str(e)
+            self.counters["errors"] += 1
+            return None, None
+        generations = [int(g or 0) for g in generations]
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry["generations"] == generations:
+                self.counters["hits"] += 1
+                return entry["value"], generations
+            self.counters["stale"] += 1
+        self.counters["misses"] += 1
+        return None, generations
+
+    def put(self, key: str, value, generations: list):
+        client = self.connect()
+        if client is None or generations is None:
+            return
+        try:
+            client.set("mcp:result:" + hashlib.sha1(key.encode("utf-8")).hexdigest(),
+                       json.dumps({"generations": generations, "value": value}, default=str),
+                       ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.last_error = str(e)
+            self.counters["errors"] += 1
+
+    def publish(self, tables):
+        # Writes invalidate from the event loop as well as from worker threads, so the round
+        # trip is left to a publisher thread instead of blocking the caller.
+        if not self.url:
+            return
+        with self.lock:
+            if self.publisher is None:
+                self.publisher = threading.Thread(target=self._publish_loop, daemon=True)
+                self.publisher.start()
+        self.outbox.put(list(tables))
+
+    def _publish_loop(self):
+        while True:
+            tables = self.outbox.get()
+            client = self.connect()
+            if client is None:
+                self.counters["unpublished"] += 1
+                continue
+            try:
+                pipe = client.pipeline(transaction=False)
+                for table in tables:
+                    pipe.hincrby(self.GENERATIONS_KEY, table, 1)
+                pipe.publish(self.CHANNEL, json.dumps({"origin": self.origin, "tables": tables}))
+                pipe.execute()
+                self.counters["published"] += 1
+            except Exception as e:
+                self.last_error = str(e)
+                self.counters["errors"] += 1
+
+    def stats(self) -> dict:
+        return {"enabled": bool(self.url), "connected": self.client is not None, "last_error": self.last_error,
+                **self.counters}
+
+
+shared_cache = SharedCache(SHARED_CACHE_URL, CACHE_TTL_SECONDS)
+
+
+def cached_lookup(kind: str, tables: tuple):
+    # Name resolution (customer/product name -> id) shares the result cache tiers; only
+    # successful lookups are cached. Blocking, so async tools call it via asyncio.to_thread.
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(name: str) -> dict:
+            # Callers get their own copy; the cached dict is shared.
+            key = f"lookup:{kind}:{(name or '').strip().lower()}"
+            value = result_cache.get(key, tables)
+            if value is not None:
+                return dict(value)
+            generations = result_cache.snapshot(tables)
+            value, shared_generations = shared_cache.lookup(key, tables)
+            if value is None:
+                value = fn(name)
+                if not value.get("found"):
+                    return value
+                if any(read_replicas.get().values()) and result_cache.replica_may_lag(tables):
+                    return value
+                shared_cache.put(key, value, shared_generations)
+            result_cache.put(key, value, tables, generations)
+            return dict(value)
+        return wrapper
+    return decorator
+
+
+def cached_tool(tool_name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            operation = kwargs.get("operation", "read")
+            tables = CACHED_OPERATIONS.get(tool_name, {}).get(operation)
+            if pinned_mysql.get() is not None and tables is not None:
+                # Inside a batch transaction: reads may see uncommitted writes, keep them private.
+                return await fn(*args, **kwargs)
+            if tables is None or kwargs.get("incremental"):
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    result_cache.invalidate(write_tables(tool_name, operation))
+            key = cache_key(tool_name, kwargs)
+            swr = SWR_MAX_STALENESS > 0 and operation in SWR_OPERATIONS.get(tool_name, ())
+            cached, stale_age = result_cache.get_stale(key, tables, SWR_MAX_STALENESS if swr else 0)
+            if cached is not None and stale_age is None:
+                return cached
+            generations = result_cache.snapshot(tables)
+
+            async def fill():
+                shared_generations = None
+                if shared_cache.url:
+                    shared, shared_generations = await asyncio.to_thread(shared_cache.lookup, key, tables)
+                    if shared is not None:
+                        result_cache.put(key, shared, tables, generations)
+                        return shared
+                route = {}
+                read_route.set(route)
+                result = await fn(*args, **kwargs)
+                message = result.get("result") if isinstance(result, dict) else None
+                if any(route.values()) and result_cache.replica_may_lag(tables):
+                    # Possibly read from before a recent write; caching it would hand that
+                    # stale result to the writer's session too (read-your-writes).
+                    result_cache.counters["replica_results_not_cached"] += 1
+                elif not (isinstance(message, str) and message.startswith("❌")):
+                    result_cache.put(key, result, tables, generations)
+                    if shared_generations is not None:
+                        await asyncio.to_thread(shared_cache.put, key, result, shared_generations)
+                return result
+
+            # Shortly after a write, sessions may be routed differently (the writer to the
+            # primary, others to a replica), so they must not share a flight.
+            flight_key = (key, generations)
+            if any(r.hosts for r in replica_sets.values()) and result_cache.replica_may_lag(tables):
+                flight_key += (current_session_id(),)
+            if cached is not None:
+                single_flight.start(tool_name, flight_key, fill)
+                return {**cached, "stale": True, "age_seconds": round(stale_age, 1)}
+            return await single_flight.run(tool_name, flight_key, fill)
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    # Identical concurrent misses share one execution. The flight key includes the table
+    # generations, so a call made after a write never joins a flight that started before it.
+    # The flight runs as its own task, so a caller that goes away does not cancel it for the others.
+    def __init__(self):
+        self.flights = {}
+        self.counters = Counter()
+        self.coalesced_by_tool = Counter()
+
+    def start(self, tool_name: str, key, factory) -> asyncio.Future:
+        task = self.flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.flights[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.counters["executions"] += 1
+        else:
+            self.counters["coalesced"] += 1
+            self.coalesced_by_tool[tool_name] += 1
+        return task
+
+    def _finish(self, key, task: asyncio.Future):
+        self.flights.pop(key, None)
+        # Background refreshes have no awaiting caller; retrieve the error so it is not lost.
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["failed"] += 1
+
+    async def run(self, tool_name: str, key, factory):
+        return await asyncio.shield(self.start(tool_name, key, factory))
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.flights), **self.counters, "coalesced_by_tool": dict(self.coalesced_by_tool)}
+
+
+single_flight = SingleFlight()
+
+
+CALLLOG_INGEST_BATCH_SIZE = int(os.getenv("CALLLOG_INGEST_BATCH_SIZE", "500"))
+CALLLOG_INGEST_FLUSH_SECONDS = float(os.getenv("CALLLOG_INGEST_FLUSH_SECONDS", "1.0"))
+CALLLOG_INGEST_QUEUE_SIZE = int(os.getenv("CALLLOG_INGEST_QUEUE_SIZE", "20000"))
+CALLLOG_SPOOL_PATH = os.getenv("CALLLOG_SPOOL_PATH", "calllog_spool.sqlite3")
+CALLLOG_SPOOL_REPLAY_SECONDS = float(os.getenv("CALLLOG_SPOOL_REPLAY_SECONDS", "5"))
+
+TRANSCRIPT_INDEX_ENABLED = os.getenv("TRANSCRIPT_INDEX_ENABLED", "false").lower() == "true"
+TRANSCRIPT_INDEX_PATH = os.getenv("TRANSCRIPT_INDEX_PATH", "transcript_index.bin")
+TRANSCRIPT_INDEX_REFRESH_SECONDS = float(os.getenv("TRANSCRIPT_INDEX_REFRESH_SECONDS", "30"))
+TRANSCRIPT_INDEX_MERGE_DOCS = int(os.getenv("TRANSCRIPT_INDEX_MERGE_DOCS", "5000"))
+TRANSCRIPT_SNIPPET_WORDS = 30
+TRANSCRIPT_PREVIEW_CHARS = int(os.getenv("TRANSCRIPT_PREVIEW_CHARS", "160"))
+
+SALES_REPLICA_ENABLED = os.getenv("SALES_REPLICA_ENABLED", "false").lower() == "true"
+SALES_REPLICA_SYNC_SECONDS = float(os.getenv("SALES_REPLICA_SYNC_SECONDS", "30"))
+SALES_REPLICA_BATCH_SIZE = int(os.getenv("SALES_REPLICA_BATCH_SIZE", "5000"))
+
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.1"))
+ANOMALY_WARMUP_HOURS = int(os.getenv("ANOMALY_WARMUP_HOURS", "24"))
+ANOMALY_RECORD_Z = float(os.getenv("ANOMALY_RECORD_Z", "2.0"))
+
+CALLLOGS_PARTITIONED = os.getenv("CALLLOGS_PARTITIONED", "false").lower() == "true"
+CALLLOGS_PARTITION_MONTHS_AHEAD = int(os.getenv("CALLLOGS_PARTITION_MONTHS_AHEAD", "3"))
+
+
+@contextlib.asynccontextmanager
+async def server_lifespan(server):
+    # Replication runs from startup rather than from the first sales call.
+    sales_replicator.ensure_started()
+    try:
+        yield
+    finally:
+        if sales_replicator.task is not None:
+            sales_replicator.task.cancel()
+
+
+mcp = FastMCP("CRUDServer", lifespan=server_lifespan)
 
 
 def generate_call_transcript(issue_category, resolution_status, sentiment_score, agent_name, duration):
@@ -238,6 +975,802 @@ def generate_call_transcript(issue_category, resolution_status, sentiment_score,
     return base_transcript
 
 
+TRANSCRIPT_MARKERS = {
+    "HasNegative": ("frustrated", "angry", "upset"),
+    "HasPositive": ("satisfied", "happy", "grateful", "appreciated"),
+    "HasApology": ("apologized", "sorry"),
+    "HasSolution": ("solution", "resolved", "fixed"),
+    "HasEscalation": ("escalat",),
+    "HasRecurring": ("recurring", "again", "multiple", "repeated"),
+}
+TRANSCRIPT_MARKER_RES = {
+    column: re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    for column, words in TRANSCRIPT_MARKERS.items()
+}
+# Bump when TRANSCRIPT_MARKERS changes so backfill_transcript_markers recomputes every row.
+TRANSCRIPT_MARKERS_VERSION = 1
+CALLLOG_MARKER_COLUMNS = list(TRANSCRIPT_MARKERS) + ["TranscriptLength", "MarkersVersion"]
+CALLLOG_INSERT_COLUMNS = [
+    "CallDate", "CustomerID", "AgentName", "CallDuration", "CallType", "CallStatus", "IssueCategory",
+    "ResolutionStatus", "SentimentScore", "CallNotes", "CallTranscript", "WaitTime", "TransferCount",
+] + CALLLOG_MARKER_COLUMNS + ["IngestKey"]
+
+CALLLOG_SCHEMA_COLUMNS = [(column, "TINYINT NOT NULL DEFAULT 0") for column in TRANSCRIPT_MARKERS] + [
+    ("TranscriptLength", "INT NOT NULL DEFAULT 0"),
+    ("MarkersVersion", "TINYINT NOT NULL DEFAULT 0"),
+    ("IngestKey", "VARCHAR(64) NULL"),
+    ("MinHashSignature", "VARBINARY(256) NULL"),
+    ("NearDuplicate", "TINYINT NOT NULL DEFAULT 0"),
+]
+CALLLOG_SCHEMA_INDEXES = {
+    "idx_category_markers": ("INDEX", "(IssueCategory, ResolutionStatus, HasNegative, HasPositive, HasRecurring, NearDuplicate, SentimentScore)"),
+    "idx_agent_markers": ("INDEX", "(AgentName, HasApology, HasSolution, HasEscalation, TranscriptLength, CallDuration)"),
+    "idx_marker_version": ("INDEX", "(MarkersVersion)"),
+    # Covers customer_history: the page and its summary never touch the clustered rows.
+    "idx_customer_history": ("INDEX", "(CustomerID, CallDate, LogID, AgentName, IssueCategory, ResolutionStatus, SentimentScore, CallDuration)"),
+    # Unique keys on a partitioned table must include the partitioning column.
+    "idx_ingest_key": ("UNIQUE INDEX", "(IngestKey, CallDate)" if CALLLOGS_PARTITIONED else "(IngestKey)"),
+}
+
+
+def detect_transcript_markers(transcript: str) -> tuple:
+    transcript = transcript or ""
+    flags = tuple(1 if TRANSCRIPT_MARKER_RES[column].search(transcript) else 0 for column in TRANSCRIPT_MARKERS)
+    return flags + (len(transcript.encode("utf-8")), TRANSCRIPT_MARKERS_VERSION)
+
+
+def ensure_calllog_schema(cur):
+    cur.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'CallLogs'
+    """)
+    existing_columns = {r[0] for r in cur.fetchall()}
+    if not existing_columns:
+        return
+    cur.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'CallLogs'
+    """)
+    existing_indexes = {r[0] for r in cur.fetchall()}
+
+    alterations = [f"ADD COLUMN {column} {ddl}" for column, ddl in CALLLOG_SCHEMA_COLUMNS
+                   if column not in existing_columns]
+    alterations += [f"ADD {kind} {index} {columns}" for index, (kind, columns) in CALLLOG_SCHEMA_INDEXES.items()
+                    if index not in existing_indexes]
+    if alterations:
+        cur.execute(f"ALTER TABLE CallLogs {', '.join(alterations)}")
+
+    # Every ingest batch also writes the rollups, sketches, anomaly state, LSH bands and keyword
+    # counts, so a database whose calls predate them gets the tables, and the aggregates are built
+    # once from the existing calls (the anomaly state replays the rollups, so it goes after them).
+    # Signatures of existing calls are left to backfill_signatures, keyword counts to the first
+    # keyword analysis.
+    create_rollup_tables(cur)
+    create_sketch_tables(cur)
+    create_anomaly_tables(cur)
+    create_signature_tables(cur)
+    create_keyword_tables(cur)
+    cur.execute("""
+        SELECT EXISTS(SELECT 1 FROM CallLogs), EXISTS(SELECT 1 FROM CallRollupHourly),
+               EXISTS(SELECT 1 FROM CallSketches), EXISTS(SELECT 1 FROM CallAnomalyState)
+    """)
+    has_calls, has_rollups, has_sketches, has_anomaly_state = cur.fetchone()
+    if has_calls and not has_rollups:
+        rebuild_call_rollups(cur)
+    if has_calls and not has_anomaly_state:
+        rebuild_call_anomalies(cur)
+    if has_calls and not has_sketches:
+        rebuild_call_sketches()
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def calllog_partition_definitions(first_month: datetime, last_month: datetime) -> list:
+    definitions = []
+    month = month_start(first_month)
+    while month <= last_month:
+        upper = next_month(month)
+        definitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper:%Y-%m-%d}')")
+        month = upper
+    return definitions
+
+
+def calllog_partition_clause(oldest: datetime, newest: datetime) -> str:
+    last_month = month_start(newest)
+    for _ in range(CALLLOGS_PARTITION_MONTHS_AHEAD):
+        last_month = next_month(last_month)
+    definitions = calllog_partition_definitions(oldest, last_month)
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return "\n        PARTITION BY RANGE COLUMNS (CallDate) (\n            " + ",\n            ".join(definitions) + "\n        )"
+
+
+def maintain_calllog_partitions(cur) -> list:
+    # Split the catch-all pmax partition so the coming months each get their own
+    # partition before any rows land in them.
+    cur.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'CallLogs' AND PARTITION_NAME IS NOT NULL
+    """)
+    existing = {r[0] for r in cur.fetchall()}
+    if "pmax" not in existing:
+        return []
+
+    monthly = sorted(name for name in existing if name != "pmax")
+    if monthly:
+        newest = datetime.strptime(monthly[-1][1:], "%Y%m")
+        first_new = next_month(newest)
+    else:
+        first_new = month_start(datetime.now())
+    last_month = month_start(datetime.now())
+    for _ in range(CALLLOGS_PARTITION_MONTHS_AHEAD):
+        last_month = next_month(last_month)
+
+    definitions = calllog_partition_definitions(first_new, last_month)
+    if not definitions:
+        return []
+    cur.execute(f"""
+        ALTER TABLE CallLogs REORGANIZE PARTITION pmax INTO (
+            {", ".join(definitions + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])}
+        )
+    """)
+    return [d.split()[1] for d in definitions]
+
+
+def backfill_transcript_markers(batch_size: int = 500) -> int:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    ensure_calllog_schema(cur)
+    assignments = ", ".join(f"{column} = %s" for column in CALLLOG_MARKER_COLUMNS)
+    updated = 0
+    last_log_id = 0
+    try:
+        while True:
+            cur.execute("""
+                SELECT LogID, CallTranscript FROM CallLogs
+                WHERE LogID > %s AND MarkersVersion < %s
+                ORDER BY LogID
+                LIMIT %s
+            """, (last_log_id, TRANSCRIPT_MARKERS_VERSION, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            cur.execute("START TRANSACTION")
+            cur.executemany(f"UPDATE CallLogs SET {assignments} WHERE LogID = %s",
+                            [detect_transcript_markers(transcript) + (log_id,) for log_id, transcript in rows])
+            cur.execute("COMMIT")
+            last_log_id = rows[-1][0]
+            updated += len(rows)
+    finally:
+        conn.close()
+    return updated
+
+
+ROLLUP_MEASURES = ["CallCount", "SumDuration", "SumWait", "SumSentiment", "SentimentCount",
+                   "PositiveCalls", "ResolvedCalls", "EscalatedCalls", "SumTransfers"]
+ROLLUP_TABLES = {
+    "CallRollupHourly": ("DATETIME", lambda d: d.replace(minute=0, second=0, microsecond=0)),
+    "CallRollupDaily": ("DATE", lambda d: d.date()),
+}
+
+
+def create_rollup_tables(cur):
+    for table, (bucket_type, _) in ROLLUP_TABLES.items():
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                BucketStart {bucket_type} NOT NULL,
+                AgentName VARCHAR(100) NOT NULL,
+                IssueCategory VARCHAR(100) NOT NULL,
+                CallCount INT NOT NULL DEFAULT 0,
+                SumDuration BIGINT NOT NULL DEFAULT 0,
+                SumWait BIGINT NOT NULL DEFAULT 0,
+                SumSentiment DECIMAL(14,2) NOT NULL DEFAULT 0,
+                SentimentCount INT NOT NULL DEFAULT 0,
+                PositiveCalls INT NOT NULL DEFAULT 0,
+                ResolvedCalls INT NOT NULL DEFAULT 0,
+                EscalatedCalls INT NOT NULL DEFAULT 0,
+                SumTransfers INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (BucketStart, AgentName, IssueCategory),
+                INDEX idx_{table.lower()}_agent (AgentName, BucketStart),
+                INDEX idx_{table.lower()}_category (IssueCategory, BucketStart)
+            );
+        """)
+
+
+def apply_call_rollups(cur, call_rows):
+    # call_rows are CallLogs tuples in CALLLOG_INSERT_COLUMNS order; the batch is folded
+    # in memory first so every touched bucket costs a single upsert.
+    buckets = {table: {} for table in ROLLUP_TABLES}
+    for row in call_rows:
+        call = dict(zip(CALLLOG_INSERT_COLUMNS, row))
+        sentiment = call["SentimentScore"]
+        measures = (
+            1,
+            call["CallDuration"] or 0,
+            call["WaitTime"] or 0,
+            sentiment or 0,
+            0 if sentiment is None else 1,
+            1 if sentiment is not None and sentiment >= 0.5 else 0,
+            1 if call["ResolutionStatus"] == "resolved" else 0,
+            1 if call["ResolutionStatus"] == "escalated" else 0,
+            call["TransferCount"] or 0,
+        )
+        for table, (_, truncate) in ROLLUP_TABLES.items():
+            key = (truncate(call["CallDate"]), call["AgentName"] or "", call["IssueCategory"] or "")
+            totals = buckets[table].setdefault(key, [0] * len(ROLLUP_MEASURES))
+            for i, value in enumerate(measures):
+                totals[i] += value
+
+    columns = ", ".join(ROLLUP_MEASURES)
+    updates = ", ".join(f"{m} = {m} + VALUES({m})" for m in ROLLUP_MEASURES)
+    placeholders = ", ".join(["%s"] * (3 + len(ROLLUP_MEASURES)))
+    for table, table_buckets in buckets.items():
+        if table_buckets:
+            cur.executemany(f"""
+                INSERT INTO {table} (BucketStart, AgentName, IssueCategory, {columns})
+                VALUES ({placeholders})
+                ON DUPLICATE KEY UPDATE {updates}
+            """, [key + tuple(totals) for key, totals in table_buckets.items()])
+
+
+def rebuild_call_rollups(cur):
+    create_rollup_tables(cur)
+    columns = ", ".join(ROLLUP_MEASURES)
+    sums = ", ".join(f"SUM({m})" for m in ROLLUP_MEASURES)
+    cur.execute("START TRANSACTION")
+    cur.execute("DELETE FROM CallRollupHourly")
+    cur.execute("DELETE FROM CallRollupDaily")
+    cur.execute(f"""
+        INSERT INTO CallRollupHourly (BucketStart, AgentName, IssueCategory, {columns})
+        SELECT DATE_FORMAT(CallDate, '%Y-%m-%d %H:00:00'), COALESCE(AgentName, ''), COALESCE(IssueCategory, ''),
+               COUNT(*), COALESCE(SUM(CallDuration), 0), COALESCE(SUM(WaitTime), 0),
+               COALESCE(SUM(SentimentScore), 0), COUNT(SentimentScore),
+               SUM(CASE WHEN SentimentScore >= 0.5 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN ResolutionStatus = 'resolved' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN ResolutionStatus = 'escalated' THEN 1 ELSE 0 END),
+               COALESCE(SUM(TransferCount), 0)
+        FROM CallLogs
+        GROUP BY 1, 2, 3
+    """)
+    cur.execute(f"""
+        INSERT INTO CallRollupDaily (BucketStart, AgentName, IssueCategory, {columns})
+        SELECT DATE(BucketStart), AgentName, IssueCategory, {sums}
+        FROM CallRollupHourly
+        GROUP BY 1, 2, 3
+    """)
+    cur.execute("COMMIT")
+
+
+class TDigest:
+    # Merging t-digest (k1 scale). Centroids are (mean, weight) pairs kept sorted by mean;
+    # additions are buffered and folded in by compress().
+    def __init__(self, compression: float = 100, centroids: list = None):
+        self.compression = compression
+        self.centroids = centroids or []
+        self.buffer = []
+
+    def add(self, value: float, weight: float = 1):
+        self.buffer.append((float(value), weight))
+        if len(self.buffer) > 5 * self.compression:
+            self.compress()
+
+    def merge(self, other: "TDigest"):
+        self.buffer.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        if len(self.buffer) > 5 * self.compression:
+            self.compress()
+
+    @property
+    def count(self) -> float:
+        return sum(w for _, w in self.centroids) + sum(w for _, w in self.buffer)
+
+    def compress(self):
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        if not points:
+            return
+        total = sum(w for _, w in points)
+        merged = [list(points[0])]
+        so_far = 0.0
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            q = (so_far + current[1] + weight / 2) / total
+            if current[1] + weight <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                so_far += current[1]
+                merged.append([mean, weight])
+        self.centroids = [tuple(c) for c in merged]
+
+    def quantile(self, q: float) -> Optional[float]:
+        self.compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        total = sum(w for _, w in self.centroids)
+        target = q * total
+        so_far = 0.0
+        for i, (mean, weight) in enumerate(self.centroids):
+            if so_far + weight / 2 >= target:
+                if i == 0:
+                    return mean
+                prev_mean, prev_weight = self.centroids[i - 1]
+                prev_mid = so_far - prev_weight / 2
+                span = (so_far + weight / 2) - prev_mid
+                return prev_mean + (mean - prev_mean) * (target - prev_mid) / span if span else mean
+            so_far += weight
+        return self.centroids[-1][0]
+
+    def to_bytes(self) -> bytes:
+        self.compress()
+        return array("d", [v for c in self.centroids for v in c]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob) -> "TDigest":
+        values = array("d")
+        if blob:
+            values.frombytes(bytes(blob))
+        return cls(centroids=[(values[i], values[i + 1]) for i in range(0, len(values), 2)])
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 10, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def cardinality(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+SKETCH_QUANTILES = {"P50": 0.5, "P95": 0.95, "P99": 0.99}
+SKETCH_SOURCE_COLUMNS = ["CallDate", "AgentName", "CallDuration", "WaitTime", "CustomerID"]
+
+
+def create_sketch_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS CallSketches (
+            SketchDay DATE NOT NULL,
+            AgentName VARCHAR(100) NOT NULL,
+            CallCount INT NOT NULL DEFAULT 0,
+            DurationDigest BLOB,
+            WaitDigest BLOB,
+            CustomerHll VARBINARY(1024),
+            PRIMARY KEY (SketchDay, AgentName),
+            INDEX idx_callsketches_agent (AgentName, SketchDay)
+        );
+    """)
+
+
+def fold_call_sketches(sketches: dict, calls):
+    # sketches: {(day, agent): [count, duration digest, wait digest, customer hll]}
+    # calls: (CallDate, AgentName, CallDuration, WaitTime, CustomerID)
+    for call_date, agent, duration, wait, customer_id in calls:
+        key = (call_date.date(), agent or "")
+        if key not in sketches:
+            sketches[key] = [0, TDigest(), TDigest(), HyperLogLog()]
+        sketch = sketches[key]
+        sketch[0] += 1
+        if duration is not None:
+            sketch[1].add(duration)
+        if wait is not None:
+            sketch[2].add(wait)
+        if customer_id is not None:
+            sketch[3].add(customer_id)
+
+
+def write_call_sketches(cur, sketches: dict):
+    cur.executemany("""
+        REPLACE INTO CallSketches (SketchDay, AgentName, CallCount, DurationDigest, WaitDigest, CustomerHll)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [key + (s[0], s[1].to_bytes(), s[2].to_bytes(), s[3].to_bytes()) for key, s in sketches.items()])
+
+
+def apply_call_sketches(cur, call_rows):
+    # call_rows are CallLogs tuples in CALLLOG_INSERT_COLUMNS order. Touched (day, agent)
+    # sketches are locked, folded with the batch in memory and written back once each.
+    positions = [CALLLOG_INSERT_COLUMNS.index(c) for c in SKETCH_SOURCE_COLUMNS]
+    calls = [tuple(row[p] for p in positions) for row in call_rows]
+    days = {(call[0].date(), call[1] or "") for call in calls}
+    if not days:
+        return
+    sketches = {}
+    cur.execute(f"""
+        SELECT SketchDay, AgentName, CallCount, DurationDigest, WaitDigest, CustomerHll
+        FROM CallSketches
+        WHERE (SketchDay, AgentName) IN ({', '.join(['(%s, %s)'] * len(days))})
+        FOR UPDATE
+    """, [value for key in days for value in key])
+    for day, agent, count, duration, wait, customers in cur.fetchall():
+        sketches[(day, agent)] = [count, TDigest.from_bytes(duration), TDigest.from_bytes(wait),
+                                  HyperLogLog(registers=customers)]
+    fold_call_sketches(sketches, calls)
+    write_call_sketches(cur, sketches)
+
+
+def rebuild_call_sketches(batch_size: int = 1000) -> int:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    create_sketch_tables(cur)
+    sketches = {}
+    scanned = 0
+    last_log_id = 0
+    columns = ", ".join(SKETCH_SOURCE_COLUMNS)
+    try:
+        while True:
+            cur.execute(f"SELECT LogID, {columns} FROM CallLogs WHERE LogID > %s ORDER BY LogID LIMIT %s",
+                        (last_log_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            fold_call_sketches(sketches, [r[1:] for r in rows])
+            last_log_id = rows[-1][0]
+            scanned += len(rows)
+        cur.execute("START TRANSACTION")
+        cur.execute("DELETE FROM CallSketches")
+        if sketches:
+            write_call_sketches(cur, sketches)
+        cur.execute("COMMIT")
+    finally:
+        conn.close()
+    return scanned
+
+
+ANOMALY_STATE_COLUMNS = ["CurrentHour", "HourCalls", "HourSentimentSum", "HourSentimentCount",
+                         "VolumeMean", "VolumeVar", "SentimentMean", "SentimentVar", "HoursObserved"]
+ANOMALY_SD_FLOOR = {"volume": 1.0, "sentiment": 0.05}
+ANOMALY_SERIES = {"agent": "AgentName", "category": "IssueCategory"}
+
+
+def create_anomaly_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS CallAnomalyState (
+            SeriesType VARCHAR(16) NOT NULL,
+            SeriesKey VARCHAR(100) NOT NULL,
+            CurrentHour DATETIME NULL,
+            HourCalls INT NOT NULL DEFAULT 0,
+            HourSentimentSum DOUBLE NOT NULL DEFAULT 0,
+            HourSentimentCount INT NOT NULL DEFAULT 0,
+            VolumeMean DOUBLE NOT NULL DEFAULT 0,
+            VolumeVar DOUBLE NOT NULL DEFAULT 0,
+            SentimentMean DOUBLE NULL,
+            SentimentVar DOUBLE NOT NULL DEFAULT 0,
+            HoursObserved INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (SeriesType, SeriesKey)
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS CallAnomalies (
+            SeriesType VARCHAR(16) NOT NULL,
+            SeriesKey VARCHAR(100) NOT NULL,
+            BucketStart DATETIME NOT NULL,
+            Metric VARCHAR(16) NOT NULL,
+            Observed DOUBLE NOT NULL,
+            Expected DOUBLE NOT NULL,
+            ZScore DOUBLE NOT NULL,
+            PRIMARY KEY (SeriesType, SeriesKey, BucketStart, Metric),
+            INDEX idx_callanomalies_bucket (BucketStart)
+        );
+    """)
+
+
+def new_anomaly_state() -> dict:
+    return {"CurrentHour": None, "HourCalls": 0, "HourSentimentSum": 0.0, "HourSentimentCount": 0,
+            "VolumeMean": 0.0, "VolumeVar": 0.0, "SentimentMean": None, "SentimentVar": 0.0, "HoursObserved": 0}
+
+
+def anomaly_z(metric: str, value: float, mean: float, var: float) -> float:
+    return (value - mean) / max(math.sqrt(max(var, 0.0)), ANOMALY_SD_FLOOR[metric])
+
+
+def ewma_update(mean: float, var: float, value: float) -> tuple:
+    diff = value - mean
+    increment = ANOMALY_EWMA_ALPHA * diff
+    return mean + increment, (1 - ANOMALY_EWMA_ALPHA) * (var + diff * increment)
+
+
+def close_anomaly_hour(series: tuple, state: dict, anomalies: list):
+    # Scores the finished hour against the EWMA of the hours before it, then folds it in.
+    hour = state["CurrentHour"]
+    warm = state["HoursObserved"] >= ANOMALY_WARMUP_HOURS
+    calls = state["HourCalls"]
+    if warm:
+        z = anomaly_z("volume", calls, state["VolumeMean"], state["VolumeVar"])
+        if abs(z) >= ANOMALY_RECORD_Z:
+            anomalies.append(series + (hour, "volume", calls, state["VolumeMean"], z))
+    state["VolumeMean"], state["VolumeVar"] = ewma_update(state["VolumeMean"], state["VolumeVar"], calls)
+
+    if state["HourSentimentCount"]:
+        sentiment = state["HourSentimentSum"] / state["HourSentimentCount"]
+        if state["SentimentMean"] is None:
+            state["SentimentMean"] = sentiment
+        else:
+            if warm:
+                z = anomaly_z("sentiment", sentiment, state["SentimentMean"], state["SentimentVar"])
+                if abs(z) >= ANOMALY_RECORD_Z:
+                    anomalies.append(series + (hour, "sentiment", sentiment, state["SentimentMean"], z))
+            state["SentimentMean"], state["SentimentVar"] = ewma_update(
+                state["SentimentMean"], state["SentimentVar"], sentiment)
+    state["HoursObserved"] += 1
+
+
+def advance_anomaly_hour(series: tuple, state: dict, hour: datetime, anomalies: list):
+    # Closes the open hour and every empty hour up to `hour`, which becomes the new open hour.
+    # Empty hours are scored as zero volume so a series that goes silent gets its drop flagged;
+    # after a week the EWMA has forgotten the rest.
+    close_anomaly_hour(series, state, anomalies)
+    gap = int((hour - state["CurrentHour"]).total_seconds() // 3600) - 1
+    for _ in range(min(gap, 168)):
+        state.update(CurrentHour=state["CurrentHour"] + timedelta(hours=1),
+                     HourCalls=0, HourSentimentSum=0.0, HourSentimentCount=0)
+        close_anomaly_hour(series, state, anomalies)
+    state["HoursObserved"] += max(gap - 168, 0)
+    state.update(CurrentHour=hour, HourCalls=0, HourSentimentSum=0.0, HourSentimentCount=0)
+
+
+def observe_anomaly_calls(series: tuple, state: dict, hour: datetime, calls: int, sentiment_sum: float,
+                          sentiment_count: int, anomalies: list):
+    # O(1) per observation. Calls for an hour before the open one arrive too late to be scored
+    # and are left to the rollups.
+    if state["CurrentHour"] is not None and hour < state["CurrentHour"]:
+        return
+    if state["CurrentHour"] is not None and hour > state["CurrentHour"]:
+        advance_anomaly_hour(series, state, hour, anomalies)
+    state["CurrentHour"] = hour
+    state["HourCalls"] += calls
+    state["HourSentimentSum"] += sentiment_sum
+    state["HourSentimentCount"] += sentiment_count
+
+
+def write_anomaly_state(cur, states: dict, anomalies: list):
+    columns = ", ".join(ANOMALY_STATE_COLUMNS)
+    cur.executemany(f"""
+        REPLACE INTO CallAnomalyState (SeriesType, SeriesKey, {columns})
+        VALUES ({", ".join(["%s"] * (2 + len(ANOMALY_STATE_COLUMNS)))})
+    """, [series + tuple(state[c] for c in ANOMALY_STATE_COLUMNS) for series, state in states.items()])
+    if anomalies:
+        cur.executemany("""
+            INSERT INTO CallAnomalies (SeriesType, SeriesKey, BucketStart, Metric, Observed, Expected, ZScore)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE Observed = VALUES(Observed), Expected = VALUES(Expected), ZScore = VALUES(ZScore)
+        """, anomalies)
+
+
+def apply_call_anomalies(cur, call_rows):
+    # call_rows are CallLogs tuples in CALLLOG_INSERT_COLUMNS order.
+    calls = sorted((dict(zip(CALLLOG_INSERT_COLUMNS, row)) for row in call_rows), key=lambda c: c["CallDate"])
+    series_keys = {(series_type, call[column] or "") for call in calls for series_type, column in ANOMALY_SERIES.items()}
+    if not series_keys:
+        return
+    columns = ", ".join(ANOMALY_STATE_COLUMNS)
+    cur.execute(f"""
+        SELECT SeriesType, SeriesKey, {columns} FROM CallAnomalyState
+        WHERE (SeriesType, SeriesKey) IN ({", ".join(["(%s, %s)"] * len(series_keys))})
+        FOR UPDATE
+    """, [value for key in series_keys for value in key])
+    states = {tuple(r[:2]): dict(zip(ANOMALY_STATE_COLUMNS, r[2:])) for r in cur.fetchall()}
+    anomalies = []
+    for call in calls:
+        hour = call["CallDate"].replace(minute=0, second=0, microsecond=0)
+        sentiment = call["SentimentScore"]
+        for series_type, column in ANOMALY_SERIES.items():
+            series = (series_type, call[column] or "")
+            state = states.setdefault(series, new_anomaly_state())
+            observe_anomaly_calls(series, state, hour, 1, float(sentiment or 0), 0 if sentiment is None else 1,
+                                  anomalies)
+    write_anomaly_state(cur, states, anomalies)
+
+
+def rebuild_call_anomalies(cur):
+    # Replays the hourly rollup through the same state machine, one series at a time.
+    create_anomaly_tables(cur)
+    states = {}
+    anomalies = []
+    for series_type, column in ANOMALY_SERIES.items():
+        cur.execute(f"""
+            SELECT {column}, BucketStart, SUM(CallCount), SUM(SumSentiment), SUM(SentimentCount)
+            FROM CallRollupHourly
+            GROUP BY {column}, BucketStart
+            ORDER BY {column}, BucketStart
+        """)
+        for key, hour, calls, sentiment_sum, sentiment_count in cur.fetchall():
+            series = (series_type, key)
+            state = states.setdefault(series, new_anomaly_state())
+            observe_anomaly_calls(series, state, hour, int(calls), float(sentiment_sum), int(sentiment_count),
+                                  anomalies)
+    cur.execute("START TRANSACTION")
+    cur.execute("DELETE FROM CallAnomalyState")
+    cur.execute("DELETE FROM CallAnomalies")
+    if states:
+        write_anomaly_state(cur, states, anomalies)
+    cur.execute("COMMIT")
+    return len(anomalies)
+
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+MINHASH_PRIME = (1 << 61) - 1
+# Signatures are persisted, so the hash functions must be the same in every process and release.
+MINHASH_SEED = 20240611
+
+
+def minhash_coefficients(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [(rng.randrange(1, MINHASH_PRIME), rng.randrange(MINHASH_PRIME)) for _ in range(count)]
+
+
+MINHASH_COEFFICIENTS = minhash_coefficients(MINHASH_PERMUTATIONS, MINHASH_SEED)
+# With 16 bands of 4 rows the LSH collision curve crosses 50% at roughly this Jaccard.
+NEAR_DUPLICATE_SIMILARITY = 0.5
+
+
+def transcript_minhash(transcript: str) -> Optional[list]:
+    tokens = tokenize_transcript(transcript or "")
+    if not tokens:
+        return None
+    shingles = {" ".join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+    hashed = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+              for shingle in shingles]
+    return [min((a * x + b) % MINHASH_PRIME for x in hashed) & 0xFFFFFFFF for a, b in MINHASH_COEFFICIENTS]
+
+
+def lsh_buckets(signature: list) -> list:
+    return [(band, int.from_bytes(hashlib.blake2b(
+                array("I", signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]).tobytes(),
+                digest_size=8).digest(), "little", signed=True))
+            for band in range(MINHASH_BANDS)]
+
+
+def signature_similarity(a: list, b: list) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / MINHASH_PERMUTATIONS
+
+
+def decode_signature(blob) -> Optional[list]:
+    if not blob:
+        return None
+    signature = array("I")
+    signature.frombytes(bytes(blob))
+    return signature.tolist()
+
+
+def create_signature_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS TranscriptLshBands (
+            CustomerID INT NOT NULL,
+            IssueCategory VARCHAR(100) NOT NULL,
+            BandNo TINYINT NOT NULL,
+            BucketHash BIGINT NOT NULL,
+            LogID INT NOT NULL,
+            PRIMARY KEY (CustomerID, IssueCategory, BandNo, BucketHash, LogID),
+            INDEX idx_lsh_log (LogID)
+        );
+    """)
+
+
+def fetch_call_signatures(cur, log_ids) -> dict:
+    signatures = {}
+    log_ids = list(log_ids)
+    for i in range(0, len(log_ids), 1000):
+        chunk = log_ids[i:i + 1000]
+        cur.execute(f"SELECT LogID, MinHashSignature FROM CallLogs WHERE LogID IN ({', '.join(['%s'] * len(chunk))})",
+                    chunk)
+        signatures.update((log_id, decode_signature(blob)) for log_id, blob in cur.fetchall())
+    return signatures
+
+
+def apply_call_signatures(cur, calls) -> int:
+    # calls: (LogID, CustomerID, IssueCategory, CallTranscript). Each call is bucketed per
+    # (customer, category) in TranscriptLshBands; an earlier call sharing any bucket whose
+    # signature agrees on NEAR_DUPLICATE_SIMILARITY of its slots marks both NearDuplicate.
+    # Returns the number of near-duplicate pairs found.
+    signed = []
+    for log_id, customer_id, category, transcript in calls:
+        signature = transcript_minhash(transcript)
+        banded = signature is not None and customer_id is not None and bool(category)
+        signed.append((log_id, customer_id, category, signature, lsh_buckets(signature) if banded else []))
+
+    keys = [(customer_id, category, band, bucket)
+            for _, customer_id, category, _, buckets in signed for band, bucket in buckets]
+    candidates = {}
+    for i in range(0, len(keys), 1000):
+        chunk = keys[i:i + 1000]
+        cur.execute(f"""
+            SELECT CustomerID, IssueCategory, BandNo, BucketHash, LogID FROM TranscriptLshBands
+            WHERE (CustomerID, IssueCategory, BandNo, BucketHash) IN ({', '.join(['(%s, %s, %s, %s)'] * len(chunk))})
+        """, [value for key in chunk for value in key])
+        for customer_id, category, band, bucket, log_id in cur.fetchall():
+            candidates.setdefault((customer_id, category, band, bucket), []).append(log_id)
+    signatures = fetch_call_signatures(cur, {i for ids in candidates.values() for i in ids})
+
+    duplicates = set()
+    pairs = 0
+    for log_id, customer_id, category, signature, buckets in signed:
+        checked = set()
+        for band, bucket in buckets:
+            key = (customer_id, category, band, bucket)
+            for other in candidates.get(key, ()):
+                if other in checked or other == log_id or not signatures.get(other):
+                    continue
+                checked.add(other)
+                if signature_similarity(signature, signatures[other]) >= NEAR_DUPLICATE_SIMILARITY:
+                    duplicates.update((log_id, other))
+                    pairs += 1
+            candidates.setdefault(key, []).append(log_id)
+        signatures[log_id] = signature
+
+    cur.executemany("UPDATE CallLogs SET MinHashSignature = %s, NearDuplicate = %s WHERE LogID = %s", [
+        (array("I", signature).tobytes() if signature else None, 1 if log_id in duplicates else 0, log_id)
+        for log_id, _, _, signature, _ in signed
+    ])
+    earlier = list(duplicates - {log_id for log_id, *_ in signed})
+    if earlier:
+        cur.execute(f"UPDATE CallLogs SET NearDuplicate = 1 WHERE LogID IN ({', '.join(['%s'] * len(earlier))})",
+                    earlier)
+    bands = [(customer_id, category, band, bucket, log_id)
+             for log_id, customer_id, category, _, buckets in signed for band, bucket in buckets]
+    if bands:
+        cur.executemany("""
+            INSERT IGNORE INTO TranscriptLshBands (CustomerID, IssueCategory, BandNo, BucketHash, LogID)
+            VALUES (%s, %s, %s, %s, %s)
+        """, bands)
+    return pairs
+
+
+def backfill_call_signatures(batch_size: int = 500) -> int:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    ensure_calllog_schema(cur)
+    create_signature_tables(cur)
+    signed = 0
+    last_log_id = 0
+    try:
+        while True:
+            cur.execute("""
+                SELECT LogID, CustomerID, IssueCategory, CallTranscript FROM CallLogs
+                WHERE LogID > %s AND MinHashSignature IS NULL
+                ORDER BY LogID
+                LIMIT %s
+            """, (last_log_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            cur.execute("START TRANSACTION")
+            apply_call_signatures(cur, rows)
+            cur.execute("COMMIT")
+            last_log_id = rows[-1][0]
+            signed += len(rows)
+    finally:
+        conn.close()
+    return signed
+
+
 def seed_databases():
     root_cnx = get_mysql_conn(db=None)
     root_cur = root_cnx.cursor()
@@ -254,6 +1787,15 @@ def seed_databases():
     sql_cur.execute("DROP TABLE IF EXISTS Customers;")
     sql_cur.execute("DROP TABLE IF EXISTS CarePlan;")
     sql_cur.execute("DROP TABLE IF EXISTS CallLogs;")
+    sql_cur.execute("DROP TABLE IF EXISTS SalesChangeLog;")
+    sql_cur.execute("DROP TABLE IF EXISTS TranscriptKeywordCounts;")
+    sql_cur.execute("DROP TABLE IF EXISTS TranscriptKeywordCategories;")
+    sql_cur.execute("DROP TABLE IF EXISTS CallRollupHourly;")
+    sql_cur.execute("DROP TABLE IF EXISTS CallRollupDaily;")
+    sql_cur.execute("DROP TABLE IF EXISTS TranscriptLshBands;")
+    sql_cur.execute("DROP TABLE IF EXISTS CallSketches;")
+    sql_cur.execute("DROP TABLE IF EXISTS CallAnomalyState;")
+    sql_cur.execute("DROP TABLE IF EXISTS CallAnomalies;")
     sql_cur.execute("SET FOREIGN_KEY_CHECKS = 1;")
 
     sql_cur.execute("""
@@ -313,6 +1855,7 @@ def seed_databases():
          (2, 2, 1, 14.99, 14.99),
          (3, 3, 3, 24.99, 74.97)]
     )
+    create_sales_changelog(sql_cur)
 
     sql_cur.execute("""
     CREATE TABLE IF NOT EXISTS CarePlan (
@@ -362,9 +1905,22 @@ def seed_databases():
         row.get('CarePlanNotes')
         ))
     
-    sql_cur.execute("""
+    base_date = datetime.now() - timedelta(days=90)
+
+    if CALLLOGS_PARTITIONED:
+        # Partitioned InnoDB tables cannot carry foreign keys or FULLTEXT indexes, and
+        # every unique key must include the partitioning column.
+        calllog_keys = "PRIMARY KEY (LogID, CallDate),"
+        calllog_partitions = calllog_partition_clause(base_date, datetime.now())
+    else:
+        calllog_keys = """PRIMARY KEY (LogID),
+            FOREIGN KEY (CustomerID) REFERENCES Customers(Id) ON DELETE SET NULL,
+            FULLTEXT INDEX idx_transcript (CallTranscript),"""
+        calllog_partitions = ""
+
+    sql_cur.execute(f"""
         CREATE TABLE IF NOT EXISTS CallLogs (
-            LogID INT AUTO_INCREMENT PRIMARY KEY,
+            LogID INT AUTO_INCREMENT,
             CallDate DATETIME NOT NULL,
             CustomerID INT,
             AgentName VARCHAR(100),
@@ -378,13 +1934,13 @@ def seed_databases():
             CallTranscript TEXT,
             WaitTime INT,
             TransferCount INT DEFAULT 0,
-            FOREIGN KEY (CustomerID) REFERENCES Customers(Id) ON DELETE SET NULL,
+            {calllog_keys}
             INDEX idx_call_date (CallDate),
             INDEX idx_customer (CustomerID),
-            INDEX idx_category (IssueCategory),
-            FULLTEXT INDEX idx_transcript (CallTranscript)
-        );
+            INDEX idx_category (IssueCategory)
+        ){calllog_partitions};
     """)
+    ensure_calllog_schema(sql_cur)
 
     call_log_data = []
     agents = ['Sarah Chen', 'Mike Johnson', 'Emily Davis', 'James Wilson',
@@ -395,8 +1951,6 @@ def seed_databases():
                         'order_status', 'account', 'refund', 'general']
     resolution_statuses = ['resolved', 'escalated', 'pending', 'follow_up']
 
-    base_date = datetime.now() - timedelta(days=90)
-
     for i in range(300):
         call_date = base_date + timedelta(
             days=random.randint(0, 89),
@@ -428,16 +1982,24 @@ def seed_databases():
             transcript,
             random.randint(0, 300),
             random.randint(0, 3)
-        ))
+        ) + detect_transcript_markers(transcript) + (None,))
 
-    sql_cur.executemany("""
-        INSERT INTO CallLogs (CallDate, CustomerID, AgentName, CallDuration, CallType,
-                             CallStatus, IssueCategory, ResolutionStatus, SentimentScore,
-                             CallNotes, CallTranscript, WaitTime, TransferCount)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    sql_cur.executemany(f"""
+        INSERT INTO CallLogs ({", ".join(CALLLOG_INSERT_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(CALLLOG_INSERT_COLUMNS))})
     """, call_log_data)
 
+    create_keyword_tables(sql_cur)
+    create_rollup_tables(sql_cur)
+    apply_call_rollups(sql_cur, call_log_data)
+    create_signature_tables(sql_cur)
+    create_sketch_tables(sql_cur)
+    apply_call_sketches(sql_cur, call_log_data)
+    create_anomaly_tables(sql_cur)
+    apply_call_anomalies(sql_cur, call_log_data)
+
     sql_cnx.close()
+    backfill_call_signatures()
 
     pg_cnxn = get_pg_conn()
     pg_cnxn.autocommit = True
@@ -464,6 +2026,7 @@ def seed_databases():
     sales_cnxn.autocommit = True
     sales_cur = sales_cnxn.cursor()
     sales_cur.execute("DROP TABLE IF EXISTS sales;")
+    sales_cur.execute("DROP TABLE IF EXISTS sales_replication_state;")
     sales_cur.execute("""
                       CREATE TABLE sales
                       (
@@ -554,6 +2117,7 @@ def validate_product_exists(product_id: int) -> bool:
         return False
 
 
+@cached_lookup("customer", ("Customers",))
 def find_customer_by_name_enhanced(name: str) -> dict:
     try:
         mysql_cnxn = get_mysql_conn()
@@ -640,6 +2204,7 @@ def find_customer_by_name_enhanced(name: str) -> dict:
         return {"found": False, "error": f"Database error: {str(e)}"}
 
 
+@cached_lookup("product", ("products",))
 def find_product_by_name(name: str) -> dict:
     try:
         pg_cnxn = get_pg_conn()
@@ -672,7 +2237,180 @@ def find_product_by_name(name: str) -> dict:
         return {"found": False, "error": f"Database error: {str(e)}"}
 
 
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.92"))
+DEDUPE_MAX_BLOCK = int(os.getenv("DEDUPE_MAX_BLOCK", "200"))
+DEDUPE_WINDOW = int(os.getenv("DEDUPE_WINDOW", "20"))
+
+CUSTOMER_LAST_NAME_SQL = "COALESCE(NULLIF(TRIM(LastName), ''), SUBSTRING_INDEX(TRIM(Name), ' ', -1))"
+CUSTOMER_BLOCKING_KEYS = {
+    "last_name": f"LOWER({CUSTOMER_LAST_NAME_SQL})",
+    "email_domain": "CASE WHEN Email LIKE '%@%' THEN LOWER(SUBSTRING_INDEX(Email, '@', -1)) END",
+    "phonetic": f"CONCAT(SOUNDEX({CUSTOMER_LAST_NAME_SQL}), LEFT(LOWER(COALESCE(NULLIF(FirstName, ''), Name)), 1))",
+}
+
+
+def jaro_winkler(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    matched_b = [False] * len(b)
+    matches_a = []
+    for i, ch in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not matched_b[j] and b[j] == ch:
+                matched_b[j] = True
+                matches_a.append(ch)
+                break
+    if not matches_a:
+        return 0.0
+    matches_b = [b[j] for j in range(len(b)) if matched_b[j]]
+    m = len(matches_a)
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def normalize_customer(row) -> tuple:
+    customer_id, first_name, last_name, name, email = row
+    full_name = name or f"{first_name or ''} {last_name or ''}"
+    return customer_id, " ".join(re.sub(r"[^a-z ]", " ", full_name.lower()).split()), (email or "").strip().lower()
+
+
+def customer_similarity(a: tuple, b: tuple) -> float:
+    # a, b: normalize_customer tuples. Names drive the score; a shared email pulls it up and
+    # two different emails pull it down. A missing email is neutral ("Bob Smith" with and without).
+    score = jaro_winkler(a[1], b[1])
+    if a[2] and b[2]:
+        score = 1 - (1 - score) / 2 if a[2] == b[2] else score * 0.9
+    return score
+
+
+def find_duplicate_customers(threshold: float = DEDUPE_THRESHOLD) -> tuple:
+    # One streamed pass per blocking key, ordered by (key, name) so each block arrives
+    # contiguously and already sorted. Pairs are only compared within a block; blocks that
+    # grow past DEDUPE_MAX_BLOCK (e.g. a webmail domain) fall back to a sorted-neighbourhood
+    # window of DEDUPE_WINDOW rows, so the work stays linear in the number of customers.
+    conn = get_mysql_conn()
+    candidates = {}
+    stats = {"customers": 0, "blocks": 0, "windowed_blocks": 0, "comparisons": 0}
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM Customers")
+        stats["customers"] = cur.fetchone()[0]
+        for key_name, key_sql in CUSTOMER_BLOCKING_KEYS.items():
+            cur.execute(f"""
+                SELECT {key_sql} AS block_key, Id, FirstName, LastName, Name, Email
+                FROM Customers
+                WHERE {key_sql} IS NOT NULL AND {key_sql} <> ''
+                ORDER BY block_key, LOWER(Name), Id
+            """)
+            block_key, members, windowed = None, [], False
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows:
+                    break
+                for row in rows:
+                    record = normalize_customer(row[1:])
+                    if row[0] != block_key:
+                        block_key, members, windowed = row[0], [], False
+                        stats["blocks"] += 1
+                    for other in (members[-DEDUPE_WINDOW:] if windowed else members):
+                        stats["comparisons"] += 1
+                        score = customer_similarity(other, record)
+                        pair = (min(other[0], record[0]), max(other[0], record[0]))
+                        if score >= threshold and score > candidates.get(pair, (0,))[0]:
+                            candidates[pair] = (score, key_name)
+                    members.append(record)
+                    if len(members) > DEDUPE_MAX_BLOCK:
+                        if not windowed:
+                            stats["windowed_blocks"] += 1
+                        windowed = True
+                        del members[:-DEDUPE_WINDOW]
+        ids = sorted({i for pair in candidates for i in pair})
+        records = {}
+        for start in range(0, len(ids), 1000):
+            chunk = ids[start:start + 1000]
+            cur.execute(f"SELECT Id, Name, Email FROM Customers WHERE Id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            records.update({r[0]: {"Id": r[0], "Name": r[1], "Email": r[2]} for r in cur.fetchall()})
+    finally:
+        conn.close()
+    return candidates, records, stats
+
+
+def customer_merge_clusters(candidates: dict, records: dict) -> list:
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in candidates:
+        parent[find(a)] = find(b)
+    groups = {}
+    for customer_id in parent:
+        groups.setdefault(find(customer_id), []).append(customer_id)
+    clusters = []
+    for members in groups.values():
+        members = [m for m in members if m in records]
+        if len(members) < 2:
+            continue
+        # Keep the oldest record that has an email.
+        members.sort(key=lambda m: (not records[m]["Email"], m))
+        clusters.append({"survivor": members[0], "duplicates": members[1:]})
+    return sorted(clusters, key=lambda c: c["survivor"])
+
+
+def merge_customers(clusters: list) -> dict:
+    # All clusters merge in one transaction: sales, call logs and LSH bands move to the
+    # survivor before the duplicates are deleted (the Sales FK would otherwise cascade).
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    moved = {"sales": 0, "call_logs": 0, "customers_deleted": 0}
+    try:
+        ensure_sales_changelog(cur)
+        create_keyword_tables(cur)
+        cur.execute("START TRANSACTION")
+        for cluster in clusters:
+            survivor, duplicates = cluster["survivor"], cluster["duplicates"]
+            placeholders = ", ".join(["%s"] * len(duplicates))
+            cur.execute(f"SELECT Id FROM Sales WHERE customer_id IN ({placeholders}) FOR UPDATE", duplicates)
+            sale_ids = [r[0] for r in cur.fetchall()]
+            if sale_ids:
+                cur.execute(f"UPDATE Sales SET customer_id = %s WHERE customer_id IN ({placeholders})",
+                            [survivor] + duplicates)
+                log_sale_change(cur, sale_ids, "update")
+            cur.execute(f"UPDATE CallLogs SET CustomerID = %s WHERE CustomerID IN ({placeholders})",
+                        [survivor] + duplicates)
+            moved["call_logs"] += cur.rowcount
+            cur.execute(f"UPDATE IGNORE TranscriptLshBands SET CustomerID = %s WHERE CustomerID IN ({placeholders})",
+                        [survivor] + duplicates)
+            cur.execute(f"DELETE FROM TranscriptLshBands WHERE CustomerID IN ({placeholders})", duplicates)
+            cur.execute(f"DELETE FROM Customers WHERE Id IN ({placeholders})", duplicates)
+            moved["sales"] += len(sale_ids)
+            moved["customers_deleted"] += cur.rowcount
+        if moved["call_logs"]:
+            reset_transcript_keywords(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return moved
+
+
 @mcp.tool()
+@cached_tool("sqlserver_crud")
+@route_reads("sqlserver_crud")
 async def sqlserver_crud(
         operation: str,
         name: str = None,
@@ -681,7 +2419,34 @@ async def sqlserver_crud(
         customer_id: int = None,
         new_email: str = None,
         table_name: str = None,
+        merge: bool = False,
 ) -> Any:
+    if operation == "dedupe":
+        try:
+            candidates, records, stats = await asyncio.to_thread(find_duplicate_customers)
+            clusters = customer_merge_clusters(candidates, records)
+            merged = await asyncio.to_thread(merge_customers, clusters) if merge and clusters else None
+        except Exception as e:
+            return {"sql": None, "result": f"❌ Dedupe failed: {e}"}
+        pairs = sorted(candidates.items(), key=lambda item: -item[1][0])[:limit or None]
+        result = {
+            "candidates": [
+                {"customer": records.get(a), "duplicate": records.get(b), "similarity": round(score, 3), "block": block}
+                for (a, b), (score, block) in pairs
+            ],
+            "clusters": clusters,
+            **stats,
+        }
+        if merged:
+            result["merged"] = merged
+            result["message"] = (f"✅ Merged {merged['customers_deleted']} duplicate customers into "
+                                 f"{len(clusters)} records ({merged['sales']} sales re-pointed).")
+        elif clusters:
+            result["message"] = f"ℹ️ {len(clusters)} groups of likely duplicate customers found."
+        else:
+            result["message"] = "✅ No duplicate customers found."
+        return {"sql": None, "result": result}
+
     cnxn = get_mysql_conn()
     cur = cnxn.cursor()
 
@@ -781,7 +2546,7 @@ async def sqlserver_crud(
 
         if not customer_id and name:
             try:
-                customer_info = find_customer_by_name_enhanced(name)
+                customer_info = await asyncio.to_thread(find_customer_by_name_enhanced, name)
                 if not customer_info["found"]:
                     cnxn.close()
                     return {"sql": None, "result": f"❌ {customer_info['error']}"}
@@ -833,7 +2598,7 @@ async def sqlserver_crud(
 
         if not customer_id and name:
             try:
-                customer_info = find_customer_by_name_enhanced(name)
+                customer_info = await asyncio.to_thread(find_customer_by_name_enhanced, name)
                 if not customer_info["found"]:
                     cnxn.close()
                     return {"sql": None, "result": f"❌ {customer_info['error']}"}
@@ -863,6 +2628,13 @@ async def sqlserver_crud(
             cnxn.close()
             return {"sql": None, "result": "❌ 'customer_id' or 'name' required for delete."}
 
+        ensure_sales_changelog(cur)
+        cur.execute("START TRANSACTION")
+        cur.execute("SELECT Id FROM Sales WHERE customer_id = %s", (customer_id,))
+        log_sale_change(cur, [r[0] for r in cur.fetchall()], "delete")
+        cur.execute("DELETE FROM TranscriptLshBands WHERE CustomerID = %s", (customer_id,))
+        if CALLLOGS_PARTITIONED:
+            cur.execute("UPDATE CallLogs SET CustomerID = NULL WHERE CustomerID = %s", (customer_id,))
         sql_query = "DELETE FROM Customers WHERE Id = %s"
         cur.execute(sql_query, (customer_id,))
         cnxn.commit()
@@ -893,7 +2665,123 @@ async def sqlserver_crud(
         return {"sql": None, "result": f"❌ Unknown operation '{operation}'."}
 
 
+CONSISTENCY_FANOUT = int(os.getenv("CONSISTENCY_FANOUT", "16"))
+CONSISTENCY_LEAF_ROWS = int(os.getenv("CONSISTENCY_LEAF_ROWS", "256"))
+
+# Same canonical row text on both sides: prices at 4 decimals, NULL descriptions as ''.
+PRODUCT_ROW_TEXT = {
+    "mysql": "CONCAT_WS('|', id, name, CAST(price AS DECIMAL(14, 4)), COALESCE(description, ''))",
+    "pg": "concat_ws('|', id, name, CAST(price AS NUMERIC(14, 4)), COALESCE(description, ''))",
+}
+PRODUCT_ROW_HASH = {
+    "mysql": f"CAST(CONV(LEFT(MD5({PRODUCT_ROW_TEXT['mysql']}), 16), 16, 10) AS UNSIGNED)",
+    "pg": f"('x' || LEFT(md5({PRODUCT_ROW_TEXT['pg']}), 16))::bit(64)::bigint",
+}
+PRODUCT_TABLES = {"mysql": "ProductsCache", "pg": "products"}
+
+
+def product_range_digests(cur, side: str, lo: int, hi: int, width: int) -> dict:
+    # One round trip per side per level: (count, xor of row hashes) for each width-sized bucket.
+    cur.execute(f"""
+        SELECT FLOOR((id - %s) / %s) AS bucket, COUNT(*), {"BIT_XOR" if side == "mysql" else "bit_xor"}({PRODUCT_ROW_HASH[side]})
+        FROM {PRODUCT_TABLES[side]}
+        WHERE id BETWEEN %s AND %s
+        GROUP BY bucket
+    """, (lo, width, lo, hi))
+    return {int(b): (int(n), int(x) & 0xFFFFFFFFFFFFFFFF) for b, n, x in cur.fetchall()}
+
+
+def product_row_hashes(cur, side: str, lo: int, hi: int) -> dict:
+    cur.execute(f"SELECT id, {PRODUCT_ROW_HASH[side]} FROM {PRODUCT_TABLES[side]} WHERE id BETWEEN %s AND %s",
+                (lo, hi))
+    return {int(i): int(h) & 0xFFFFFFFFFFFFFFFF for i, h in cur.fetchall()}
+
+
+def check_products_consistency(repair: bool = False) -> dict:
+    # Merkle-style comparison of Postgres products (source of truth) against MySQL ProductsCache:
+    # id ranges are compared by digest, only mismatching ranges are split further, and only
+    # leaf ranges of at most CONSISTENCY_LEAF_ROWS ids are compared row by row.
+    mysql_cnxn, pg_cnxn = get_mysql_conn(), get_pg_conn()
+    try:
+        curs = {"mysql": mysql_cnxn.cursor(), "pg": pg_cnxn.cursor()}
+        bounds = []
+        for side, cur in curs.items():
+            cur.execute(f"SELECT MIN(id), MAX(id) FROM {PRODUCT_TABLES[side]}")
+            bounds.extend(b for b in cur.fetchone() if b is not None)
+        stats = {"ranges_compared": 0, "leaf_ranges": 0, "rows_hashed": 0, "round_trips": 2}
+        missing, extra, changed = [], [], []
+        if bounds:
+            pending = [(min(bounds), max(bounds))]
+            while pending:
+                lo, hi = pending.pop()
+                if hi - lo + 1 <= CONSISTENCY_LEAF_ROWS:
+                    source = product_row_hashes(curs["pg"], "pg", lo, hi)
+                    cache = product_row_hashes(curs["mysql"], "mysql", lo, hi)
+                    stats["leaf_ranges"] += 1
+                    stats["rows_hashed"] += len(source) + len(cache)
+                    stats["round_trips"] += 2
+                    missing.extend(i for i in source if i not in cache)
+                    extra.extend(i for i in cache if i not in source)
+                    changed.extend(i for i in source if i in cache and source[i] != cache[i])
+                    continue
+                width = -(-(hi - lo + 1) // CONSISTENCY_FANOUT)
+                source = product_range_digests(curs["pg"], "pg", lo, hi, width)
+                cache = product_range_digests(curs["mysql"], "mysql", lo, hi, width)
+                stats["ranges_compared"] += len(set(source) | set(cache))
+                stats["round_trips"] += 2
+                for bucket in set(source) | set(cache):
+                    if source.get(bucket) != cache.get(bucket):
+                        start = lo + bucket * width
+                        pending.append((start, min(hi, start + width - 1)))
+
+        result = {
+            "consistent": not (missing or extra or changed),
+            "missing_in_cache": sorted(missing),
+            "extra_in_cache": sorted(extra),
+            "changed": sorted(changed),
+            **stats,
+        }
+        if repair and not result["consistent"]:
+            result["repair"] = repair_products_cache(curs["pg"], mysql_cnxn, sorted(missing + changed), sorted(extra))
+        return result
+    finally:
+        mysql_cnxn.close()
+        pg_cnxn.close()
+
+
+def repair_products_cache(pg_cur, mysql_cnxn, upsert_ids: list, extra_ids: list) -> dict:
+    # Only the divergent rows are copied. Extra cache rows are deleted only when no sale still
+    # references them, since the Sales foreign key would cascade the delete into sales history.
+    rows = []
+    if upsert_ids:
+        pg_cur.execute("SELECT id, name, price, description FROM products WHERE id = ANY(%s)", (upsert_ids,))
+        rows = pg_cur.fetchall()
+    cur = mysql_cnxn.cursor()
+    referenced = set()
+    if extra_ids:
+        cur.execute(f"SELECT DISTINCT product_id FROM Sales WHERE product_id IN ({', '.join(['%s'] * len(extra_ids))})",
+                    extra_ids)
+        referenced = {r[0] for r in cur.fetchall()}
+    removable = [i for i in extra_ids if i not in referenced]
+    try:
+        cur.execute("START TRANSACTION")
+        if rows:
+            cur.executemany("""
+                INSERT INTO ProductsCache (id, name, price, description) VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE name = VALUES(name), price = VALUES(price), description = VALUES(description)
+            """, rows)
+        if removable:
+            cur.execute(f"DELETE FROM ProductsCache WHERE id IN ({', '.join(['%s'] * len(removable))})", removable)
+        mysql_cnxn.commit()
+    except Exception:
+        mysql_cnxn.rollback()
+        raise
+    return {"upserted": len(rows), "deleted": len(removable), "kept_referenced": sorted(referenced)}
+
+
 @mcp.tool()
+@cached_tool("postgresql_crud")
+@route_reads("postgresql_crud")
 async def postgresql_crud(
         operation: str,
         name: str = None,
@@ -903,7 +2791,23 @@ async def postgresql_crud(
         product_id: int = None,
         new_price: float = None,
         table_name: str = None,
+        repair: bool = False,
 ) -> Any:
+    if operation == "check_consistency":
+        try:
+            report = await asyncio.to_thread(check_products_consistency, repair)
+        except Exception as e:
+            return {"sql": None, "result": f"❌ Consistency check failed: {e}"}
+        if report["consistent"]:
+            report["message"] = "✅ ProductsCache matches products."
+        else:
+            divergent = len(report["missing_in_cache"]) + len(report["extra_in_cache"]) + len(report["changed"])
+            report["message"] = f"ℹ️ {divergent} product rows differ between products and ProductsCache."
+            if repair:
+                fixed = report["repair"]["upserted"] + report["repair"]["deleted"]
+                report["message"] = f"✅ Repaired {fixed} of {divergent} divergent product rows."
+        return {"sql": None, "result": report}
+
     cnxn = get_pg_conn()
     cur = cnxn.cursor()
 
@@ -947,7 +2851,7 @@ async def postgresql_crud(
 
     elif operation == "update":
         if not product_id and name:
-            product_info = find_product_by_name(name)
+            product_info = await asyncio.to_thread(find_product_by_name, name)
             if not product_info["found"]:
                 cnxn.close()
                 return {"sql": None, "result": f"❌ {product_info['error']}"}
@@ -970,7 +2874,7 @@ async def postgresql_crud(
 
     elif operation == "delete":
         if not product_id and name:
-            product_info = find_product_by_name(name)
+            product_info = await asyncio.to_thread(find_product_by_name, name)
             if not product_info["found"]:
                 cnxn.close()
                 return {"sql": None, "result": f"❌ {product_info['error']}"}
@@ -1017,7 +2921,488 @@ async def postgresql_crud(
         return {"sql": None, "result": f"❌ Unknown operation '{operation}'."}
 
 
+SALES_REPLICA_COLUMNS = ["id", "customer_id", "product_id", "quantity", "unit_price", "total_amount", "sale_date"]
+SALES_SOURCE_COLUMNS = ["Id", "customer_id", "product_id", "quantity", "unit_price", "total_price", "sale_date"]
+
+
+def create_sales_changelog(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS SalesChangeLog (
+            ChangeId BIGINT AUTO_INCREMENT PRIMARY KEY,
+            SaleId INT NOT NULL,
+            ChangeType VARCHAR(8) NOT NULL,
+            ChangedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+sales_changelog_ready = False
+
+
+def log_sale_change(cur, sale_ids, change_type: str):
+    # Called inside the writing transaction; the table is created beforehand because DDL
+    # would commit it early.
+    sale_ids = [sale_ids] if isinstance(sale_ids, int) else list(sale_ids)
+    if sale_ids:
+        cur.executemany("INSERT INTO SalesChangeLog (SaleId, ChangeType) VALUES (%s, %s)",
+                        [(sale_id, change_type) for sale_id in sale_ids])
+
+
+def ensure_sales_changelog(cur):
+    global sales_changelog_ready
+    if not sales_changelog_ready:
+        create_sales_changelog(cur)
+        sales_changelog_ready = True
+
+
+def ensure_sales_replica_schema(pg_cur):
+    pg_cur.execute("""
+        CREATE TABLE IF NOT EXISTS sales_replication_state (
+            source TEXT PRIMARY KEY,
+            last_sale_id BIGINT NOT NULL DEFAULT 0,
+            last_change_id BIGINT NOT NULL DEFAULT 0,
+            last_sale_date TIMESTAMP,
+            synced_at TIMESTAMP
+        );
+    """)
+    pg_cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_sale_date ON sales (sale_date)")
+    pg_cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales (customer_id)")
+    pg_cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_product ON sales (product_id)")
+
+
+def copy_sales_rows(pg_cur, rows: list):
+    # COPY the batch into a session-local staging table, then upsert it in one statement.
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(SALES_REPLICA_COLUMNS)
+    pg_cur.execute("CREATE TEMP TABLE IF NOT EXISTS sales_staging (LIKE sales) ON COMMIT DELETE ROWS")
+    pg_cur.copy_expert(f"COPY sales_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in SALES_REPLICA_COLUMNS[1:])
+    pg_cur.execute(f"""
+        INSERT INTO sales ({columns}) SELECT {columns} FROM sales_staging
+        ON CONFLICT (id) DO UPDATE SET {updates}
+    """)
+
+
+def sync_sales_replica(batch_size: int = None) -> dict:
+    # New sales are streamed by Id high-water mark; updates and deletes made through
+    # SalesChangeLog are replayed by re-reading the current MySQL row (or deleting it from the
+    # replica when it is gone). Every batch commits together with the advanced marks.
+    batch_size = batch_size or SALES_REPLICA_BATCH_SIZE
+    mysql_cnxn = get_mysql_conn()
+    mysql_cur = mysql_cnxn.cursor()
+    pg_cnxn = get_pg_sales_conn()
+    pg_cur = pg_cnxn.cursor()
+    stats = {"copied": 0, "changed": 0, "deleted": 0}
+    source_columns = ", ".join(SALES_SOURCE_COLUMNS)
+    try:
+        create_sales_changelog(mysql_cur)
+        ensure_sales_replica_schema(pg_cur)
+        pg_cur.execute("SELECT last_sale_id, last_change_id FROM sales_replication_state WHERE source = 'mysql'")
+        state = pg_cur.fetchone()
+        if state is None:
+            # First sync: the replica is rebuilt from scratch, and changes logged before the
+            # full copy are already reflected in it.
+            mysql_cur.execute("SELECT COALESCE(MAX(ChangeId), 0) FROM SalesChangeLog")
+            state = (0, mysql_cur.fetchone()[0])
+            pg_cur.execute("TRUNCATE sales")
+            pg_cur.execute("INSERT INTO sales_replication_state (source, last_change_id) VALUES ('mysql', %s)",
+                           (state[1],))
+            pg_cnxn.commit()
+        last_sale_id, last_change_id = state
+
+        while True:
+            mysql_cur.execute(f"SELECT {source_columns} FROM Sales WHERE Id > %s ORDER BY Id LIMIT %s",
+                              (last_sale_id, batch_size))
+            rows = mysql_cur.fetchall()
+            if not rows:
+                break
+            copy_sales_rows(pg_cur, rows)
+            last_sale_id = rows[-1][0]
+            pg_cur.execute("""
+                UPDATE sales_replication_state
+                SET last_sale_id = %s, last_sale_date = GREATEST(last_sale_date, %s), synced_at = NOW()
+                WHERE source = 'mysql'
+            """, (last_sale_id, max(r[6] for r in rows if r[6]) if any(r[6] for r in rows) else None))
+            pg_cnxn.commit()
+            stats["copied"] += len(rows)
+
+        while True:
+            mysql_cur.execute("""
+                SELECT ChangeId, SaleId FROM SalesChangeLog WHERE ChangeId > %s ORDER BY ChangeId LIMIT %s
+            """, (last_change_id, batch_size))
+            changes = mysql_cur.fetchall()
+            if not changes:
+                break
+            sale_ids = list({sale_id for _, sale_id in changes})
+            mysql_cur.execute(f"SELECT {source_columns} FROM Sales WHERE Id IN ({', '.join(['%s'] * len(sale_ids))})",
+                              sale_ids)
+            rows = mysql_cur.fetchall()
+            if rows:
+                copy_sales_rows(pg_cur, rows)
+            gone = list(set(sale_ids) - {r[0] for r in rows})
+            if gone:
+                pg_cur.execute("DELETE FROM sales WHERE id = ANY(%s)", (gone,))
+            last_change_id = changes[-1][0]
+            pg_cur.execute("""
+                UPDATE sales_replication_state SET last_change_id = %s, synced_at = NOW() WHERE source = 'mysql'
+            """, (last_change_id,))
+            pg_cnxn.commit()
+            stats["changed"] += len(rows)
+            stats["deleted"] += len(gone)
+    except Exception:
+        pg_cnxn.rollback()
+        raise
+    finally:
+        mysql_cnxn.close()
+        pg_cnxn.close()
+    if stats["copied"] or stats["changed"] or stats["deleted"]:
+        result_cache.invalidate(("sales_replica",))
+    stats.update(last_sale_id=last_sale_id, last_change_id=last_change_id)
+    return stats
+
+
+class SalesReplicator:
+    # Background task that keeps the PG sales database in step with MySQL Sales.
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.task = None
+        self.lock = threading.Lock()
+        self.last_result = None
+        self.last_error = None
+
+    def ensure_started(self):
+        if not SALES_REPLICA_ENABLED:
+            return
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def sync(self) -> dict:
+        with self.lock:
+            try:
+                self.last_result = sync_sales_replica()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            return self.last_result
+
+    async def _run(self):
+        read_replicas.set({})
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception:
+                pass
+            await asyncio.sleep(self.interval_seconds)
+
+
+sales_replicator = SalesReplicator(SALES_REPLICA_SYNC_SECONDS)
+
+SALES_AGGREGATE_GROUPS = {
+    "customer": ("customer_id", "customer_id"),
+    "product": ("product_id", "product_id"),
+    "day": ("DATE(sale_date)", "DATE(sale_date)"),
+    "month": ("CONCAT(YEAR(sale_date), '-', LPAD(MONTH(sale_date), 2, '0'))", "to_char(sale_date, 'YYYY-MM')"),
+}
+
+
+def aggregate_sales(group_by: str, source: str, start: datetime, end: datetime, limit: int = None) -> tuple:
+    # Same report on either side: MySQL Sales (primary) or the PG sales replica.
+    mysql_key, pg_key = SALES_AGGREGATE_GROUPS[group_by]
+    replica = source == "replica"
+    key = pg_key if replica else mysql_key
+    amount = "total_amount" if replica else "total_price"
+    clauses, params = date_range_clauses(start, end, "sale_date")
+    sql = f"""
+        SELECT {key} AS group_key, COUNT(*), SUM(quantity), SUM({amount})
+        FROM {"sales" if replica else "Sales"}
+        WHERE {" AND ".join(clauses) or "1=1"}
+        GROUP BY {key}
+        ORDER BY SUM({amount}) DESC
+        {f"LIMIT {int(limit)}" if limit else ""}
+    """
+    conn = get_pg_sales_conn() if replica else get_mysql_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        synced_at = None
+        if replica:
+            cur.execute("SELECT synced_at FROM sales_replication_state WHERE source = 'mysql'")
+            state = cur.fetchone()
+            synced_at = state[0].isoformat() if state and state[0] else None
+    finally:
+        conn.close()
+
+    names = {}
+    if group_by in ("customer", "product") and rows:
+        ids = [r[0] for r in rows]
+        table, column = ("Customers", "Name") if group_by == "customer" else ("ProductsCache", "name")
+        id_column = "Id" if group_by == "customer" else "id"
+        conn = get_mysql_conn()
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT {id_column}, {column} FROM {table} WHERE {id_column} IN ({', '.join(['%s'] * len(ids))})",
+                        ids)
+            names = dict(cur.fetchall())
+        finally:
+            conn.close()
+
+    result = []
+    for group_key, orders, units, revenue in rows:
+        entry = {group_by: group_key.isoformat() if hasattr(group_key, "isoformat") else group_key,
+                 "orders": orders, "units": int(units or 0), "revenue": round(float(revenue or 0), 2)}
+        if group_key in names:
+            entry["name"] = names[group_key]
+        result.append(entry)
+    return sql, result, synced_at
+
+
+def parse_sales_filters(where_clause: str, filter_conditions: dict, available_columns: dict) -> list:
+    # Turns the free-text where_clause (or filter_conditions) into (column, operator, value) triples
+    # over the s. (Sales), c. (Customers) and p. (products) aliases used by sales_crud read.
+    filters = []
+    if where_clause and where_clause.strip():
+        clause = where_clause.strip().lower()
+
+        price_patterns = [
+            r'total[_\s]*price[_\s]*(>|>=|exceed[s]?|above|greater\s+than|more\s+than)\s*\$?(\d+(?:\.\d+)?)',
+            r'(>|>=|exceed[s]?|above|greater\s+than|more\s+than)\s*\$?(\d+(?:\.\d+)?)\s*total[_\s]*price',
+            r'total[_\s]*price[_\s]*(<|<=|below|less\s+than|under)\s*\$?(\d+(?:\.\d+)?)',
+            r'total[_\s]*price[_\s]*(=|equals?|is)\s*\$?(\d+(?:\.\d+)?)'
+        ]
+
+        for pattern in price_patterns:
+            match = re.search(pattern, clause)
+            if match:
+                if len(match.groups()) == 2:
+                    operator_text, value = match.groups()
+                    if any(word in operator_text for word in ['exceed', 'above', 'greater', 'more', '>']):
+                        operator = '>'
+                    elif any(word in operator_text for word in ['below', 'less', 'under', '<']):
+                        operator = '<'
+                    elif any(word in operator_text for word in ['equal', 'is', '=']):
+                        operator = '='
+                    else:
+                        operator = '>'
+
+                    filters.append(("s.total_price", operator, float(value)))
+                    break
+
+        quantity_patterns = [
+            r'quantity[_\s]*(>|>=|greater\s+than|more\s+than|above)\s*(\d+)',
+            r'quantity[_\s]*(<|<=|less\s+than|below|under)\s*(\d+)',
+            r'quantity[_\s]*(=|equals?|is)\s*(\d+)'
+        ]
+
+        for pattern in quantity_patterns:
+            match = re.search(pattern, clause)
+            if match:
+                operator_text, value = match.groups()
+                if any(symbol in operator_text for symbol in ['>', 'greater', 'more', 'above']):
+                    operator = '>'
+                elif any(symbol in operator_text for symbol in ['<', 'less', 'below', 'under']):
+                    operator = '<'
+                else:
+                    operator = '='
+
+                filters.append(("s.quantity", operator, int(value)))
+                break
+
+        customer_patterns = [
+            r'customer[_\s]*name[_\s]*like[_\s]*["\']([^"\']+)["\']',
+            r'customer[_\s]*name[_\s]*=[_\s]*["\']([^"\']+)["\']',
+            r'customer[_\s]*=[_\s]*["\']([^"\']+)["\']',
+            r'customer[_\s]*name[_\s]*([a-zA-Z\s]+?)(?:\s|$)'
+        ]
+
+        for pattern in customer_patterns:
+            match = re.search(pattern, clause)
+            if match:
+                name_value = match.group(1).strip()
+                if 'like' in clause:
+                    filters.append(("c.Name", "LIKE", f"%{name_value}%"))
+                else:
+                    filters.append(("c.Name", "=", name_value))
+                break
+
+        product_patterns = [
+            r'product[_\s]*name[_\s]*like[_\s]*["\']([^"\']+)["\']',
+            r'product[_\s]*name[_\s]*=[_\s]*["\']([^"\']+)["\']',
+            r'product[_\s]*=[_\s]*["\']([^"\']+)["\']'
+        ]
+
+        for pattern in product_patterns:
+            match = re.search(pattern, clause)
+            if match:
+                product_value = match.group(1).strip()
+                if 'like' in clause:
+                    filters.append(("p.name", "LIKE", f"%{product_value}%"))
+                else:
+                    filters.append(("p.name", "=", product_value))
+                break
+
+        if not filters:
+            number_match = re.search(r'\$?(\d+(?:\.\d+)?)', clause)
+            if number_match:
+                value = float(number_match.group(1))
+                if any(word in clause for word in ['below', 'less', 'under']):
+                    filters.append(("s.total_price", "<", value))
+                else:
+                    filters.append(("s.total_price", ">", value))
+
+    elif filter_conditions:
+        for field, value in filter_conditions.items():
+            if field in available_columns:
+                db_field = available_columns[field]
+                if isinstance(value, str):
+                    filters.append((db_field, "LIKE", f"%{value}%"))
+                else:
+                    filters.append((db_field, "=", value))
+    return filters
+
+
+def sales_filter_clauses(filters: list) -> tuple:
+    return [f"{column} {operator} %s" for column, operator, _ in filters], [value for _, _, value in filters]
+
+
+FEDERATION_BATCH_SIZE = int(os.getenv("FEDERATION_BATCH_SIZE", "1000"))
+FEDERATION_QUEUE_BATCHES = int(os.getenv("FEDERATION_QUEUE_BATCHES", "4"))
+FEDERATION_BUILD_MAX_ROWS = int(os.getenv("FEDERATION_BUILD_MAX_ROWS", "100000"))
+# Id breaks ties between sales with the same timestamp, so the federated keyset paging and the
+# ProductsCache read return rows in the same order.
+SALES_READ_ORDER = "s.sale_date DESC, s.Id DESC"
+
+
+def federated_product_filters(filters: list) -> tuple:
+    # p.* predicates are pushed down to Postgres, case-insensitive like the MySQL collation. Only
+    # LIKE becomes a pattern match; an equality compares lowercased values, so % and _ stay literal.
+    clauses, params = [], []
+    for column, operator, value in filters:
+        column = column[len("p."):]
+        if isinstance(value, str) and operator == "LIKE":
+            clauses.append(f"{column} ILIKE %s")
+        elif isinstance(value, str):
+            clauses.append(f"lower({column}) {operator} lower(%s)")
+        else:
+            clauses.append(f"{column} {operator} %s")
+        params.append(value)
+    return clauses, params
+
+
+def federated_sales_read(selected_columns: list, filters: list, limit: int = None) -> tuple:
+    # Hash join of MySQL Sales (+ Customers) against live Postgres products on product_id.
+    # The build side (products, with p.* predicates pushed down and only the needed columns)
+    # loads while the probe side streams Sales newest-first in keyset batches into a bounded
+    # queue, in the same order as the ProductsCache read. A build side over FEDERATION_BUILD_MAX_ROWS is dropped in favour of per-batch
+    # lookups by product id, so neither side is ever held in memory whole.
+    product_columns = list(dict.fromkeys(c[2:] for c in selected_columns if c.startswith("p.")))
+    probe_columns = list(dict.fromkeys(["s.Id", "s.product_id", "s.sale_date"]
+                                       + [c for c in selected_columns if not c.startswith("p.")]))
+    build_clauses, build_params = federated_product_filters([f for f in filters if f[0].startswith("p.")])
+    probe_clauses, probe_params = sales_filter_clauses([f for f in filters if not f[0].startswith("p.")])
+
+    build_sql = f"""
+        SELECT {", ".join(["id"] + product_columns)} FROM products
+        WHERE {" AND ".join(build_clauses) or "TRUE"}
+    """
+    probe_sql = f"""
+        SELECT {", ".join(probe_columns)}
+        FROM Sales s
+        JOIN Customers c ON c.Id = s.customer_id
+        WHERE {" AND ".join(probe_clauses + ["{keyset}"])}
+        ORDER BY {SALES_READ_ORDER}
+        LIMIT %s
+    """
+    batches = queue.Queue(maxsize=FEDERATION_QUEUE_BATCHES)
+    stop = threading.Event()
+
+    def build():
+        conn = get_pg_conn()
+        try:
+            cur = conn.cursor(name="federation_build")
+            cur.itersize = FEDERATION_BATCH_SIZE
+            cur.execute(build_sql, build_params)
+            table = {}
+            for row in cur:
+                table[row[0]] = row[1:]
+                if len(table) > FEDERATION_BUILD_MAX_ROWS:
+                    return None
+            return table
+        finally:
+            conn.close()
+
+    def probe():
+        conn = get_mysql_conn()
+        cur = conn.cursor()
+        # Keyset on (sale_date, Id) descending; MySQL sorts NULL dates last.
+        keyset, keyset_params = "TRUE", []
+        try:
+            while not stop.is_set():
+                cur.execute(probe_sql.replace("{keyset}", keyset), probe_params + keyset_params + [FEDERATION_BATCH_SIZE])
+                rows = cur.fetchall()
+                if rows:
+                    batches.put(rows)
+                if len(rows) < FEDERATION_BATCH_SIZE:
+                    break
+                last_id, last_date = rows[-1][0], rows[-1][2]
+                if last_date is None:
+                    keyset, keyset_params = "s.sale_date IS NULL AND s.Id < %s", [last_id]
+                else:
+                    keyset = "(s.sale_date < %s OR (s.sale_date = %s AND s.Id < %s) OR s.sale_date IS NULL)"
+                    keyset_params = [last_date, last_date, last_id]
+        finally:
+            conn.close()
+            batches.put(None)
+
+    def lookup(product_ids: set) -> dict:
+        conn = get_pg_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(build_sql + " AND id = ANY(%s)", build_params + [list(product_ids)])
+            return {row[0]: row[1:] for row in cur.fetchall()}
+        finally:
+            conn.close()
+
+    positions = {c: i for i, c in enumerate(probe_columns)}
+    product_positions = {f"p.{c}": i for i, c in enumerate(product_columns)}
+    result = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        built = pool.submit(contextvars.copy_context().run, build)
+        probing = pool.submit(contextvars.copy_context().run, probe)
+        try:
+            table = built.result()
+            while True:
+                rows = batches.get()
+                if rows is None:
+                    break
+                products = table if table is not None else lookup({r[1] for r in rows})
+                for row in rows:
+                    product = products.get(row[1])
+                    if product is None:
+                        continue
+                    result.append(tuple(product[product_positions[c]] if c in product_positions else row[positions[c]]
+                                        for c in selected_columns))
+                    if limit and len(result) >= limit:
+                        break
+                if limit and len(result) >= limit:
+                    break
+        finally:
+            stop.set()
+            while not probing.done():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        probing.result()
+    return probe_sql.replace("{keyset}", "TRUE").strip() + ";\n" + build_sql.strip(), result
+
+
 @mcp.tool()
+@cached_tool("sales_crud")
+@route_reads("sales_crud")
 async def sales_crud(
         operation: str,
         customer_id: int = None,
@@ -1036,10 +3421,40 @@ async def sales_crud(
         columns: str = None,
         where_clause: str = None,
         filter_conditions: dict = None,
-        limit: int = None
+        limit: int = None,
+        group_by: str = None,
+        source: str = None,
+        date_range: str = None
 ) -> Any:
+    if operation == "aggregate":
+        if group_by not in SALES_AGGREGATE_GROUPS:
+            return {"sql": None, "result": f"❌ 'group_by' must be one of: {', '.join(SALES_AGGREGATE_GROUPS)}."}
+        source = source or ("replica" if SALES_REPLICA_ENABLED else "primary")
+        if source not in ("primary", "replica"):
+            return {"sql": None, "result": "❌ 'source' must be 'primary' or 'replica'."}
+        try:
+            start, end = parse_date_range(date_range) if date_range else (None, None)
+        except ValueError:
+            return {"sql": None, "result": f"❌ Unrecognized date_range '{date_range}'."}
+        sql, result, synced_at = await asyncio.to_thread(aggregate_sales, group_by, source, start, end, limit)
+        response = {"sql": sql, "result": result, "source": source}
+        if source == "replica":
+            response["replica_synced_at"] = synced_at
+        return response
+
+    elif operation == "sync_replica":
+        try:
+            stats = await asyncio.to_thread(sales_replicator.sync)
+        except Exception as e:
+            return {"sql": None, "result": f"❌ Replica sync failed: {e}"}
+        return {"sql": "COPY sales_staging FROM STDIN; INSERT INTO sales SELECT ... ON CONFLICT (id) DO UPDATE ...",
+                "result": f"✅ Sales replica synced: {stats['copied']} new, {stats['changed']} changed, "
+                          f"{stats['deleted']} deleted.", "state": stats}
+
     sales_cnxn = get_mysql_conn()
     sales_cur = sales_cnxn.cursor()
+    if operation in ("create", "update", "delete"):
+        ensure_sales_changelog(sales_cur)
 
     if operation == "create":
         if not customer_id or not product_id:
@@ -1074,7 +3489,9 @@ async def sales_crud(
             INSERT INTO Sales (customer_id, product_id, quantity, unit_price, total_price)
             VALUES (%s, %s, %s, %s, %s)
         """
+        sales_cur.execute("START TRANSACTION")
         sales_cur.execute(sql_query, (customer_id, product_id, quantity, unit_price, total_amount))
+        log_sale_change(sales_cur, sales_cur.lastrowid, "insert")
         sales_cnxn.commit()
 
         customer_name = get_customer_name(customer_id)
@@ -1094,7 +3511,9 @@ async def sales_crud(
                 total_price = unit_price * %s
             WHERE Id = %s
         """
+        sales_cur.execute("START TRANSACTION")
         sales_cur.execute(sql_query, (new_quantity, new_quantity, sale_id))
+        log_sale_change(sales_cur, sale_id, "update")
         sales_cnxn.commit()
         result = f"✅ Sale id={sale_id} updated to quantity {new_quantity}."
         sales_cnxn.close()
@@ -1106,7 +3525,9 @@ async def sales_crud(
             return {"sql": None, "result": "❌ 'sale_id' required for delete."}
 
         sql_query = "DELETE FROM Sales WHERE Id = %s"
+        sales_cur.execute("START TRANSACTION")
         sales_cur.execute(sql_query, (sale_id,))
+        log_sale_change(sales_cur, sale_id, "delete")
         sales_cnxn.commit()
         result = f"✅ Sale id={sale_id} deleted."
         sales_cnxn.close()
@@ -1179,147 +3600,36 @@ async def sales_crud(
         JOIN    ProductsCache  p ON p.id = s.product_id
         """
 
-        where_sql = ""
-        query_params = []
-
-        if where_clause and where_clause.strip():
-            import re
-            clause = where_clause.strip().lower()
-            where_conditions = []
-
-            price_patterns = [
-                r'total[_\s]*price[_\s]*(>|>=|exceed[s]?|above|greater\s+than|more\s+than)\s*\$?(\d+(?:\.\d+)?)',
-                r'(>|>=|exceed[s]?|above|greater\s+than|more\s+than)\s*\$?(\d+(?:\.\d+)?)\s*total[_\s]*price',
-                r'total[_\s]*price[_\s]*(<|<=|below|less\s+than|under)\s*\$?(\d+(?:\.\d+)?)',
-                r'total[_\s]*price[_\s]*(=|equals?|is)\s*\$?(\d+(?:\.\d+)?)'
-            ]
-
-            for pattern in price_patterns:
-                match = re.search(pattern, clause)
-                if match:
-                    if len(match.groups()) == 2:
-                        operator_text, value = match.groups()
-                        if any(word in operator_text for word in ['exceed', 'above', 'greater', 'more', '>']):
-                            operator = '>'
-                        elif any(word in operator_text for word in ['below', 'less', 'under', '<']):
-                            operator = '<'
-                        elif any(word in operator_text for word in ['equal', 'is', '=']):
-                            operator = '='
-                        else:
-                            operator = '>'
-
-                        where_conditions.append(f"s.total_price {operator} %s")
-                        query_params.append(float(value))
-                        break
-
-            quantity_patterns = [
-                r'quantity[_\s]*(>|>=|greater\s+than|more\s+than|above)\s*(\d+)',
-                r'quantity[_\s]*(<|<=|less\s+than|below|under)\s*(\d+)',
-                r'quantity[_\s]*(=|equals?|is)\s*(\d+)'
-            ]
-
-            for pattern in quantity_patterns:
-                match = re.search(pattern, clause)
-                if match:
-                    operator_text, value = match.groups()
-                    if any(symbol in operator_text for symbol in ['>', 'greater', 'more', 'above']):
-                        operator = '>'
-                    elif any(symbol in operator_text for symbol in ['<', 'less', 'below', 'under']):
-                        operator = '<'
-                    else:
-                        operator = '='
+        filters = parse_sales_filters(where_clause, filter_conditions, available_columns)
 
-                    where_conditions.append(f"s.quantity {operator} %s")
-                    query_params.append(int(value))
-                    break
-
-            customer_patterns = [
-                r'customer[_\s]*name[_\s]*like[_\s]*["\']([^"\']+)["\']',
-                r'customer[_\s]*name[_\s]*=[_\s]*["\']([^"\']+)["\']',
-                r'customer[_\s]*=[_\s]*["\']([^"\']+)["\']',
-                r'customer[_\s]*name[_\s]*([a-zA-Z\s]+?)(?:\s|$)'
-            ]
-
-            for pattern in customer_patterns:
-                match = re.search(pattern, clause)
-                if match:
-                    name_value = match.group(1).strip()
-                    if 'like' in clause:
-                        where_conditions.append("c.Name LIKE %s")
-                        query_params.append(f"%{name_value}%")
-                    else:
-                        where_conditions.append("c.Name = %s")
-                        query_params.append(name_value)
-                    break
-
-            product_patterns = [
-                r'product[_\s]*name[_\s]*like[_\s]*["\']([^"\']+)["\']',
-                r'product[_\s]*name[_\s]*=[_\s]*["\']([^"\']+)["\']',
-                r'product[_\s]*=[_\s]*["\']([^"\']+)["\']'
-            ]
-
-            for pattern in product_patterns:
-                match = re.search(pattern, clause)
-                if match:
-                    product_value = match.group(1).strip()
-                    if 'like' in clause:
-                        where_conditions.append("p.name LIKE %s")
-                        query_params.append(f"%{product_value}%")
-                    else:
-                        where_conditions.append("p.name = %s")
-                        query_params.append(product_value)
-                    break
-
-            if not where_conditions:
-                number_match = re.search(r'\$?(\d+(?:\.\d+)?)', clause)
-                if number_match:
-                    value = float(number_match.group(1))
-                    if any(word in clause for word in ['exceed', 'above', 'greater', 'more']):
-                        where_conditions.append("s.total_price > %s")
-                    elif any(word in clause for word in ['below', 'less', 'under']):
-                        where_conditions.append("s.total_price < %s")
-                    else:
-                        where_conditions.append("s.total_price > %s")
-
-                    query_params.append(value)
-
-            if where_conditions:
-                where_sql = " WHERE " + " AND ".join(where_conditions)
-
-        elif filter_conditions:
-            where_conditions = []
-            for field, value in filter_conditions.items():
-                if field in available_columns:
-                    db_field = available_columns[field]
-                    if isinstance(value, str):
-                        where_conditions.append(f"{db_field} LIKE %s")
-                        query_params.append(f"%{value}%")
-                    else:
-                        where_conditions.append(f"{db_field} = %s")
-                        query_params.append(value)
-
-            if where_conditions:
-                where_sql = " WHERE " + " AND ".join(where_conditions)
+        if source == "federated":
+            mysql_cnxn.close()
+            try:
+                sql, rows = await asyncio.to_thread(federated_sales_read, selected_columns, filters, limit)
+            except Exception as e:
+                return {"sql": None, "result": f"❌ Federated read failed: {str(e)}"}
+        else:
+            where_clauses, query_params = sales_filter_clauses(filters)
+            where_sql = (" WHERE " + " AND ".join(where_clauses)) if filters else ""
+            order_sql = f" ORDER BY {SALES_READ_ORDER}"
+            limit_sql = ""
+            if limit:
+                limit_sql = f" LIMIT {limit}"
 
-        order_sql = " ORDER BY s.sale_date DESC"
-        limit_sql = ""
-        if limit:
-            limit_sql = f" LIMIT {limit}"
+            sql = base_sql + where_sql + order_sql + limit_sql
 
-        sql = base_sql + where_sql + order_sql + limit_sql
+            try:
+                if query_params:
+                    mysql_cur.execute(sql, query_params)
+                else:
+                    mysql_cur.execute(sql)
 
-        try:
-            if query_params:
-                mysql_cur.execute(sql, query_params)
-            else:
-                mysql_cur.execute(sql)
+                rows = mysql_cur.fetchall()
+            except Exception as e:
+                mysql_cnxn.close()
+                return {"sql": sql, "result": f"❌ SQL Error: {str(e)}"}
 
-            rows = mysql_cur.fetchall()
-        except Exception as e:
             mysql_cnxn.close()
-            return {"sql": sql, "result": f"❌ SQL Error: {str(e)}"}
-
-        mysql_cnxn.close()
 
         processed_results = []
         for r in rows:
@@ -1368,6 +3678,8 @@ async def sales_crud(
 
 
 @mcp.tool()
+@cached_tool("careplan_crud")
+@route_reads("careplan_crud")
 async def careplan_crud(
         operation: str,
         columns: str = None,
@@ -1476,7 +3788,1445 @@ async def careplan_crud(
 
     return {"sql": sql, "result": results}
 
+KEYWORD_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'was', 'were', 'been', 'be', 'have',
+    'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'is', 'are', 'am', 'customer', 'agent', 'call', 'called'
+})
+KEYWORD_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+KEYWORD_STREAM_BATCH = 500
+KEYWORD_INGEST_LOCK_WAIT = 2
+
+
+def tokenize_transcript(transcript: str) -> list:
+    return [w[:64] for w in KEYWORD_TOKEN_RE.findall(transcript.lower())
+            if len(w) > 3 and w not in KEYWORD_STOP_WORDS]
+
+
+def create_keyword_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS TranscriptKeywordCounts (
+            IssueCategory VARCHAR(100) NOT NULL,
+            Keyword VARCHAR(64) NOT NULL,
+            Frequency INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (IssueCategory, Keyword)
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS TranscriptKeywordCategories (
+            IssueCategory VARCHAR(100) NOT NULL PRIMARY KEY,
+            CallCount INT NOT NULL DEFAULT 0,
+            LastLogID INT NOT NULL DEFAULT 0
+        );
+    """)
+
+
+def stream_transcript_keywords(after_log_id: int = 0, date_clauses: list = (), date_params: list = ()) -> tuple:
+    # Unbuffered cursor on a dedicated connection: transcripts are pulled from the
+    # server in batches and folded into per-category counters, so memory is bounded
+    # by the vocabulary rather than by the number of calls.
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    sql = "SELECT LogID, IssueCategory, CallTranscript FROM CallLogs WHERE " + " AND ".join(
+        ["LogID > %s", *date_clauses]) + " ORDER BY LogID"
+    keyword_counts = {}
+    call_counts = Counter()
+    last_log_ids = {}
+    try:
+        cur.execute(sql, (after_log_id, *date_params))
+        while True:
+            rows = cur.fetchmany(KEYWORD_STREAM_BATCH)
+            if not rows:
+                break
+            fold_transcript_keywords(rows, keyword_counts, call_counts, last_log_ids)
+    finally:
+        conn.close()
+    return sql, keyword_counts, call_counts, last_log_ids
+
+
+def fold_transcript_keywords(rows, keyword_counts: dict, call_counts: Counter, last_log_ids: dict):
+    # rows are (LogID, IssueCategory, CallTranscript) in LogID order.
+    for log_id, issue_cat, transcript in rows:
+        issue_cat = issue_cat or ""
+        call_counts[issue_cat] += 1
+        last_log_ids[issue_cat] = log_id
+        if transcript:
+            keyword_counts.setdefault(issue_cat, Counter()).update(tokenize_transcript(transcript))
+
+
+def write_transcript_keywords(cur, keyword_counts: dict, call_counts: Counter, last_log_ids: dict):
+    # GREATEST keeps the watermark from moving backwards when batches commit out of LogID order.
+    cur.executemany("""
+        INSERT INTO TranscriptKeywordCounts (IssueCategory, Keyword, Frequency)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE Frequency = Frequency + VALUES(Frequency)
+    """, [(cat, word, freq) for cat, counter in keyword_counts.items() for word, freq in counter.items()])
+    cur.executemany("""
+        INSERT INTO TranscriptKeywordCategories (IssueCategory, CallCount, LastLogID)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE CallCount = CallCount + VALUES(CallCount),
+                                LastLogID = GREATEST(LastLogID, VALUES(LastLogID))
+    """, [(cat, count, last_log_ids[cat]) for cat, count in call_counts.items()])
+
+
+def apply_transcript_keywords(cur, calls: list):
+    # Folds freshly ingested calls into the persisted counts inside the ingest transaction; the
+    # caller holds the transcript_keywords lock. Until the first analysis has built the counts
+    # there is nothing to keep current, and that build streams these calls anyway.
+    cur.execute("SELECT COALESCE(MAX(LastLogID), 0) FROM TranscriptKeywordCategories")
+    if not cur.fetchone()[0]:
+        return
+    keyword_counts, call_counts, last_log_ids = {}, Counter(), {}
+    fold_transcript_keywords(calls, keyword_counts, call_counts, last_log_ids)
+    write_transcript_keywords(cur, keyword_counts, call_counts, last_log_ids)
+
+
+def top_keywords(counter: Counter, top_k: int) -> list:
+    return heapq.nsmallest(top_k, counter.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def reset_transcript_keywords(cur):
+    # The counts are folded in past a LogID watermark, so rows that change or disappear below it
+    # can only be accounted for by a recount. Plain DELETEs so this joins the caller's transaction.
+    cur.execute("DELETE FROM TranscriptKeywordCounts")
+    cur.execute("DELETE FROM TranscriptKeywordCategories")
+
+
+def transcript_keywords_incremental(cur, top_k: int) -> tuple:
+    create_keyword_tables(cur)
+    cur.execute("SELECT GET_LOCK('transcript_keywords', 30)")
+    if cur.fetchall()[0][0] != 1:
+        # Another refresh holds the lock (or the wait timed out): stream without persisting.
+        return transcript_keyword_analysis(cur, top_k, False, [], [])
+    try:
+        cur.execute("SELECT COALESCE(MAX(LastLogID), 0), COALESCE(SUM(CallCount), 0) FROM TranscriptKeywordCategories")
+        watermark, counted = cur.fetchone()
+        cur.execute("SELECT COUNT(*) FROM CallLogs WHERE LogID <= %s", (watermark,))
+        # Calls below the watermark were deleted since they were counted.
+        recount = cur.fetchone()[0] != counted
+        _, keyword_counts, call_counts, last_log_ids = stream_transcript_keywords(0 if recount else watermark)
+
+        if call_counts or recount:
+            cur.execute("START TRANSACTION")
+            try:
+                if recount:
+                    reset_transcript_keywords(cur)
+                write_transcript_keywords(cur, keyword_counts, call_counts, last_log_ids)
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+    finally:
+        cur.execute("SELECT RELEASE_LOCK('transcript_keywords')")
+        cur.fetchall()
+
+    sql = """
+        SELECT k.IssueCategory, c.CallCount, k.Keyword, k.Frequency
+        FROM (
+            SELECT IssueCategory, Keyword, Frequency,
+                   ROW_NUMBER() OVER (PARTITION BY IssueCategory ORDER BY Frequency DESC, Keyword) AS KeywordRank
+            FROM TranscriptKeywordCounts
+        ) k
+        JOIN TranscriptKeywordCategories c ON c.IssueCategory = k.IssueCategory
+        WHERE k.KeywordRank <= %s
+        ORDER BY k.IssueCategory, k.KeywordRank
+    """
+    cur.execute(sql, (top_k,))
+    by_category = {}
+    for issue_cat, call_count, keyword, frequency in cur.fetchall():
+        entry = by_category.setdefault(issue_cat, {"IssueCategory": issue_cat or None,
+                                                   "CallCount": call_count, "TopKeywords": []})
+        entry["TopKeywords"].append({"keyword": keyword, "frequency": frequency})
+    return sql, list(by_category.values())
+
+
+RELATIVE_RANGE_RE = re.compile(r"^(?:last|past|previous)\s*(\d+)?\s*(minute|hour|day|week|month|year)s?$")
+RANGE_SEPARATOR_RE = re.compile(r"\s+(?:to|and|until|through)\s+|\s*\.\.\s*|\s+-\s+")
+RELATIVE_RANGE_UNITS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+
+def parse_range_point(value: str, is_end: bool = False) -> datetime:
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dt%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dt%H:%M"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    day = datetime.strptime(value, "%Y-%m-%d")
+    # A bare end date is inclusive of that whole day.
+    return day + timedelta(days=1) if is_end else day
+
+
+def parse_date_range(date_range: str, now: datetime = None) -> tuple:
+    # Returns a half-open (start, end) window; either side may be None.  Raises
+    # ValueError for text it does not understand.
+    now = now or datetime.now()
+    text = " ".join(date_range.strip().lower().split())
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if text == "today":
+        return today, today + timedelta(days=1)
+    if text == "yesterday":
+        return today - timedelta(days=1), today
+    if text == "this week":
+        return today - timedelta(days=today.weekday()), None
+    if text == "this month":
+        return today.replace(day=1), None
+    if text == "this year":
+        return today.replace(month=1, day=1), None
+
+    match = RELATIVE_RANGE_RE.match(text)
+    if match:
+        return now - int(match.group(1) or 1) * RELATIVE_RANGE_UNITS[match.group(2)], None
+
+    if text.startswith("since "):
+        return parse_range_point(text[6:]), None
+    if text.startswith("before "):
+        return None, parse_range_point(text[7:])
+
+    for prefix in ("between ", "from "):
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    parts = RANGE_SEPARATOR_RE.split(text)
+    if len(parts) == 2:
+        return parse_range_point(parts[0]), parse_range_point(parts[1], is_end=True)
+    if len(parts) == 1:
+        return parse_range_point(parts[0]), parse_range_point(parts[0], is_end=True)
+    raise ValueError(date_range)
+
+
+def date_range_clauses(start: datetime, end: datetime, column: str) -> tuple:
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= %s")
+        params.append(start)
+    if end:
+        clauses.append(f"{column} < %s")
+        params.append(end)
+    return clauses, params
+
+
+def rollup_source(start: datetime, end: datetime) -> tuple:
+    # Day-aligned windows read the daily rollup; anything finer reads the hourly one,
+    # widened to whole hours.
+    def is_midnight(value):
+        return value is None or value == value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if is_midnight(start) and is_midnight(end):
+        table = "CallRollupDaily"
+        start = start.date() if start else None
+        end = end.date() if end else None
+    else:
+        table = "CallRollupHourly"
+        start = start.replace(minute=0, second=0, microsecond=0) if start else None
+        if end and end != end.replace(minute=0, second=0, microsecond=0):
+            end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    clauses, params = date_range_clauses(start, end, "BucketStart")
+    return table, " AND ".join(clauses) or "1=1", params
+
+
+def transcript_match_sql(search_text: str) -> tuple:
+    if not CALLLOGS_PARTITIONED:
+        return "MATCH(cl.CallTranscript) AGAINST(%s IN NATURAL LANGUAGE MODE)", [search_text]
+    # No FULLTEXT on partitioned tables: score by the number of query terms present.
+    terms = KEYWORD_TOKEN_RE.findall(search_text.lower()) or [search_text.lower()]
+    return "(" + " + ".join("(cl.CallTranscript LIKE %s)" for _ in terms) + ")", [f"%{t}%" for t in terms]
+
+
+TRANSCRIPT_INDEX_EPOCH = datetime(1970, 1, 1)
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+
+def call_minute(call_date: datetime) -> int:
+    return int((call_date - TRANSCRIPT_INDEX_EPOCH).total_seconds() // 60)
+
+
+class TranscriptIndex:
+    # In-process BM25 inverted index over CallLogs.CallTranscript with positional postings.
+    # The merged index lives in a memory-mapped file laid out as
+    #   MAGIC | header length | JSON header | int32 region
+    # where the int32 region holds three parallel arrays sorted by LogID (ids, token
+    # lengths, call minute) followed by one postings run per term:
+    #   [doc_id, tf, pos_1 .. pos_tf] * df
+    # Documents added since the last save() sit in an in-memory delta that search() reads
+    # alongside the mapped base; save() merges both into a new file and swaps it in.
+    MAGIC = b"TIDX0001"
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.last_refresh = 0.0
+        self._reset()
+
+    def _reset(self):
+        # Drop every view into the mapping before closing it; mmap refuses to close while
+        # exported buffers are alive.
+        mm = getattr(self, "mm", None)
+        self.base_ids = self.base_lengths = self.base_minutes = self.ints = memoryview(array("i"))
+        if mm is not None:
+            mm.close()
+        self.header = {"doc_count": 0, "total_length": 0, "last_log_id": 0, "terms": {}}
+        self.delta_postings = {}
+        self.delta_docs = {}
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mm[:8] != self.MAGIC:
+                mm.close()
+                return
+            header_len = int.from_bytes(mm[8:12], "little")
+            header = json.loads(mm[12:12 + header_len])
+            ints_start = 12 + header_len + (-(12 + header_len) % 8)
+            ints = memoryview(mm)[ints_start:].cast("i")
+            n = header["doc_count"]
+            self.mm = mm
+            self.header = header
+            self.ints = ints
+            self.base_ids = ints[0:n]
+            self.base_lengths = ints[n:2 * n]
+            self.base_minutes = ints[2 * n:3 * n]
+
+    @property
+    def doc_count(self) -> int:
+        return self.header["doc_count"]
+
+    @property
+    def last_log_id(self) -> int:
+        return self.header["last_log_id"]
+
+    def _doc(self, doc_id: int):
+        if doc_id in self.delta_docs:
+            return self.delta_docs[doc_id]
+        i = bisect.bisect_left(self.base_ids, doc_id)
+        if i < len(self.base_ids) and self.base_ids[i] == doc_id:
+            return self.base_lengths[i], self.base_minutes[i]
+        return None
+
+    def _postings(self, term: str):
+        entry = self.header["terms"].get(term)
+        if entry:
+            offset, size = entry[0], entry[1]
+            run = self.ints[offset:offset + size]
+            i = 0
+            while i < size:
+                tf = run[i + 1]
+                yield run[i], run[i + 2:i + 2 + tf]
+                i += 2 + tf
+        yield from self.delta_postings.get(term, ())
+
+    def _df(self, term: str) -> int:
+        entry = self.header["terms"].get(term)
+        return (entry[2] if entry else 0) + len(self.delta_postings.get(term, ()))
+
+    def add_document(self, log_id: int, call_date: datetime, transcript: str):
+        with self.lock:
+            self.load()
+            if self._doc(log_id) is not None:
+                return
+            positions = {}
+            tokens = KEYWORD_TOKEN_RE.findall((transcript or "").lower())
+            for pos, token in enumerate(tokens):
+                positions.setdefault(token, []).append(pos)
+            for token, token_positions in positions.items():
+                self.delta_postings.setdefault(token, []).append((log_id, token_positions))
+            self.delta_docs[log_id] = (len(tokens), call_minute(call_date))
+            self.header["doc_count"] += 1
+            self.header["total_length"] += len(tokens)
+            self.header["last_log_id"] = max(self.header["last_log_id"], log_id)
+
+    def refresh(self, batch_size: int = KEYWORD_STREAM_BATCH) -> int:
+        # Streams calls newer than the indexed high-water mark into the delta.
+        self.load()
+        conn = get_mysql_conn()
+        cur = conn.cursor()
+        added = 0
+        try:
+            cur.execute("SELECT LogID, CallDate, CallTranscript FROM CallLogs WHERE LogID > %s ORDER BY LogID",
+                        (self.last_log_id,))
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for log_id, call_date, transcript in rows:
+                    self.add_document(log_id, call_date, transcript)
+                added += len(rows)
+        finally:
+            conn.close()
+        self.last_refresh = time.monotonic()
+        return added
+
+    def rebuild(self) -> int:
+        with self.lock:
+            self._reset()
+            self.loaded = True
+            added = self.refresh()
+            self.save()
+            return added
+
+    def search(self, query: str, limit: int, start: datetime = None, end: datetime = None) -> list:
+        phrases = [KEYWORD_TOKEN_RE.findall(p.lower()) for p in PHRASE_RE.findall(query)]
+        phrases = [p for p in phrases if p]
+        terms = list(dict.fromkeys(KEYWORD_TOKEN_RE.findall(PHRASE_RE.sub(" ", query).lower())
+                                   + [t for p in phrases for t in p]))
+        start_minute = call_minute(start) if start else None
+        end_minute = call_minute(end) if end else None
+
+        with self.lock:
+            self.load()
+            n_docs = self.doc_count
+            if not n_docs or not terms:
+                return []
+            avg_len = self.header["total_length"] / n_docs
+            scores = {}
+            term_positions = {}
+            phrase_terms = {t for p in phrases for t in p}
+            for term in terms:
+                df = self._df(term)
+                if not df:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, positions in self._postings(term):
+                    length, minute = self._doc(doc_id)
+                    if (start_minute is not None and minute < start_minute) or \
+                            (end_minute is not None and minute >= end_minute):
+                        continue
+                    tf = len(positions)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (
+                        tf + self.K1 * (1 - self.B + self.B * length / avg_len))
+                    if term in phrase_terms:
+                        term_positions.setdefault(term, {})[doc_id] = set(positions)
+
+            if phrases:
+                def has_phrase(doc_id, phrase):
+                    first = term_positions.get(phrase[0], {}).get(doc_id)
+                    if not first:
+                        return False
+                    return any(all(p + i in term_positions.get(t, {}).get(doc_id, ())
+                                   for i, t in enumerate(phrase[1:], 1)) for p in first)
+
+                scores = {d: s for d, s in scores.items() if all(has_phrase(d, p) for p in phrases)}
+
+            return heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+
+    def _copy_postings(self, term: str, ints: array) -> int:
+        # Kept out of save() so no slice of the old mapping outlives the copy.
+        start = len(ints)
+        for doc_id, positions in self._postings(term):
+            ints.append(doc_id)
+            ints.append(len(positions))
+            ints.extend(positions)
+        return len(ints) - start
+
+    def save(self):
+        with self.lock:
+            self.load()
+            docs = {}
+            for i in range(len(self.base_ids)):
+                docs[self.base_ids[i]] = (self.base_lengths[i], self.base_minutes[i])
+            docs.update(self.delta_docs)
+            doc_ids = sorted(docs)
+
+            ints = array("i", doc_ids)
+            ints.extend(docs[d][0] for d in doc_ids)
+            ints.extend(docs[d][1] for d in doc_ids)
+            terms = {}
+            for term in set(self.header["terms"]) | set(self.delta_postings):
+                offset = len(ints)
+                terms[term] = [offset, self._copy_postings(term, ints), self._df(term)]
+
+            header = json.dumps({"doc_count": len(doc_ids), "total_length": self.header["total_length"],
+                                 "last_log_id": self.header["last_log_id"], "terms": terms}).encode("utf-8")
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.MAGIC)
+                f.write(len(header).to_bytes(4, "little"))
+                f.write(header)
+                f.write(b"\0" * (-(12 + len(header)) % 8))
+                ints.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._reset()
+            os.replace(tmp_path, self.path)
+            self.loaded = False
+            self.load()
+
+    def stats(self) -> dict:
+        with self.lock:
+            self.load()
+            return {"path": self.path, "documents": self.doc_count, "last_log_id": self.last_log_id,
+                    "terms": len(set(self.header["terms"]) | set(self.delta_postings)),
+                    "unsaved_documents": len(self.delta_docs)}
+
+
+def transcript_snippet(transcript: str, terms: set, width: int = TRANSCRIPT_SNIPPET_WORDS) -> str:
+    if not transcript:
+        return ""
+    spans = [(m.start(), m.end(), m.group()) for m in KEYWORD_TOKEN_RE.finditer(transcript.lower())]
+    if not spans:
+        return transcript[:200]
+    hit = next((i for i, span in enumerate(spans) if span[2] in terms), 0)
+    first = max(0, hit - width // 3)
+    last = min(len(spans), first + width) - 1
+    snippet = transcript[spans[first][0]:spans[last][1]]
+    return ("..." if first > 0 else "") + snippet + ("..." if last < len(spans) - 1 else "")
+
+
+transcript_index = TranscriptIndex(TRANSCRIPT_INDEX_PATH)
+
+
+def get_transcript_index() -> TranscriptIndex:
+    transcript_index.load()
+    if transcript_index.doc_count == 0:
+        transcript_index.rebuild()
+    elif time.monotonic() - transcript_index.last_refresh > TRANSCRIPT_INDEX_REFRESH_SECONDS:
+        if transcript_index.refresh():
+            transcript_index.save()
+    return transcript_index
+
+
+ROLLUP_ANALYSES = {
+    "sentiment_by_agent": "AgentName",
+    "agent_performance": "AgentName",
+    "issue_frequency": "IssueCategory",
+    "escalation_analysis": "IssueCategory",
+    "call_volume_trends": "BucketStart",
+}
+ROLLUP_ANALYSIS_ORDER = {
+    "sentiment_by_agent": "AvgSentiment",
+    "agent_performance": "ResolutionRate",
+    "issue_frequency": "Frequency",
+    "escalation_analysis": "EscalationRate",
+    "call_volume_trends": "Date",
+}
+
+
+def rollup_totals_sql(group_column: str, table: str = "CallRollupDaily", where_sql: str = "1=1") -> str:
+    if group_column == "BucketStart" and table == "CallRollupHourly":
+        group_column = "DATE(BucketStart)"
+    sums = ", ".join(f"SUM({m}) AS {m}" for m in ROLLUP_MEASURES)
+    return f"SELECT {group_column}, {sums} FROM {table} WHERE {where_sql} GROUP BY {group_column}"
+
+
+def rollup_measures(values) -> dict:
+    return {m: (float(v) if m == "SumSentiment" else int(v)) for m, v in zip(ROLLUP_MEASURES, values)}
+
+
+def format_rollup_analysis(analysis_type: str, groups: list) -> list:
+    # groups: [(group_key, rollup_measures dict)]; reproduces the fields and ordering
+    # the per-call aggregate queries used to return.
+    def avg(total, count):
+        return round(total / count, 4) if count else 0
+
+    result = []
+    for key, t in groups:
+        key = key or None
+        calls = t["CallCount"]
+        if analysis_type == "sentiment_by_agent":
+            result.append({"AgentName": key, "AvgSentiment": avg(t["SumSentiment"], t["SentimentCount"]),
+                           "TotalCalls": calls, "PositiveCalls": t["PositiveCalls"]})
+        elif analysis_type == "agent_performance":
+            result.append({"AgentName": key, "TotalCalls": calls,
+                           "AvgCallDuration": avg(t["SumDuration"], calls),
+                           "AvgSentiment": avg(t["SumSentiment"], t["SentimentCount"]),
+                           "ResolutionRate": avg(t["ResolvedCalls"] * 100.0, calls),
+                           "AvgTransfers": avg(t["SumTransfers"], calls)})
+        elif analysis_type == "issue_frequency":
+            result.append({"IssueCategory": key, "Frequency": calls,
+                           "AvgDuration": avg(t["SumDuration"], calls),
+                           "ResolutionRate": avg(t["ResolvedCalls"] * 100.0, calls)})
+        elif analysis_type == "escalation_analysis":
+            if t["EscalatedCalls"] > 0:
+                result.append({"IssueCategory": key, "TotalCalls": calls, "EscalatedCalls": t["EscalatedCalls"],
+                               "EscalationRate": avg(t["EscalatedCalls"] * 100.0, calls)})
+        elif analysis_type == "call_volume_trends":
+            result.append({"Date": key.isoformat(), "CallCount": calls,
+                           "AvgWaitTime": avg(t["SumWait"], calls), "AvgDuration": avg(t["SumDuration"], calls)})
+
+    result.sort(key=lambda r: r[ROLLUP_ANALYSIS_ORDER[analysis_type]], reverse=True)
+    return result[:30] if analysis_type == "call_volume_trends" else result
+
+
+SKETCH_ANALYSES = ("call_percentiles", "distinct_customers")
+
+
+def call_sketch_groups(cur, start: datetime, end: datetime, agent_name: str = None) -> tuple:
+    # Sketches are per day, so the window is widened to whole days; each agent's days are
+    # merged in memory.
+    start = start.date() if start else None
+    if end:
+        end = end.date() if end == end.replace(hour=0, minute=0, second=0, microsecond=0) \
+            else end.date() + timedelta(days=1)
+    clauses, params = date_range_clauses(start, end, "SketchDay")
+    if agent_name:
+        clauses.append("AgentName = %s")
+        params.append(agent_name)
+    sql = f"""
+        SELECT AgentName, CallCount, DurationDigest, WaitDigest, CustomerHll
+        FROM CallSketches
+        WHERE {" AND ".join(clauses) or "1=1"}
+    """
+    cur.execute(sql, params)
+    groups = {}
+    for agent, count, duration, wait, customers in cur.fetchall():
+        if agent not in groups:
+            groups[agent] = [0, TDigest(), TDigest(), HyperLogLog()]
+        group = groups[agent]
+        group[0] += count
+        group[1].merge(TDigest.from_bytes(duration))
+        group[2].merge(TDigest.from_bytes(wait))
+        group[3].merge(HyperLogLog(registers=customers))
+    return sql, groups
+
+
+def format_sketch_analysis(analysis_type: str, groups: dict) -> list:
+    def quantiles(digest, prefix):
+        return {f"{prefix}{label}": None if (v := digest.quantile(q)) is None else round(v, 1)
+                for label, q in SKETCH_QUANTILES.items()}
+
+    result = []
+    if analysis_type == "call_percentiles":
+        for agent, (count, duration, wait, _) in groups.items():
+            result.append({"AgentName": agent, "TotalCalls": count,
+                           **quantiles(duration, "Duration"), **quantiles(wait, "Wait")})
+    elif analysis_type == "distinct_customers":
+        everyone = HyperLogLog()
+        for agent, (count, _, _, customers) in groups.items():
+            result.append({"AgentName": agent, "TotalCalls": count,
+                           "DistinctCustomers": customers.cardinality()})
+            everyone.merge(customers)
+        result.sort(key=lambda r: r["TotalCalls"], reverse=True)
+        result.append({"AgentName": "All agents", "TotalCalls": sum(g[0] for g in groups.values()),
+                       "DistinctCustomers": everyone.cardinality()})
+        return result
+    result.sort(key=lambda r: r["TotalCalls"], reverse=True)
+    return result
+
+
+def sentiment_trend(cur, start: datetime, end: datetime, window_days: int, step_days: int,
+                    agent_name: str = None) -> tuple:
+    # Rolling windows over the daily rollup. Step dates are laid out from the range start in
+    # Python, so they stay every step_days-th day even when some days have no calls; each
+    # window reaches window_days - 1 days back, so the scan starts that much earlier.
+    end = (end.date() if end == end.replace(hour=0, minute=0, second=0, microsecond=0)
+           else end.date() + timedelta(days=1)) if end else datetime.now().date() + timedelta(days=1)
+    start = start.date() if start else end - timedelta(days=90)
+    scan_start = start - timedelta(days=window_days - 1)
+    agent_sql = "AND AgentName = %s" if agent_name else ""
+    sql = f"""
+        SELECT AgentName, BucketStart, SUM(SumSentiment), SUM(SentimentCount), SUM(ResolvedCalls), SUM(CallCount)
+        FROM CallRollupDaily
+        WHERE BucketStart >= %s AND BucketStart < %s {agent_sql}
+        GROUP BY AgentName, BucketStart
+    """
+    cur.execute(sql, [scan_start, end] + ([agent_name] if agent_name else []))
+    days = max((end - scan_start).days, 0)
+    # Per agent, running totals of (sentiment sum, sentiment count, resolved, calls) by day.
+    totals = {}
+    for agent, day, sentiment_sum, sentiment_count, resolved, calls in cur.fetchall():
+        daily = totals.setdefault(agent, [[0.0] * 4 for _ in range(days + 1)])
+        daily[(day - scan_start).days + 1] = [float(sentiment_sum), int(sentiment_count), int(resolved), int(calls)]
+    for daily in totals.values():
+        for i in range(1, days + 1):
+            daily[i] = [a + b for a, b in zip(daily[i - 1], daily[i])]
+
+    steps = range((start - scan_start).days, days, step_days)
+    result = []
+    for agent, daily in totals.items():
+        points = []
+        for i in steps:
+            sentiment_sum, sentiment_count, resolved, calls = (
+                a - b for a, b in zip(daily[i + 1], daily[i + 1 - window_days]))
+            points.append({
+                "Date": (scan_start + timedelta(days=i)).isoformat(),
+                "RollingSentiment": round(sentiment_sum / sentiment_count, 4) if sentiment_count else None,
+                "RollingResolutionRate": round(resolved / calls * 100, 2) if calls else None,
+                "RollingCalls": int(calls)
+            })
+        result.append({"AgentName": agent, "WindowDays": window_days, "StepDays": step_days, "Series": points})
+    result.sort(key=lambda r: r["AgentName"] or "")
+    return sql, result
+
+
+def call_anomalies(cur, z_threshold: float, start: datetime, end: datetime, agent_name: str = None,
+                   issue_category: str = None, limit: int = 50) -> tuple:
+    # Closed hours come from CallAnomalies. A series whose open hour has already ended (it went
+    # quiet) is closed up to now on a copy of its state, so the drop shows up before the next
+    # call persists the same rows; an open hour that is the current one is scored live so a
+    # spike shows up before the hour ends.
+    series_filters = [("agent", agent_name), ("category", issue_category)]
+    series_filters = [f for f in series_filters if f[1]]
+    series_sql = " OR ".join(["(SeriesType = %s AND SeriesKey = %s)"] * len(series_filters)) or "1=1"
+    series_params = [value for f in series_filters for value in f]
+    date_clauses, date_params = date_range_clauses(start, end, "BucketStart")
+    sql = f"""
+        SELECT SeriesType, SeriesKey, BucketStart, Metric, Observed, Expected, ZScore
+        FROM CallAnomalies
+        WHERE ABS(ZScore) >= %s AND ({series_sql}) AND {" AND ".join(date_clauses) or "1=1"}
+        ORDER BY BucketStart DESC
+        LIMIT %s
+    """
+    cur.execute(sql, [z_threshold] + series_params + list(date_params) + [limit])
+    result = [{
+        "SeriesType": r[0], "SeriesKey": r[1], "Hour": r[2].isoformat(), "Metric": r[3],
+        "Observed": round(r[4], 3), "Expected": round(r[5], 3), "ZScore": round(r[6], 2), "InProgress": False
+    } for r in cur.fetchall()]
+
+    def in_range(hour):
+        return (not start or hour >= start) and (not end or hour < end)
+
+    now_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    cur.execute(f"""
+        SELECT SeriesType, SeriesKey, {", ".join(ANOMALY_STATE_COLUMNS)} FROM CallAnomalyState
+        WHERE CurrentHour IS NOT NULL AND ({series_sql})
+    """, series_params)
+    for r in cur.fetchall():
+        state = dict(zip(ANOMALY_STATE_COLUMNS, r[2:]))
+        if state["CurrentHour"] < now_hour:
+            closed = []
+            advance_anomaly_hour(tuple(r[:2]), state, now_hour, closed)
+            result.extend({
+                "SeriesType": a[0], "SeriesKey": a[1], "Hour": a[2].isoformat(), "Metric": a[3],
+                "Observed": round(a[4], 3), "Expected": round(a[5], 3), "ZScore": round(a[6], 2),
+                "InProgress": False
+            } for a in closed if abs(a[6]) >= z_threshold and in_range(a[2]))
+            continue
+        if state["HoursObserved"] < ANOMALY_WARMUP_HOURS or not in_range(state["CurrentHour"]):
+            continue
+        # A partial hour can only be judged on the high side for volume.
+        z = anomaly_z("volume", state["HourCalls"], state["VolumeMean"], state["VolumeVar"])
+        checks = [("volume", state["HourCalls"], state["VolumeMean"], z if z > 0 else 0)]
+        if state["HourSentimentCount"] and state["SentimentMean"] is not None:
+            sentiment = state["HourSentimentSum"] / state["HourSentimentCount"]
+            checks.append(("sentiment", sentiment, state["SentimentMean"],
+                           anomaly_z("sentiment", sentiment, state["SentimentMean"], state["SentimentVar"])))
+        for metric, observed, expected, z in checks:
+            if abs(z) >= z_threshold:
+                result.insert(0, {
+                    "SeriesType": r[0], "SeriesKey": r[1], "Hour": state["CurrentHour"].isoformat(),
+                    "Metric": metric, "Observed": round(observed, 3), "Expected": round(expected, 3),
+                    "ZScore": round(z, 2), "InProgress": True
+                })
+    result.sort(key=lambda a: (a["InProgress"], a["Hour"]), reverse=True)
+    return sql, result[:limit]
+
+
+MARKER_ANALYSES = {
+    "transcript_sentiment": ("IssueCategory",),
+    "agent_communication": ("AgentName",),
+    "problem_patterns": ("IssueCategory", "ResolutionStatus"),
+}
+MARKER_MEASURES = ["TotalCalls", "SumSentiment", "SentimentCount", "SumDuration", "DurationCount",
+                   "SumTranscriptLength"] + list(TRANSCRIPT_MARKERS) + ["NearDuplicate"]
+
+
+def marker_totals_sql(group_columns, where_sql: str = "1=1") -> str:
+    columns = ", ".join(group_columns)
+    flags = ", ".join(f"SUM({column})" for column in TRANSCRIPT_MARKERS)
+    return f"""
+        SELECT {columns},
+               COUNT(*), COALESCE(SUM(SentimentScore), 0), COUNT(SentimentScore),
+               COALESCE(SUM(CallDuration), 0), COUNT(CallDuration), SUM(TranscriptLength),
+               {flags}, SUM(NearDuplicate)
+        FROM CallLogs
+        WHERE {where_sql}
+        GROUP BY {columns}
+    """
+
+
+def pending_marker_backfill(cur, where_sql: str, params: list) -> tuple:
+    # Calls stored before the marker columns existed (or under an older TRANSCRIPT_MARKERS) read
+    # as all zeros until backfill_markers has run; the marker analyses say so instead.
+    sql = f"SELECT COUNT(*) FROM CallLogs WHERE MarkersVersion < %s AND {where_sql}"
+    cur.execute(sql, [TRANSCRIPT_MARKERS_VERSION, *params])
+    pending = cur.fetchone()[0]
+    if not pending:
+        return sql, None
+    return sql, (f"ℹ️ Language markers are not computed yet for {pending} call log(s) in this range; "
+                 f"run operation 'backfill_markers' first.")
+
+
+def marker_measures(values) -> dict:
+    return {m: (float(v) if m == "SumSentiment" else int(v)) for m, v in zip(MARKER_MEASURES, values)}
+
+
+def merge_measure_groups(rows: list, key_fn) -> list:
+    # Re-aggregates finer (keys, measures) groups onto a coarser key; every measure is a
+    # count or a sum, so merging is plain addition.
+    merged = {}
+    for keys, measures in rows:
+        totals = merged.setdefault(key_fn(keys), dict.fromkeys(measures, 0))
+        for name, value in measures.items():
+            totals[name] += value
+    return list(merged.items())
+
+
+def format_marker_analysis(analysis_type: str, groups: list) -> list:
+    # groups: [(key tuple in MARKER_ANALYSES order, marker_measures dict)]
+    def rate(count, total):
+        return round((count / total) * 100, 2) if total > 0 else 0
+
+    def avg(total, count):
+        return round(total / count, 4) if count else 0
+
+    result = []
+    for key, t in groups:
+        calls = t["TotalCalls"]
+        if analysis_type == "transcript_sentiment":
+            result.append({
+                "IssueCategory": key[0],
+                "AvgSentiment": avg(t["SumSentiment"], t["SentimentCount"]),
+                "NegativeLanguageCount": t["HasNegative"],
+                "PositiveLanguageCount": t["HasPositive"],
+                "TotalCalls": calls,
+                "PositiveLanguageRate": rate(t["HasPositive"], calls),
+                "NegativeLanguageRate": rate(t["HasNegative"], calls)
+            })
+        elif analysis_type == "agent_communication":
+            result.append({
+                "AgentName": key[0],
+                "TotalCalls": calls,
+                "AvgTranscriptLength": round(t["SumTranscriptLength"] / calls) if calls else 0,
+                "ApologyRate": rate(t["HasApology"], calls),
+                "SolutionOrientedRate": rate(t["HasSolution"], calls),
+                "EscalationRate": rate(t["HasEscalation"], calls),
+                "AvgDuration": avg(t["SumDuration"], t["DurationCount"])
+            })
+        elif analysis_type == "problem_patterns":
+            if calls > 5:
+                result.append({
+                    "IssueCategory": key[0],
+                    "ResolutionStatus": key[1],
+                    "Frequency": calls,
+                    "RecurringIssueCount": t["NearDuplicate"],
+                    "RecurringIssueRate": rate(t["NearDuplicate"], calls),
+                    "AvgSentiment": avg(t["SumSentiment"], t["SentimentCount"])
+                })
+
+    if analysis_type == "agent_communication":
+        result.sort(key=lambda r: r["TotalCalls"], reverse=True)
+    elif analysis_type == "problem_patterns":
+        result.sort(key=lambda r: r["Frequency"], reverse=True)
+    return result
+
+
+def recurring_clusters(cur, issue_category: str, date_clauses: list, date_params: list, limit: int) -> tuple:
+    # Only buckets holding two or more calls are read (index-only on TranscriptLshBands); the
+    # candidate pairs are verified against the stored signatures and joined by union-find.
+    category_sql = "WHERE IssueCategory = %s" if issue_category else ""
+    sql = f"""
+        SELECT b.LogID, b.BandNo, b.CustomerID, b.IssueCategory, b.BucketHash
+        FROM TranscriptLshBands b
+        JOIN (
+            SELECT CustomerID, IssueCategory, BandNo, BucketHash
+            FROM TranscriptLshBands {category_sql}
+            GROUP BY CustomerID, IssueCategory, BandNo, BucketHash
+            HAVING COUNT(*) > 1
+        ) shared USING (CustomerID, IssueCategory, BandNo, BucketHash)
+    """
+    cur.execute(sql, [issue_category] if issue_category else [])
+    buckets = {}
+    for log_id, *key in cur.fetchall():
+        buckets.setdefault(tuple(key), []).append(log_id)
+
+    log_ids = sorted({i for ids in buckets.values() for i in ids})
+    calls = {}
+    for i in range(0, len(log_ids), 1000):
+        chunk = log_ids[i:i + 1000]
+        cur.execute(f"""
+            SELECT cl.LogID, cl.CallDate, cl.CustomerID, c.Name, cl.IssueCategory, cl.MinHashSignature
+            FROM CallLogs cl
+            LEFT JOIN Customers c ON cl.CustomerID = c.Id
+            WHERE cl.LogID IN ({', '.join(['%s'] * len(chunk))})
+              AND {" AND ".join(f"cl.{clause}" for clause in date_clauses) or "1=1"}
+        """, chunk + list(date_params))
+        for log_id, call_date, customer_id, name, category, blob in cur.fetchall():
+            calls[log_id] = (call_date, customer_id, name, category, decode_signature(blob))
+
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    similarities = {}
+    for ids in buckets.values():
+        ids = [i for i in ids if i in calls and calls[i][4]]
+        for a_pos, a in enumerate(ids):
+            for b in ids[a_pos + 1:]:
+                pair = (min(a, b), max(a, b))
+                if pair in similarities:
+                    continue
+                similarities[pair] = signature_similarity(calls[a][4], calls[b][4])
+                if similarities[pair] >= NEAR_DUPLICATE_SIMILARITY:
+                    parent[find(a)] = find(b)
+
+    clusters = {}
+    for a, b in similarities:
+        if similarities[(a, b)] >= NEAR_DUPLICATE_SIMILARITY:
+            members = clusters.setdefault(find(a), {"calls": set(), "similarities": []})
+            members["calls"].update((a, b))
+            members["similarities"].append(similarities[(a, b)])
+
+    result = []
+    for members in clusters.values():
+        ids = sorted(members["calls"])
+        dates = [calls[i][0] for i in ids]
+        _, customer_id, name, category, _ = calls[ids[0]]
+        result.append({
+            "CustomerID": customer_id,
+            "CustomerName": name,
+            "IssueCategory": category,
+            "CallCount": len(ids),
+            "LogIDs": ids,
+            "FirstCall": min(dates).isoformat(),
+            "LastCall": max(dates).isoformat(),
+            "AvgSimilarity": round(sum(members["similarities"]) / len(members["similarities"]), 3)
+        })
+    result.sort(key=lambda r: (r["CallCount"], r["LastCall"]), reverse=True)
+    return sql, result[:limit]
+
+
+def transcript_keyword_analysis(cur, top_k: int, incremental: bool, date_clauses: list, date_params: list) -> tuple:
+    # Persisted counts cover all history, so a date window always streams.
+    if incremental and not date_clauses:
+        return transcript_keywords_incremental(cur, top_k)
+    sql, keyword_counts, call_counts, _ = stream_transcript_keywords(0, date_clauses, date_params)
+    return sql, [{
+        "IssueCategory": issue_cat or None,
+        "CallCount": call_count,
+        "TopKeywords": [{"keyword": k, "frequency": v}
+                        for k, v in top_keywords(keyword_counts.get(issue_cat, Counter()), top_k)]
+    } for issue_cat, call_count in call_counts.items()]
+
+
+CALLLOG_INGEST_FIELDS = {
+    "call_date": "CallDate",
+    "customer_id": "CustomerID",
+    "agent_name": "AgentName",
+    "call_duration": "CallDuration",
+    "call_type": "CallType",
+    "call_status": "CallStatus",
+    "issue_category": "IssueCategory",
+    "resolution_status": "ResolutionStatus",
+    "sentiment_score": "SentimentScore",
+    "call_notes": "CallNotes",
+    "call_transcript": "CallTranscript",
+    "wait_time": "WaitTime",
+    "transfer_count": "TransferCount",
+    "ingest_key": "IngestKey",
+}
+# Limits of the CallLogs columns (characters for VARCHAR, bytes for TEXT); a strict-mode
+# server rejects the whole INSERT when one row exceeds them.
+CALLLOG_TEXT_LIMITS = {
+    "AgentName": 100,
+    "CallType": 50,
+    "CallStatus": 50,
+    "IssueCategory": 100,
+    "ResolutionStatus": 50,
+    "CallNotes": 65535,
+    "CallTranscript": 65535,
+}
+CALLLOG_INT_COLUMNS = ("CustomerID", "CallDuration", "WaitTime", "TransferCount")
+
+
+def normalize_call_log(call: dict) -> tuple:
+    # Returns a CallLogs row in CALLLOG_INSERT_COLUMNS order (markers included);
+    # raises ValueError on input the table would reject.
+    if not isinstance(call, dict):
+        raise TypeError("each call must be an object")
+    values = {column: call.get(field, call.get(column)) for field, column in CALLLOG_INGEST_FIELDS.items()}
+    if not values["AgentName"]:
+        raise ValueError("'agent_name' is required")
+    for column, limit in CALLLOG_TEXT_LIMITS.items():
+        value = values[column]
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise TypeError(f"'{column}' must be a string")
+        size = len(value.encode("utf-8")) if limit == 65535 else len(value)
+        if size > limit:
+            raise ValueError(f"'{column}' is longer than {limit} {'bytes' if limit == 65535 else 'characters'}")
+
+    call_date = values["CallDate"]
+    if not call_date:
+        call_date = datetime.now()
+    elif not isinstance(call_date, datetime):
+        call_date = datetime.fromisoformat(str(call_date))
+    values["CallDate"] = call_date.replace(tzinfo=None, microsecond=0)
+
+    for column in CALLLOG_INT_COLUMNS:
+        if values[column] is not None:
+            if isinstance(values[column], bool):
+                raise TypeError(f"'{column}' must be a number")
+            values[column] = int(values[column])
+            if not -2 ** 31 <= values[column] < 2 ** 31:
+                raise ValueError(f"'{column}' is out of range")
+    values["CallDuration"] = values["CallDuration"] or 0
+    values["WaitTime"] = values["WaitTime"] or 0
+    values["TransferCount"] = values["TransferCount"] or 0
+    if values["SentimentScore"] is not None:
+        score = float(values["SentimentScore"])
+        if math.isnan(score):
+            raise ValueError("'SentimentScore' must be a number")
+        values["SentimentScore"] = max(-1.0, min(1.0, round(score, 2)))
+
+    # The ingest key makes replays idempotent; callers can pass their telephony call id.
+    ingest_key = str(values["IngestKey"] or call.get("call_id") or uuid.uuid4().hex)[:64]
+
+    base = tuple(values[column] for column in CALLLOG_INSERT_COLUMNS[:len(CALLLOG_INGEST_FIELDS) - 1])
+    return base + detect_transcript_markers(values["CallTranscript"]) + (ingest_key,)
+
+
+def write_call_log_batch(rows: list) -> dict:
+    # One transaction per batch: the multi-row INSERT and the rollup upserts commit together.
+    # Rows whose IngestKey is already stored are skipped, so a batch can be replayed safely.
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    customer_pos = CALLLOG_INSERT_COLUMNS.index("CustomerID")
+    key_pos = CALLLOG_INSERT_COLUMNS.index("IngestKey")
+    category_pos = CALLLOG_INSERT_COLUMNS.index("IssueCategory")
+    transcript_pos = CALLLOG_INSERT_COLUMNS.index("CallTranscript")
+    stats = {"inserted": 0, "duplicates": 0, "unknown_customers": 0}
+    keywords_locked = False
+    try:
+        # Held past COMMIT so a concurrent keyword refresh never streams these calls as well. While a
+        # long refresh holds it the batch skips the counts, and the refresh's recount repairs them.
+        cur.execute(f"SELECT GET_LOCK('transcript_keywords', {KEYWORD_INGEST_LOCK_WAIT})")
+        keywords_locked = cur.fetchone()[0] == 1
+        cur.execute("START TRANSACTION")
+        keys = [row[key_pos] for row in rows]
+        cur.execute(f"SELECT IngestKey FROM CallLogs WHERE IngestKey IN ({', '.join(['%s'] * len(keys))})", keys)
+        seen = {r[0] for r in cur.fetchall()}
+        fresh = []
+        for row in rows:
+            if row[key_pos] in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(row[key_pos])
+            fresh.append(row)
+        rows = fresh
+
+        customer_ids = {row[customer_pos] for row in rows if row[customer_pos] is not None}
+        if customer_ids:
+            cur.execute(f"SELECT Id FROM Customers WHERE Id IN ({', '.join(['%s'] * len(customer_ids))})",
+                        list(customer_ids))
+            known = {r[0] for r in cur.fetchall()}
+            if known != customer_ids:
+                fixed = []
+                for row in rows:
+                    if row[customer_pos] is not None and row[customer_pos] not in known:
+                        row = row[:customer_pos] + (None,) + row[customer_pos + 1:]
+                        stats["unknown_customers"] += 1
+                    fixed.append(row)
+                rows = fixed
+
+        if rows:
+            row_placeholders = "(" + ", ".join(["%s"] * len(CALLLOG_INSERT_COLUMNS)) + ")"
+            cur.execute(
+                f"INSERT INTO CallLogs ({', '.join(CALLLOG_INSERT_COLUMNS)}) VALUES "
+                + ", ".join([row_placeholders] * len(rows)),
+                [value for row in rows for value in row]
+            )
+            apply_call_rollups(cur, rows)
+            apply_call_sketches(cur, rows)
+            apply_call_anomalies(cur, rows)
+            cur.execute(f"SELECT LogID, IngestKey FROM CallLogs WHERE IngestKey IN ({', '.join(['%s'] * len(rows))})",
+                        [row[key_pos] for row in rows])
+            log_ids = dict((key, log_id) for log_id, key in cur.fetchall())
+            inserted = [(log_ids[row[key_pos]], row) for row in rows]
+            apply_call_signatures(cur, [(log_id, row[customer_pos], row[category_pos], row[transcript_pos])
+                                        for log_id, row in inserted])
+            if keywords_locked:
+                apply_transcript_keywords(cur, sorted((log_id, row[category_pos], row[transcript_pos])
+                                                      for log_id, row in inserted))
+        cur.execute("COMMIT")
+        stats["inserted"] = len(rows)
+        if rows:
+            result_cache.invalidate(("CallLogs",))
+        if TRANSCRIPT_INDEX_ENABLED and rows:
+            index_ingested_calls(inserted)
+    except Exception:
+        # A failing ROLLBACK (e.g. the connection is gone) must not replace the original error.
+        try:
+            cur.execute("ROLLBACK")
+        except Exception:
+            pass
+        raise
+    finally:
+        if keywords_locked:
+            try:
+                cur.execute("SELECT RELEASE_LOCK('transcript_keywords')")
+                cur.fetchall()
+            except Exception:
+                pass
+        conn.close()
+    return stats
+
+
+def index_ingested_calls(inserted: list):
+    # Runs after COMMIT, so a failure here must not fail the batch; the next refresh of the
+    # index picks up anything missed by LogID.
+    date_pos = CALLLOG_INSERT_COLUMNS.index("CallDate")
+    transcript_pos = CALLLOG_INSERT_COLUMNS.index("CallTranscript")
+    try:
+        for log_id, row in inserted:
+            transcript_index.add_document(log_id, row[date_pos], row[transcript_pos])
+        if len(transcript_index.delta_docs) >= TRANSCRIPT_INDEX_MERGE_DOCS:
+            transcript_index.save()
+    except Exception:
+        pass
+
+
+def is_connectivity_error(error: Exception) -> bool:
+    # Only these mean "MySQL is unreachable, try again later"; anything else a batch raises
+    # is about the rows themselves and retrying them unchanged cannot succeed.
+    return isinstance(error, (ConnectionError, mysql.connector.errors.InterfaceError,
+                              mysql.connector.errors.OperationalError))
+
+
+class CallLogSpool:
+    # Local append-only SQLite spool for call log rows the database could not take.
+    # Rows stay keyed by IngestKey until a replay has committed them to MySQL; rows MySQL
+    # rejected outright are moved to the quarantine table with the error for inspection.
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=FULL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS spool (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ingest_key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    spooled_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS quarantine (
+                    ingest_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    error TEXT NOT NULL,
+                    quarantined_at REAL NOT NULL
+                )
+            """)
+        return self.conn
+
+    def quarantine(self, rows: list, error: str):
+        key_pos = CALLLOG_INSERT_COLUMNS.index("IngestKey")
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO quarantine (ingest_key, payload, error, quarantined_at) VALUES (?, ?, ?, ?)",
+                [(row[key_pos], json.dumps([row[0].isoformat()] + list(row[1:]), default=str), error, now)
+                 for row in rows]
+            )
+            conn.executemany("DELETE FROM spool WHERE ingest_key = ?", [(row[key_pos],) for row in rows])
+            conn.execute("COMMIT")
+
+    def quarantine_depth(self) -> int:
+        if self.conn is None and not os.path.exists(self.path):
+            return 0
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM quarantine").fetchone()[0]
+
+    def append(self, rows: list):
+        key_pos = CALLLOG_INSERT_COLUMNS.index("IngestKey")
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO spool (ingest_key, payload, spooled_at) VALUES (?, ?, ?)",
+                [(row[key_pos], json.dumps([row[0].isoformat()] + list(row[1:])), now) for row in rows]
+            )
+            conn.execute("COMMIT")
+
+    def peek(self, limit: int) -> list:
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT payload FROM spool ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        decoded = []
+        for (payload,) in rows:
+            values = json.loads(payload)
+            decoded.append((datetime.fromisoformat(values[0]),) + tuple(values[1:]))
+        return decoded
+
+    def remove(self, rows: list):
+        key_pos = CALLLOG_INSERT_COLUMNS.index("IngestKey")
+        with self.lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM spool WHERE ingest_key = ?", [(row[key_pos],) for row in rows])
+            conn.execute("COMMIT")
+
+    def depth(self) -> int:
+        if self.conn is None and not os.path.exists(self.path):
+            return 0
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+
+class CallLogWriteBuffer:
+    # In-process write-behind queue for call log ingestion.  submit() never waits on the
+    # database: rows are queued and a background task flushes them in multi-row batches
+    # when either batch_size rows are waiting or flush_seconds have passed.  Batches the
+    # database cannot take while it is unreachable (or that overflow the queue) spill to the
+    # local spool, which a second task replays once MySQL answers again; individual rows it
+    # rejects are quarantined instead of blocking the rest.
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_queued: int,
+                 spool: CallLogSpool, replay_seconds: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queued = max_queued
+        self.spool = spool
+        self.replay_seconds = replay_seconds
+        self.queue = None
+        self.task = None
+        self.replay_task = None
+        self.db_available = True
+        self.replay_wakeup = None
+        self.counters = Counter()
+        self.last_flush_ms = None
+        self.last_batch_wait_ms = None
+        self.last_error = None
+
+    def ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done():
+            self.queue = self.queue or asyncio.Queue(maxsize=self.max_queued)
+            self.task = loop.create_task(self._run())
+        if self.replay_task is None or self.replay_task.done():
+            self.replay_wakeup = asyncio.Event()
+            self.replay_task = loop.create_task(self._replay())
+
+    def submit(self, rows: list) -> int:
+        self.ensure_started()
+        accepted = 0
+        enqueued_at = time.monotonic()
+        for row in rows:
+            try:
+                self.queue.put_nowait((row, enqueued_at))
+            except asyncio.QueueFull:
+                break
+            accepted += 1
+        overflow = rows[accepted:]
+        if overflow:
+            try:
+                self.spool.append(overflow)
+                self.counters["spooled_rows"] += len(overflow)
+                accepted += len(overflow)
+                self.replay_wakeup.set()
+            except Exception as e:
+                self.counters["rejected_rows"] += len(overflow)
+                self.last_error = f"spool: {e}"
+        self.counters["accepted_rows"] += accepted
+        return accepted
+
+    async def _run(self):
+        # Tasks inherit the context of the tool call that started them; background writes
+        # always go to the primary.
+        read_replicas.set({})
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    def _write_isolating(self, rows: list) -> Counter:
+        # Runs in a worker thread. A batch MySQL rejects for its data is split in halves until
+        # the offending rows are alone; those are quarantined and everything else is written.
+        # Connectivity errors propagate so the caller can spool the batch.
+        try:
+            return Counter(write_call_log_batch(rows))
+        except Exception as e:
+            if is_connectivity_error(e):
+                raise
+            if len(rows) == 1:
+                self.spool.quarantine(rows, str(e))
+                self.last_error = f"quarantined: {e}"
+                return Counter(quarantined=1)
+        middle = len(rows) // 2
+        return self._write_isolating(rows[:middle]) + self._write_isolating(rows[middle:])
+
+    async def _flush(self, batch: list):
+        started = time.monotonic()
+        rows = [row for row, _ in batch]
+        try:
+            if not self.db_available:
+                raise ConnectionError("database unavailable; spooling until replay succeeds")
+            stats = await asyncio.to_thread(self._write_isolating, rows)
+            self.counters["flushed_rows"] += stats["inserted"]
+            self.counters["flushed_batches"] += 1
+            self.counters["duplicate_rows"] += stats["duplicates"]
+            self.counters["unknown_customer_ids"] += stats["unknown_customers"]
+            self.counters["quarantined_rows"] += stats["quarantined"]
+        except Exception as e:
+            self.counters["failed_batches"] += 1
+            self.last_error = str(e)
+            if is_connectivity_error(e):
+                self.db_available = False
+            try:
+                await asyncio.to_thread(self.spool.append, rows)
+                self.counters["spooled_rows"] += len(rows)
+            except Exception as spool_error:
+                self.counters["failed_rows"] += len(rows)
+                self.last_error = f"spool: {spool_error}"
+        self.last_flush_ms = round((time.monotonic() - started) * 1000, 1)
+        self.last_batch_wait_ms = round((started - min(t for _, t in batch)) * 1000, 1)
+
+    async def _replay(self):
+        read_replicas.set({})
+        while True:
+            try:
+                await asyncio.wait_for(self.replay_wakeup.wait(), self.replay_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.replay_wakeup.clear()
+            while True:
+                try:
+                    rows = await asyncio.to_thread(self.spool.peek, self.batch_size)
+                    if not rows:
+                        self.db_available = True
+                        break
+                    stats = await asyncio.to_thread(self._write_isolating, rows)
+                    await asyncio.to_thread(self.spool.remove, rows)
+                    self.db_available = True
+                    self.counters["replayed_rows"] += stats["inserted"]
+                    self.counters["duplicate_rows"] += stats["duplicates"]
+                    self.counters["unknown_customer_ids"] += stats["unknown_customers"]
+                    self.counters["quarantined_rows"] += stats["quarantined"]
+                except Exception as e:
+                    if is_connectivity_error(e):
+                        self.db_available = False
+                    self.last_error = str(e)
+                    break
+
+    def stats(self) -> dict:
+        queued = self.queue.qsize() if self.queue else 0
+        return {
+            "queued_rows": queued,
+            "queue_capacity": self.max_queued,
+            "queue_utilization": round(queued / self.max_queued, 4) if self.max_queued else 0,
+            "batch_size": self.batch_size,
+            "flush_seconds": self.flush_seconds,
+            "db_available": self.db_available,
+            "spool_depth": self.spool.depth(),
+            "quarantine_depth": self.spool.quarantine_depth(),
+            "accepted_rows": self.counters["accepted_rows"],
+            "rejected_rows": self.counters["rejected_rows"],
+            "flushed_rows": self.counters["flushed_rows"],
+            "flushed_batches": self.counters["flushed_batches"],
+            "spooled_rows": self.counters["spooled_rows"],
+            "replayed_rows": self.counters["replayed_rows"],
+            "duplicate_rows": self.counters["duplicate_rows"],
+            "failed_rows": self.counters["failed_rows"],
+            "failed_batches": self.counters["failed_batches"],
+            "quarantined_rows": self.counters["quarantined_rows"],
+            "unknown_customer_ids": self.counters["unknown_customer_ids"],
+            "last_flush_ms": self.last_flush_ms,
+            "last_batch_wait_ms": self.last_batch_wait_ms,
+            "last_error": self.last_error,
+        }
+
+
+calllog_write_buffer = CallLogWriteBuffer(CALLLOG_INGEST_BATCH_SIZE, CALLLOG_INGEST_FLUSH_SECONDS,
+                                          CALLLOG_INGEST_QUEUE_SIZE, CallLogSpool(CALLLOG_SPOOL_PATH),
+                                          CALLLOG_SPOOL_REPLAY_SECONDS)
+
+
+CUSTOMER_HISTORY_COLUMNS = ["LogID", "CallDate", "AgentName", "IssueCategory", "ResolutionStatus",
+                            "SentimentScore", "CallDuration"]
+
+
+def customer_history(cur, customer_id: int, date_clauses: list, date_params: list, limit: int,
+                     page_cursor: str = None) -> tuple:
+    # Keyset pagination on (CallDate, LogID) descending; the cursor is "<CallDate iso>|<LogID>".
+    # Only the first page carries the summary header.
+    where = ["CustomerID = %s"] + list(date_clauses)
+    params = [customer_id] + list(date_params)
+    summary = None
+    if not page_cursor:
+        cur.execute(f"""
+            SELECT COUNT(*), AVG(SentimentScore), MAX(CallDate), MIN(CallDate)
+            FROM CallLogs
+            WHERE {" AND ".join(where)}
+        """, params)
+        count, avg_sentiment, last_call, first_call = cur.fetchone()
+        summary = {
+            "TotalCalls": count,
+            "AvgSentiment": round(float(avg_sentiment), 4) if avg_sentiment is not None else None,
+            "LastCall": last_call.isoformat() if last_call else None,
+            "FirstCall": first_call.isoformat() if first_call else None
+        }
+    else:
+        cursor_date, cursor_log_id = page_cursor.rsplit("|", 1)
+        cursor_date = datetime.fromisoformat(cursor_date)
+        where.append("(CallDate < %s OR (CallDate = %s AND LogID < %s))")
+        params += [cursor_date, cursor_date, int(cursor_log_id)]
+
+    sql = f"""
+        SELECT {", ".join(CUSTOMER_HISTORY_COLUMNS)}
+        FROM CallLogs
+        WHERE {" AND ".join(where)}
+        ORDER BY CallDate DESC, LogID DESC
+        LIMIT %s
+    """
+    cur.execute(sql, params + [limit + 1])
+    rows = cur.fetchall()
+    calls = []
+    for r in rows[:limit]:
+        call = dict(zip(CUSTOMER_HISTORY_COLUMNS, r))
+        call["CallDate"] = call["CallDate"].isoformat()
+        call["SentimentScore"] = float(call["SentimentScore"]) if call["SentimentScore"] is not None else None
+        calls.append(call)
+    next_cursor = f"{calls[-1]['CallDate']}|{calls[-1]['LogID']}" if len(rows) > limit else None
+    return sql, summary, calls, next_cursor
+
+
+def response_size(result) -> int:
+    return len(json.dumps(result, default=str, ensure_ascii=False).encode("utf-8"))
+
+
 @mcp.tool()
+@cached_tool("calllogs_crud")
+@route_reads("calllogs_crud")
 async def calllogs_crud(
         operation: str,
         analysis_type: str = None,
@@ -1489,12 +5239,60 @@ async def calllogs_crud(
         limit: int = 50,
         search_text: str = None,
         keyword_analysis: bool = False,
-        include_transcripts: bool = True
+        include_transcripts: bool = False,
+        top_k: int = 5,
+        incremental: bool = False,
+        analysis_types: str | list[str] = None,
+        calls: list[dict] = None,
+        full_text: bool = False,
+        log_id: int = None,
+        window_days: int = 7,
+        step_days: int = 1,
+        z_threshold: float = 3.0,
+        customer_id: int = None,
+        customer_name: str = None,
+        page_cursor: str = None,
+        preview: bool = False
 ) -> Any:
+    try:
+        range_start, range_end = parse_date_range(date_range) if date_range else (None, None)
+    except ValueError:
+        return {"sql": None, "result": f"❌ Unrecognized date_range '{date_range}'. Use e.g. 'last 7 days', "
+                                       f"'yesterday', 'this month' or '2024-01-01 to 2024-01-31'."}
+    date_clauses, date_params = date_range_clauses(range_start, range_end, "CallDate")
+    date_where = " AND ".join(date_clauses) or "1=1"
+
+    calllog_write_buffer.ensure_started()
+
+    # Ingestion is answered from the in-process buffer and must not wait on a connection.
+    if operation == "ingest":
+        if not calls:
+            return {"sql": None, "result": "❌ 'calls' (a list of call log records) required for ingest."}
+        rows, invalid = [], []
+        for i, call in enumerate(calls):
+            try:
+                rows.append(normalize_call_log(call))
+            except (ValueError, TypeError, OverflowError) as e:
+                invalid.append({"index": i, "error": str(e)})
+        accepted = calllog_write_buffer.submit(rows) if rows else 0
+        return {"sql": f"INSERT INTO CallLogs ({', '.join(CALLLOG_INSERT_COLUMNS)}) VALUES (...), (...)",
+                "result": {"accepted": accepted, "rejected": len(rows) - accepted, "invalid": invalid,
+                           "buffer": calllog_write_buffer.stats()}}
+
+    elif operation == "ingest_stats":
+        return {"sql": None, "result": calllog_write_buffer.stats()}
+
     conn = get_mysql_conn()
     cur = conn.cursor()
 
     if operation == "read":
+        # Transcripts are the bulk of a call log row: by default only their length and a
+        # short hash are returned, include_transcripts (or full_text) adds the whole text and
+        # preview a truncated one (the whole text is also available per call via fetch_transcript).
+        transcript_column = "cl.CallTranscript" if include_transcripts or full_text else (
+            f"CASE WHEN CHAR_LENGTH(cl.CallTranscript) > {TRANSCRIPT_PREVIEW_CHARS} "
+            f"THEN CONCAT(LEFT(cl.CallTranscript, {TRANSCRIPT_PREVIEW_CHARS}), '...') ELSE cl.CallTranscript END")
+        include_transcripts = include_transcripts or full_text or preview
         available_columns = {
             "log_id": "cl.LogID",
             "call_date": "cl.CallDate",
@@ -1508,7 +5306,9 @@ async def calllogs_crud(
             "resolution_status": "cl.ResolutionStatus",
             "sentiment_score": "cl.SentimentScore",
             "call_notes": "cl.CallNotes",
-            "call_transcript": "cl.CallTranscript",
+            "call_transcript": transcript_column,
+            "transcript_length": "cl.TranscriptLength",
+            "transcript_hash": "LEFT(SHA2(cl.CallTranscript, 256), 16)",
             "wait_time": "cl.WaitTime",
             "transfer_count": "cl.TransferCount"
         }
@@ -1524,7 +5324,7 @@ async def calllogs_crud(
                     selected_columns = list(available_columns.values())
                     column_aliases = list(available_columns.keys())
                 else:
-                    selected_columns = [col for col in available_columns.values() if "CallTranscript" not in col]
+                    selected_columns = [col for alias, col in available_columns.items() if alias != "call_transcript"]
                     column_aliases = [alias for alias in available_columns.keys() if alias != "call_transcript"]
 
                 exclusions = [col.strip().replace("-", "").replace(" ", "_").lower()
@@ -1551,7 +5351,7 @@ async def calllogs_crud(
                 selected_columns = list(available_columns.values())
                 column_aliases = list(available_columns.keys())
             else:
-                selected_columns = [col for col in available_columns.values() if "CallTranscript" not in col]
+                selected_columns = [col for alias, col in available_columns.items() if alias != "call_transcript"]
                 column_aliases = [alias for alias in available_columns.keys() if alias != "call_transcript"]
 
         select_clause = ", ".join([f"{col} AS {alias}"
@@ -1563,7 +5363,9 @@ async def calllogs_crud(
             LEFT JOIN Customers c ON cl.CustomerID = c.Id
             WHERE 1=1
         """
-        params = []
+        params = list(date_params)
+        for clause in date_clauses:
+            sql += f" AND cl.{clause}"
 
         if agent_name:
             sql += " AND cl.AgentName = %s"
@@ -1578,8 +5380,9 @@ async def calllogs_crud(
             params.append(sentiment_threshold)
 
         if search_text:
-            sql += " AND MATCH(cl.CallTranscript) AGAINST(%s IN NATURAL LANGUAGE MODE)"
-            params.append(search_text)
+            match_sql, match_params = transcript_match_sql(search_text)
+            sql += f" AND {match_sql}"
+            params.extend(match_params)
 
         if where_clause and where_clause.strip():
             sql += f" AND {where_clause}"
@@ -1604,10 +5407,63 @@ async def calllogs_crud(
             result.append(row_dict)
 
         conn.close()
-        return {"sql": sql, "result": result}
+        return {"sql": sql, "result": result, "response_bytes": response_size(result)}
+
+    elif operation == "customer_history":
+        if customer_id is None:
+            if not customer_name:
+                conn.close()
+                return {"sql": None, "result": "❌ 'customer_id' or 'customer_name' required for customer_history."}
+            customer_info = await asyncio.to_thread(find_customer_by_name_enhanced, customer_name)
+            if not customer_info["found"]:
+                conn.close()
+                return {"sql": None, "result": f"❌ {customer_info['error']}"}
+            if customer_info["multiple_matches"]:
+                conn.close()
+                return {"sql": None, "result": f"❌ {customer_info['error']}. Pass customer_id instead.",
+                        "matches": customer_info["matches"]}
+            customer_id = customer_info["customer_id"]
+            customer_name = customer_info["customer_name"]
+        elif not customer_name:
+            customer_name = get_customer_name(customer_id)
+        try:
+            sql, summary, calls, next_cursor = customer_history(cur, customer_id, date_clauses, date_params, limit,
+                                                                page_cursor)
+        except ValueError:
+            conn.close()
+            return {"sql": None, "result": f"❌ Invalid page_cursor '{page_cursor}'."}
+        conn.close()
+        result = {"CustomerID": customer_id, "CustomerName": customer_name, "Calls": calls,
+                  "NextCursor": next_cursor}
+        if summary is not None:
+            result["Summary"] = summary
+        return {"sql": sql, "result": result, "response_bytes": response_size(result)}
+
+    elif operation == "fetch_transcript":
+        if log_id is None:
+            conn.close()
+            return {"sql": None, "result": "❌ 'log_id' required for fetch_transcript."}
+        sql = "SELECT LogID, CallDate, AgentName, CallTranscript FROM CallLogs WHERE LogID = %s"
+        cur.execute(sql, (log_id,))
+        row = cur.fetchone()
+        conn.close()
+        if not row:
+            return {"sql": sql, "result": f"❌ Call log {log_id} not found."}
+        transcript = row[3] or ""
+        return {"sql": sql, "result": {
+            "LogID": row[0],
+            "CallDate": row[1].isoformat() if row[1] else None,
+            "AgentName": row[2],
+            "CallTranscript": transcript,
+            "TranscriptLength": len(transcript.encode("utf-8")),
+            "TranscriptHash": hashlib.sha256(transcript.encode("utf-8")).hexdigest()[:16]
+        }}
 
     elif operation == "transcript_search":
-        sql = """
+        if not search_text:
+            conn.close()
+            return {"sql": None, "result": "❌ 'search_text' required for transcript_search."}
+        select_sql = """
             SELECT 
                 cl.LogID,
                 cl.CallDate,
@@ -1616,268 +5472,537 @@ async def calllogs_crud(
                 cl.IssueCategory,
                 cl.ResolutionStatus,
                 cl.CallTranscript,
-                cl.SentimentScore,
-                MATCH(cl.CallTranscript) AGAINST(%s IN NATURAL LANGUAGE MODE) as RelevanceScore
+                cl.SentimentScore"""
+
+        if TRANSCRIPT_INDEX_ENABLED:
+            index = await asyncio.to_thread(get_transcript_index)
+            hits = index.search(search_text, limit, range_start, range_end)
+            scores = dict(hits)
+            sql = f"""{select_sql}
+            FROM CallLogs cl
+            LEFT JOIN Customers c ON cl.CustomerID = c.Id
+            WHERE cl.LogID IN ({", ".join(["%s"] * len(hits)) or "NULL"})
+        """
+            cur.execute(sql, list(scores))
+            rows = sorted((r + (scores[r[0]],) for r in cur.fetchall()), key=lambda r: r[8], reverse=True)
+        else:
+            match_sql, match_params = transcript_match_sql(search_text)
+            sql = f"""{select_sql},
+                {match_sql} as RelevanceScore
             FROM CallLogs cl
             LEFT JOIN Customers c ON cl.CustomerID = c.Id
-            WHERE MATCH(cl.CallTranscript) AGAINST(%s IN NATURAL LANGUAGE MODE)
+            WHERE {match_sql} AND {" AND ".join(f"cl.{clause}" for clause in date_clauses) or "1=1"}
             ORDER BY RelevanceScore DESC
             LIMIT %s
         """
-        params = [search_text, search_text, limit]
-        cur.execute(sql, params)
-        rows = cur.fetchall()
+            params = match_params + match_params + date_params + [limit]
+            cur.execute(sql, params)
+            rows = cur.fetchall()
 
+        query_terms = set(KEYWORD_TOKEN_RE.findall(search_text.lower()))
         result = []
         for r in rows:
-            result.append({
+            hit = {
                 "LogID": r[0],
                 "CallDate": r[1].isoformat() if r[1] else None,
                 "CustomerName": r[2],
                 "AgentName": r[3],
                 "IssueCategory": r[4],
                 "ResolutionStatus": r[5],
-                "CallTranscript": r[6],
+                "Snippet": transcript_snippet(r[6], query_terms),
                 "SentimentScore": float(r[7]) if r[7] else 0,
-                "RelevanceScore": float(r[8]) if r[8] else 0
-            })
+                "RelevanceScore": round(float(r[8]), 4) if r[8] else 0
+            }
+            if full_text:
+                hit["CallTranscript"] = r[6]
+            result.append(hit)
 
         conn.close()
-        return {"sql": sql, "result": result}
+        return {"sql": sql, "result": result, "response_bytes": response_size(result)}
+
+    elif operation == "build_transcript_index":
+        conn.close()
+        indexed = await asyncio.to_thread(transcript_index.rebuild)
+        return {"sql": "SELECT LogID, CallDate, CallTranscript FROM CallLogs WHERE LogID > %s ORDER BY LogID",
+                "result": f"✅ Transcript index rebuilt from {indexed} call log(s).",
+                "index": transcript_index.stats()}
 
     elif operation == "analyze":
         sql = ""
 
-        if analysis_type == "sentiment_by_agent":
-            sql = """
-                SELECT AgentName,
-                       AVG(SentimentScore) as AvgSentiment,
-                       COUNT(*) as TotalCalls,
-                       SUM(CASE WHEN SentimentScore >= 0.5 THEN 1 ELSE 0 END) as PositiveCalls
-                FROM CallLogs
-                GROUP BY AgentName
-                ORDER BY AvgSentiment DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{"AgentName": r[0], "AvgSentiment": float(r[1]),
-                       "TotalCalls": r[2], "PositiveCalls": r[3]} for r in rows]
-
-        elif analysis_type == "agent_performance":
-            sql = """
-                SELECT AgentName,
-                       COUNT(*) as TotalCalls,
-                       AVG(CallDuration) as AvgCallDuration,
-                       AVG(SentimentScore) as AvgSentiment,
-                       SUM(CASE WHEN ResolutionStatus = 'resolved' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as ResolutionRate,
-                       AVG(TransferCount) as AvgTransfers
-                FROM CallLogs
-                GROUP BY AgentName
-                ORDER BY ResolutionRate DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{"AgentName": r[0], "TotalCalls": r[1],
-                       "AvgCallDuration": r[2], "AvgSentiment": float(r[3]),
-                       "ResolutionRate": float(r[4]), "AvgTransfers": float(r[5])} for r in rows]
+        if analysis_type in ROLLUP_ANALYSES:
+            rollup_table, rollup_where, rollup_params = rollup_source(range_start, range_end)
+            sql = rollup_totals_sql(ROLLUP_ANALYSES[analysis_type], rollup_table, rollup_where)
+            cur.execute(sql, rollup_params)
+            result = format_rollup_analysis(analysis_type,
+                                            [(r[0], rollup_measures(r[1:])) for r in cur.fetchall()])
 
         elif analysis_type == "transcript_keywords":
-            sql = """
-                SELECT 
-                    IssueCategory,
-                    COUNT(*) as CallCount,
-                    GROUP_CONCAT(CallTranscript SEPARATOR ' ') as CombinedTranscripts
-                FROM CallLogs
-                GROUP BY IssueCategory
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
+            sql, result = transcript_keyword_analysis(cur, top_k, incremental, date_clauses, date_params)
+
+        elif analysis_type == "recurring_clusters":
+            sql, result = recurring_clusters(cur, issue_category, date_clauses, date_params, limit)
+
+        elif analysis_type in SKETCH_ANALYSES:
+            sql, groups = call_sketch_groups(cur, range_start, range_end, agent_name)
+            result = format_sketch_analysis(analysis_type, groups)
+
+        elif analysis_type == "anomalies":
+            sql, result = call_anomalies(cur, z_threshold, range_start, range_end, agent_name, issue_category, limit)
+
+        elif analysis_type == "sentiment_trend":
+            if window_days < 1 or step_days < 1:
+                conn.close()
+                return {"sql": None, "result": "❌ 'window_days' and 'step_days' must be at least 1."}
+            sql, result = sentiment_trend(cur, range_start, range_end, window_days, step_days, agent_name)
+
+        elif analysis_type in MARKER_ANALYSES:
+            sql, result = pending_marker_backfill(cur, date_where, date_params)
+            if result is None:
+                group_columns = MARKER_ANALYSES[analysis_type]
+                sql = marker_totals_sql(group_columns, date_where)
+                cur.execute(sql, date_params)
+                result = format_marker_analysis(analysis_type,
+                                                [(r[:len(group_columns)], marker_measures(r[len(group_columns):]))
+                                                 for r in cur.fetchall()])
 
-            result = []
-            for r in rows:
-                issue_cat = r[0]
-                call_count = r[1]
-                transcripts = r[2] if r[2] else ""
+        else:
+            result = """Unknown analysis type. Available types: 
+                     sentiment_by_agent, issue_frequency, call_volume_trends, 
+                     escalation_analysis, agent_performance, transcript_keywords,
+                     transcript_sentiment, agent_communication, problem_patterns,
+                     recurring_clusters, call_percentiles, distinct_customers,
+                     sentiment_trend, anomalies"""
 
-                words = transcripts.lower().split()
-                stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-                              'of', 'with', 'by', 'from', 'was', 'were', 'been', 'be', 'have',
-                              'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-                              'is', 'are', 'am', 'customer', 'agent', 'call', 'called'}
+        conn.close()
+        return {"sql": sql if analysis_type != None else None, "result": result}
 
-                filtered_words = [w for w in words if w not in stop_words and len(w) > 3]
-                word_freq = {}
-                for word in filtered_words:
-                    word_freq[word] = word_freq.get(word, 0) + 1
+    elif operation == "analyze_many":
+        if isinstance(analysis_types, str):
+            analysis_types = analysis_types.split(",")
+        requested = list(dict.fromkeys(t.strip() for t in (analysis_types or []) if t and t.strip()))
+        if not requested:
+            conn.close()
+            return {"sql": None, "result": "❌ 'analysis_types' required for analyze_many."}
+        if "sentiment_trend" in requested and (window_days < 1 or step_days < 1):
+            conn.close()
+            return {"sql": None, "result": "❌ 'window_days' and 'step_days' must be at least 1."}
+
+        statements = []
+        results = {}
+
+        # Every rollup analysis is a re-grouping of (day, agent, category) totals: scan once, fold per type.
+        rollup_types = [t for t in requested if t in ROLLUP_ANALYSES]
+        if rollup_types:
+            rollup_table, rollup_where, rollup_params = rollup_source(range_start, range_end)
+            day_column = "DATE(BucketStart)" if rollup_table == "CallRollupHourly" else "BucketStart"
+            sql = rollup_totals_sql(f"{day_column}, AgentName, IssueCategory", rollup_table, rollup_where)
+            cur.execute(sql, rollup_params)
+            rows = [(r[:3], rollup_measures(r[3:])) for r in cur.fetchall()]
+            statements.append(sql)
+            key_positions = {"BucketStart": 0, "AgentName": 1, "IssueCategory": 2}
+            for t in rollup_types:
+                position = key_positions[ROLLUP_ANALYSES[t]]
+                results[t] = format_rollup_analysis(t, merge_measure_groups(rows, lambda keys: keys[position]))
+
+        # Likewise the marker analyses share one scan grouped by the union of their keys.
+        marker_types = [t for t in requested if t in MARKER_ANALYSES]
+        if marker_types:
+            sql, pending = pending_marker_backfill(cur, date_where, date_params)
+            statements.append(sql)
+            if pending:
+                results.update(dict.fromkeys(marker_types, pending))
+            else:
+                group_columns = list(dict.fromkeys(c for t in marker_types for c in MARKER_ANALYSES[t]))
+                sql = marker_totals_sql(group_columns, date_where)
+                cur.execute(sql, date_params)
+                rows = [(r[:len(group_columns)], marker_measures(r[len(group_columns):])) for r in cur.fetchall()]
+                statements.append(sql)
+                for t in marker_types:
+                    positions = [group_columns.index(c) for c in MARKER_ANALYSES[t]]
+                    results[t] = format_marker_analysis(
+                        t, merge_measure_groups(rows, lambda keys: tuple(keys[p] for p in positions)))
+
+        if "transcript_keywords" in requested:
+            sql, results["transcript_keywords"] = transcript_keyword_analysis(
+                cur, top_k, incremental, date_clauses, date_params)
+            statements.append(sql)
+
+        # Percentiles and distinct counts come from the same per-day sketches.
+        sketch_types = [t for t in requested if t in SKETCH_ANALYSES]
+        if sketch_types:
+            sql, groups = call_sketch_groups(cur, range_start, range_end, agent_name)
+            statements.append(sql)
+            for t in sketch_types:
+                results[t] = format_sketch_analysis(t, groups)
+
+        if "sentiment_trend" in requested:
+            sql, results["sentiment_trend"] = sentiment_trend(
+                cur, range_start, range_end, window_days, step_days, agent_name)
+            statements.append(sql)
+
+        if "anomalies" in requested:
+            sql, results["anomalies"] = call_anomalies(
+                cur, z_threshold, range_start, range_end, agent_name, issue_category, limit)
+            statements.append(sql)
+
+        if "recurring_clusters" in requested:
+            sql, results["recurring_clusters"] = recurring_clusters(
+                cur, issue_category, date_clauses, date_params, limit)
+            statements.append(sql)
+
+        for t in requested:
+            results.setdefault(t, f"Unknown analysis type '{t}'.")
 
-                top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:5]
+        conn.close()
+        return {"sql": statements, "result": {t: results[t] for t in requested}}
 
-                result.append({
-                    "IssueCategory": issue_cat,
-                    "CallCount": call_count,
-                    "TopKeywords": [{"keyword": k, "frequency": v} for k, v in top_keywords]
-                })
+    elif operation == "rebuild_rollups":
+        rebuild_call_rollups(cur)
+        conn.close()
+        return {"sql": "INSERT INTO CallRollupHourly ... SELECT ... FROM CallLogs GROUP BY 1, 2, 3",
+                "result": "✅ Call rollup tables rebuilt from CallLogs."}
 
-        elif analysis_type == "transcript_sentiment":
-            sql = """
-                SELECT 
-                    IssueCategory,
-                    AVG(SentimentScore) as AvgSentiment,
-                    COUNT(CASE WHEN CallTranscript LIKE '%frustrated%' 
-                           OR CallTranscript LIKE '%angry%' 
-                           OR CallTranscript LIKE '%upset%' THEN 1 END) as NegativeLanguageCount,
-                    COUNT(CASE WHEN CallTranscript LIKE '%satisfied%' 
-                           OR CallTranscript LIKE '%happy%' 
-                           OR CallTranscript LIKE '%grateful%' 
-                           OR CallTranscript LIKE '%appreciated%' THEN 1 END) as PositiveLanguageCount,
-                    COUNT(*) as TotalCalls
-                FROM CallLogs
-                GROUP BY IssueCategory
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{
-                "IssueCategory": r[0],
-                "AvgSentiment": float(r[1]) if r[1] else 0,
-                "NegativeLanguageCount": r[2],
-                "PositiveLanguageCount": r[3],
-                "TotalCalls": r[4],
-                "PositiveLanguageRate": round((r[3] / r[4]) * 100, 2) if r[4] > 0 else 0,
-                "NegativeLanguageRate": round((r[2] / r[4]) * 100, 2) if r[4] > 0 else 0
-            } for r in rows]
+    elif operation == "maintain_partitions":
+        added = maintain_calllog_partitions(cur)
+        conn.close()
+        return {"sql": "ALTER TABLE CallLogs REORGANIZE PARTITION pmax INTO (...)",
+                "result": f"✅ Added partitions: {', '.join(added)}" if added
+                else "ℹ️ CallLogs is not partitioned or already has partitions for the coming months."}
 
-        elif analysis_type == "agent_communication":
-            sql = """
-                SELECT 
-                    AgentName,
-                    COUNT(*) as TotalCalls,
-                    AVG(LENGTH(CallTranscript)) as AvgTranscriptLength,
-                    COUNT(CASE WHEN CallTranscript LIKE '%apologized%' 
-                           OR CallTranscript LIKE '%sorry%' THEN 1 END) as ApologyCount,
-                    COUNT(CASE WHEN CallTranscript LIKE '%solution%' 
-                           OR CallTranscript LIKE '%resolved%' 
-                           OR CallTranscript LIKE '%fixed%' THEN 1 END) as SolutionOrientedCount,
-                    COUNT(CASE WHEN CallTranscript LIKE '%escalat%' THEN 1 END) as EscalationMentions,
-                    AVG(CallDuration) as AvgDuration
-                FROM CallLogs
-                GROUP BY AgentName
-                ORDER BY TotalCalls DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{
-                "AgentName": r[0],
-                "TotalCalls": r[1],
-                "AvgTranscriptLength": round(r[2]) if r[2] else 0,
-                "ApologyRate": round((r[3] / r[1]) * 100, 2) if r[1] > 0 else 0,
-                "SolutionOrientedRate": round((r[4] / r[1]) * 100, 2) if r[1] > 0 else 0,
-                "EscalationRate": round((r[5] / r[1]) * 100, 2) if r[1] > 0 else 0,
-                "AvgDuration": r[6]
-            } for r in rows]
+    elif operation == "backfill_markers":
+        conn.close()
+        updated = backfill_transcript_markers()
+        assignments = ", ".join(f"{column} = %s" for column in CALLLOG_MARKER_COLUMNS)
+        return {"sql": f"UPDATE CallLogs SET {assignments} WHERE LogID = %s",
+                "result": f"✅ Language markers computed for {updated} call log(s)."}
 
-        elif analysis_type == "problem_patterns":
-            sql = """
-                SELECT 
-                    IssueCategory,
-                    ResolutionStatus,
-                    COUNT(*) as Frequency,
-                    GROUP_CONCAT(
-                        CASE 
-                            WHEN CallTranscript LIKE '%recurring%' OR CallTranscript LIKE '%again%' 
-                                 OR CallTranscript LIKE '%multiple%' OR CallTranscript LIKE '%repeated%'
-                            THEN LogID 
-                        END
-                    ) as RecurringIssueLogIDs,
-                    AVG(SentimentScore) as AvgSentiment
-                FROM CallLogs
-                GROUP BY IssueCategory, ResolutionStatus
-                HAVING Frequency > 5
-                ORDER BY Frequency DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = []
-            for r in rows:
-                recurring_ids = [id for id in str(r[3]).split(',') if id and id != 'None'] if r[3] else []
-                result.append({
-                    "IssueCategory": r[0],
-                    "ResolutionStatus": r[1],
-                    "Frequency": r[2],
-                    "RecurringIssueCount": len(recurring_ids),
-                    "RecurringIssueRate": round((len(recurring_ids) / r[2]) * 100, 2) if r[2] > 0 else 0,
-                    "AvgSentiment": float(r[4]) if r[4] else 0
-                })
+    elif operation == "rebuild_anomalies":
+        recorded = rebuild_call_anomalies(cur)
+        conn.close()
+        return {"sql": "SELECT ... FROM CallRollupHourly GROUP BY ..., BucketStart ORDER BY ..., BucketStart",
+                "result": f"✅ Anomaly state rebuilt from hourly rollups; {recorded} anomalous hour(s) recorded."}
 
-        elif analysis_type == "issue_frequency":
-            sql = """
-                SELECT IssueCategory,
-                       COUNT(*) as Frequency,
-                       AVG(CallDuration) as AvgDuration,
-                       SUM(CASE WHEN ResolutionStatus = 'resolved' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as ResolutionRate
-                FROM CallLogs
-                GROUP BY IssueCategory
-                ORDER BY Frequency DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{"IssueCategory": r[0], "Frequency": r[1],
-                       "AvgDuration": r[2], "ResolutionRate": float(r[3])} for r in rows]
+    elif operation == "rebuild_sketches":
+        conn.close()
+        scanned = await asyncio.to_thread(rebuild_call_sketches)
+        return {"sql": "REPLACE INTO CallSketches (SketchDay, AgentName, CallCount, DurationDigest, WaitDigest, CustomerHll) VALUES (...)",
+                "result": f"✅ Call sketches rebuilt from {scanned} call log(s)."}
 
-        elif analysis_type == "call_volume_trends":
-            sql = """
-                SELECT DATE(CallDate) as Date,
-                       COUNT(*) as CallCount,
-                       AVG(WaitTime) as AvgWaitTime,
-                       AVG(CallDuration) as AvgDuration
-                FROM CallLogs
-                GROUP BY DATE(CallDate)
-                ORDER BY Date DESC
-                LIMIT 30
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{"Date": r[0].isoformat(), "CallCount": r[1],
-                       "AvgWaitTime": r[2], "AvgDuration": r[3]} for r in rows]
+    elif operation == "backfill_signatures":
+        conn.close()
+        signed = await asyncio.to_thread(backfill_call_signatures)
+        return {"sql": "UPDATE CallLogs SET MinHashSignature = %s, NearDuplicate = %s WHERE LogID = %s",
+                "result": f"✅ MinHash signatures computed for {signed} call log(s)."}
 
-        elif analysis_type == "escalation_analysis":
-            sql = """
-                SELECT IssueCategory,
-                       COUNT(*) as TotalCalls,
-                       SUM(CASE WHEN ResolutionStatus = 'escalated' THEN 1 ELSE 0 END) as EscalatedCalls,
-                       SUM(CASE WHEN ResolutionStatus = 'escalated' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as EscalationRate
-                FROM CallLogs
-                GROUP BY IssueCategory
-                HAVING EscalationRate > 0
-                ORDER BY EscalationRate DESC
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-            result = [{"IssueCategory": r[0], "TotalCalls": r[1],
-                       "EscalatedCalls": r[2], "EscalationRate": float(r[3])} for r in rows]
+    else:
+        conn.close()
+        return {"sql": "", "result": f"Unknown operation '{operation}'."}
 
-        else:
-            result = """Unknown analysis type. Available types: 
-                     sentiment_by_agent, issue_frequency, call_volume_trends, 
-                     escalation_analysis, agent_performance, transcript_keywords,
-                     transcript_sentiment, agent_communication, problem_patterns"""
 
+def customer_profile(customer_id: int) -> tuple:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    sql = "SELECT Id, FirstName, LastName, Name, Email, CreatedAt FROM Customers WHERE Id = %s"
+    try:
+        cur.execute(sql, (customer_id,))
+        row = cur.fetchone()
+    finally:
         conn.close()
-        return {"sql": sql if analysis_type != None else None, "result": result}
+    if not row:
+        return sql, None
+    return sql, {"Id": row[0], "FirstName": row[1], "LastName": row[2], "Name": row[3], "Email": row[4],
+                 "CreatedAt": row[5].isoformat() if row[5] else None}
 
-    else:
+
+def customer_purchases(customer_id: int, limit: int) -> tuple:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    summary_sql = """
+        SELECT COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total_price), 0), MAX(sale_date)
+        FROM Sales WHERE customer_id = %s
+    """
+    recent_sql = """
+        SELECT s.Id, p.name, s.quantity, s.unit_price, s.total_price, s.sale_date
+        FROM Sales s
+        JOIN ProductsCache p ON p.id = s.product_id
+        WHERE s.customer_id = %s
+        ORDER BY s.sale_date DESC, s.Id DESC
+        LIMIT %s
+    """
+    try:
+        cur.execute(summary_sql, (customer_id,))
+        orders, units, spent, last_purchase = cur.fetchone()
+        cur.execute(recent_sql, (customer_id, limit))
+        rows = cur.fetchall()
+    finally:
         conn.close()
-        return {"sql": "", "result": f"Unknown operation '{operation}'."}
+    return [summary_sql, recent_sql], {
+        "Summary": {"Orders": orders, "Units": int(units), "TotalSpent": round(float(spent), 2),
+                    "LastPurchase": last_purchase.isoformat() if last_purchase else None},
+        "Recent": [{"SaleId": r[0], "Product": r[1], "Quantity": r[2], "UnitPrice": round(float(r[3]), 2),
+                    "TotalPrice": round(float(r[4]), 2), "SaleDate": r[5].isoformat() if r[5] else None}
+                   for r in rows]
+    }
+
+
+def customer_support(customer_id: int, limit: int) -> tuple:
+    conn = get_mysql_conn()
+    cur = conn.cursor()
+    try:
+        sql, summary, calls, next_cursor = customer_history(cur, customer_id, [], [], limit)
+    finally:
+        conn.close()
+    return sql, {"Summary": summary, "RecentCalls": calls, "NextCursor": next_cursor}
+
+
+@mcp.tool()
+@cached_tool("customer_360")
+@route_reads("customer_360")
+async def customer_360(operation: str = "read", customer_id: int = None, customer_name: str = None,
+                       limit: int = 10) -> Any:
+    # Profile, purchases and support history are independent reads, so they run concurrently
+    # on their own pooled connections; the response time is that of the slowest one.
+    if customer_id is None:
+        if not customer_name:
+            return {"sql": None, "result": "❌ 'customer_id' or 'customer_name' required for customer_360."}
+        customer_info = await asyncio.to_thread(find_customer_by_name_enhanced, customer_name)
+        if not customer_info["found"]:
+            return {"sql": None, "result": f"❌ {customer_info['error']}"}
+        if customer_info["multiple_matches"]:
+            return {"sql": None, "result": f"❌ {customer_info['error']}. Pass customer_id instead.",
+                    "matches": customer_info["matches"]}
+        customer_id = customer_info["customer_id"]
+
+    async def timed(fn, *args):
+        started = time.perf_counter()
+        sql, data = await asyncio.to_thread(fn, *args)
+        return sql, data, round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    (profile_sql, profile, profile_ms), (purchase_sql, purchases, purchase_ms), (support_sql, support, support_ms) = \
+        await asyncio.gather(timed(customer_profile, customer_id),
+                             timed(customer_purchases, customer_id, limit),
+                             timed(customer_support, customer_id, limit))
+    if profile is None:
+        return {"sql": profile_sql, "result": f"❌ Customer {customer_id} not found."}
+    return {
+        "sql": [profile_sql] + purchase_sql + [support_sql],
+        "result": {"Profile": profile, "Purchases": purchases, "Support": support},
+        "timings_ms": {"profile": profile_ms, "purchases": purchase_ms, "support": support_ms,
+                       "total": round((time.perf_counter() - started) * 1000, 1)}
+    }
+
+
+BATCH_MAX_STEPS = int(os.getenv("BATCH_MAX_STEPS", "20"))
+
+# Operations allowed inside a single-transaction batch: MySQL-only work on one connection,
+# without DDL or background queues that would commit or escape the transaction.
+TRANSACTION_OPERATIONS = {
+    "sqlserver_crud": {"read", "describe", "create", "update", "delete"},
+    "sales_crud": {"read", "create", "update", "delete"},
+    "careplan_crud": {"read"},
+    "calllogs_crud": {"read", "customer_history", "fetch_transcript"},
+}
+
+
+def batch_tools() -> dict:
+    # mcp.tool() may wrap the function in a tool object; the callable is kept on .fn.
+    tools = [sqlserver_crud, postgresql_crud, sales_crud, careplan_crud, calllogs_crud, customer_360]
+    return {getattr(tool, "name", None) or getattr(tool, "__name__"): getattr(tool, "fn", tool) for tool in tools}
+
+
+def step_tables(tool_name: str, operation: str, args: dict) -> tuple:
+    # (tables read, tables written), from the same metadata the result cache uses.
+    reads = CACHED_OPERATIONS.get(tool_name, {}).get(operation)
+    if reads is not None and not args.get("incremental"):
+        return set(reads), set()
+    return set(reads or ()), set(write_tables(tool_name, operation))
+
+
+STEP_REF_RE = re.compile(r"^\$([\w-]+)(?:\.(.*))?$", re.S)
+
+
+def step_ref(value, step_ids: set):
+    # "$<step id>.<path>" reads from an earlier step's response, e.g. "$find.result.0.Id"; only
+    # ids declared in the batch count, so other strings that start with "$" pass through, and
+    # "$$..." stands for a literal "$...".
+    if isinstance(value, str) and not value.startswith("$$"):
+        match = STEP_REF_RE.match(value)
+        if match and match.group(1) in step_ids:
+            return match
+    return None
+
+
+def resolve_step_refs(value, results: dict, step_ids: set):
+    if isinstance(value, dict):
+        return {k: resolve_step_refs(v, results, step_ids) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_step_refs(v, results, step_ids) for v in value]
+    if isinstance(value, str) and value.startswith("$$"):
+        return value[1:]
+    match = step_ref(value, step_ids)
+    if match is None:
+        return value
+    current = results[match.group(1)]["response"]
+    for part in match.group(2).split(".") if match.group(2) else []:
+        current = current[int(part)] if isinstance(current, list) else current[part]
+    return current
+
+
+def step_refs(value, step_ids: set) -> set:
+    if isinstance(value, dict):
+        return set().union(*[step_refs(v, step_ids) for v in value.values()]) if value else set()
+    if isinstance(value, list):
+        return set().union(*[step_refs(v, step_ids) for v in value]) if value else set()
+    match = step_ref(value, step_ids)
+    return {match.group(1)} if match else set()
+
+
+@mcp.tool()
+async def batch(steps: list, transaction: bool = False) -> Any:
+    # steps: [{"id"?, "tool", "operation", "args"?, "depends_on"?}], executed in one request.
+    # A step waits for the steps it names in depends_on or references with "$id.path" args
+    # ("$$" escapes a literal "$"), and for earlier steps whose writes overlap the tables it
+    # reads or writes; everything else runs concurrently. transaction=True runs the steps in order on one pinned MySQL
+    # connection and commits only if every step succeeds.
+    if not steps:
+        return {"sql": None, "result": "❌ 'steps' required for batch."}
+    if len(steps) > BATCH_MAX_STEPS:
+        return {"sql": None, "result": f"❌ At most {BATCH_MAX_STEPS} steps per batch."}
+
+    tools = batch_tools()
+    step_ids = {str(step.get("id", index)) for index, step in enumerate(steps)}
+    plan = []
+    for index, step in enumerate(steps):
+        step_id = str(step.get("id", index))
+        tool_name, operation, args = step.get("tool"), step.get("operation", "read"), dict(step.get("args") or {})
+        if tool_name not in tools:
+            return {"sql": None, "result": f"❌ Step '{step_id}': unknown tool '{tool_name}'."}
+        if any(p["id"] == step_id for p in plan):
+            return {"sql": None, "result": f"❌ Duplicate step id '{step_id}'."}
+        if transaction and (operation not in TRANSACTION_OPERATIONS.get(tool_name, ()) or args.get("source")):
+            return {"sql": None,
+                    "result": f"❌ Step '{step_id}': {tool_name} '{operation}' cannot run inside a MySQL transaction."}
+        reads, writes = step_tables(tool_name, operation, args)
+        depends_on = set(map(str, step.get("depends_on") or [])) | step_refs(args, step_ids)
+        unknown = depends_on - {p["id"] for p in plan}
+        if unknown:
+            return {"sql": None, "result": f"❌ Step '{step_id}' depends on unknown or later steps: {sorted(unknown)}."}
+        for earlier in plan:
+            if earlier["writes"] & (reads | writes) or writes & earlier["reads"]:
+                depends_on.add(earlier["id"])
+        plan.append({"id": step_id, "tool": tool_name, "operation": operation, "args": args,
+                     "reads": reads, "writes": writes, "depends_on": depends_on})
+
+    results = {}
+    started = time.monotonic()
+
+    async def run_step(step: dict):
+        step_started = time.monotonic()
+        entry = {"id": step["id"], "tool": step["tool"], "operation": step["operation"]}
+        try:
+            args = resolve_step_refs(step["args"], results, step_ids)
+            response = await tools[step["tool"]](operation=step["operation"], **args)
+            message = response.get("result") if isinstance(response, dict) else None
+            entry["status"] = "error" if isinstance(message, str) and message.startswith("❌") else "ok"
+            entry["response"] = response
+        except Exception as e:
+            entry["status"] = "error"
+            entry["response"] = {"sql": None, "result": f"❌ {e}"}
+        entry["elapsed_ms"] = round((time.monotonic() - step_started) * 1000, 1)
+        results[step["id"]] = entry
+
+    transaction_state = None
+    if transaction:
+        cnxn = get_mysql_conn()
+        token = None
+        try:
+            cur = cnxn.cursor()
+            # Created up front: DDL inside the transaction would commit it.
+            ensure_sales_changelog(cur)
+            cur.execute("START TRANSACTION")
+            token = pinned_mysql.set(PinnedConnection(cnxn))
+            for step in plan:
+                if any(results[d]["status"] != "ok" for d in results):
+                    results[step["id"]] = {"id": step["id"], "tool": step["tool"], "operation": step["operation"],
+                                           "status": "skipped", "response": None}
+                    continue
+                await run_step(step)
+            failed = any(r["status"] != "ok" for r in results.values())
+            if failed:
+                cnxn.rollback()
+                transaction_state = "rolled back"
+            else:
+                cnxn.commit()
+                transaction_state = "committed"
+        except Exception:
+            cnxn.rollback()
+            raise
+        finally:
+            if token is not None:
+                pinned_mysql.reset(token)
+            cnxn.close()
+            # Results cached inside the transaction may reflect rolled-back writes, and other
+            # callers may have cached pre-commit state; drop both.
+            result_cache.invalidate(set().union(*[s["writes"] for s in plan]))
+    else:
+        tasks = {}
+
+        async def run_when_ready(step: dict):
+            if step["depends_on"]:
+                await asyncio.wait([tasks[d] for d in step["depends_on"]])
+            if any(results[d]["status"] != "ok" for d in step["depends_on"]):
+                results[step["id"]] = {"id": step["id"], "tool": step["tool"], "operation": step["operation"],
+                                       "status": "skipped", "response": None}
+                return
+            await run_step(step)
+
+        for step in plan:
+            tasks[step["id"]] = asyncio.ensure_future(run_when_ready(step))
+        await asyncio.gather(*tasks.values())
+
+    ordered = [results[step["id"]] for step in plan]
+    failed = sum(r["status"] == "error" for r in ordered)
+    skipped = sum(r["status"] == "skipped" for r in ordered)
+    if failed:
+        message = f"❌ {failed} of {len(ordered)} steps failed ({skipped} skipped)."
+        if transaction_state:
+            message += " Transaction rolled back."
+    else:
+        message = f"✅ {len(ordered)} steps completed" + (" in one transaction." if transaction_state else ".")
+    return {"sql": None, "result": {"message": message, "steps": ordered, "transaction": transaction_state,
+                                    "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}}
+
+
+@mcp.tool()
+async def server_stats() -> Any:
+    return {"sql": None, "result": {"cache": result_cache.stats(), "shared_cache": shared_cache.stats(),
+                                  "coalescing": single_flight.stats()}}
+
 
 if __name__ == "__main__":
     import sys, os
     sys.stderr.write("[MCP] starting server\n"); sys.stderr.flush()
 
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill-markers":
+        updated = backfill_transcript_markers()
+        sys.stderr.write(f"[MCP] language markers backfilled for {updated} call log(s)\n"); sys.stderr.flush()
+        sys.exit(0)
+
     if os.getenv("SEED_ON_START", "true").lower() != "false":
         try:
             seed_databases()
             sys.stderr.write("[MCP] seeding finished\n"); sys.stderr.flush()
         except Exception as e:
             sys.stderr.write(f"[MCP] seeding failed: {e}\n"); sys.stderr.flush()
+    else:
+        try:
+            conn = get_mysql_conn()
+            ensure_calllog_schema(conn.cursor())
+            conn.close()
+        except Exception as e:
+            sys.stderr.write(f"[MCP] schema upgrade failed: {e}\n"); sys.stderr.flush()
 
 
     ##### CODE TO WORK WITH CLAUDE DESKTOP ##### <-- use these lines if you are going to implement it in claude desktop
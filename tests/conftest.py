@@ -0,0 +1,128 @@
+import asyncio
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py refuses to import without its connection settings; nothing here connects.
+for var in ("MYSQL_HOST", "MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_DB", "PG_HOST", "PG_USER", "PG_PASSWORD",
+            "PG_SALES_HOST", "PG_SALES_USER", "PG_SALES_PASSWORD"):
+    os.environ.setdefault(var, "test")
+for var in ("MYSQL_PORT", "PG_PORT", "PG_SALES_PORT"):
+    os.environ.setdefault(var, "1")
+
+
+@pytest.fixture(scope="session")
+def main():
+    for module in ("fastmcp", "mysql.connector", "psycopg2", "pyodbc", "pandas", "dotenv"):
+        pytest.importorskip(module)
+    import main
+    return main
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        self.rows = list(self.db.run(sql, params))
+        self.rowcount = len(self.rows)
+
+    def executemany(self, sql, seq_params):
+        seq_params = list(seq_params)
+        self.db.run(sql, seq_params, many=True)
+        self.rowcount = len(seq_params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.statements.append(("COMMIT", None))
+
+    def rollback(self):
+        self.db.statements.append(("ROLLBACK", None))
+
+    def close(self):
+        pass
+
+
+class FakeMySQL:
+    # Scripted stand-in for a MySQL server: records every statement, answers SELECTs from
+    # registered (pattern, rows-or-callable) handlers, and fails like MySQL on a table that
+    # was never created.
+    TABLE_RE = re.compile(r"\b(?:FROM|INTO|(?<!KEY )UPDATE|JOIN|TABLE(?: IF NOT EXISTS)?)\s+`?([A-Z]\w*)")
+
+    def __init__(self, tables=()):
+        self.tables = set(tables)
+        self.handlers = []
+        self.statements = []
+
+    def on(self, pattern, result):
+        self.handlers.insert(0, (re.compile(pattern, re.I | re.S), result))
+
+    def connection(self):
+        return FakeConnection(self)
+
+    def executed(self, pattern):
+        regex = re.compile(pattern, re.I | re.S)
+        return [(sql, params) for sql, params in self.statements if regex.search(sql)]
+
+    def run(self, sql, params, many=False):
+        from mysql.connector import errors
+        sql = " ".join(sql.split())
+        self.statements.append((sql, params))
+        created = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", sql, re.I)
+        if created:
+            self.tables.add(created.group(1))
+            return []
+        for table in self.TABLE_RE.findall(sql):
+            if table not in self.tables:
+                raise errors.ProgrammingError(f"1146 (42S02): Table '{table}' doesn't exist")
+        if many:
+            return []
+        for pattern, result in self.handlers:
+            if pattern.search(sql):
+                return result(sql, params) if callable(result) else result
+        return []
+
+
+@pytest.fixture
+def fake_mysql(main, monkeypatch):
+    db = FakeMySQL()
+    monkeypatch.setattr(main, "get_mysql_conn", lambda *args, **kwargs: db.connection())
+    return db
+
+
+@pytest.fixture
+def calllogs_crud(main, fake_mysql, monkeypatch):
+    # The tool as MCP calls it, on the fake database, with an empty result cache and without the
+    # ingest buffer's background tasks.
+    monkeypatch.setattr(main.calllog_write_buffer, "ensure_started", lambda: None)
+    monkeypatch.setattr(main, "result_cache", main.ResultCache(1 << 20, 60))
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    tool = getattr(main.calllogs_crud, "fn", main.calllogs_crud)
+    return lambda **kwargs: asyncio.run(tool(**kwargs))
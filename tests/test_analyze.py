@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.mark.parametrize("operation, args", [
+    ("analyze", {"analysis_type": "sentiment_trend"}),
+    ("analyze_many", {"analysis_types": "issue_frequency, sentiment_trend"}),
+])
+@pytest.mark.parametrize("window", [{"window_days": 0}, {"step_days": 0}, {"window_days": -3, "step_days": -1}])
+def test_sentiment_trend_rejects_empty_windows(fake_mysql, calllogs_crud, operation, args, window):
+    response = calllogs_crud(operation=operation, **args, **window)
+    assert response == {"sql": None, "result": "❌ 'window_days' and 'step_days' must be at least 1."}
+    assert fake_mysql.statements == []
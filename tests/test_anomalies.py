@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+SERIES = ("agent", "Sarah Chen")
+START = datetime(2024, 5, 1)
+
+
+def warmed_state(main, hours=48, start=START):
+    # Steady 18/22 calls an hour with sentiment around 0.5; the last hour is left open.
+    state, anomalies = main.new_anomaly_state(), []
+    for i in range(hours):
+        calls = 18 if i % 2 else 22
+        main.observe_anomaly_calls(SERIES, state, start + timedelta(hours=i), calls, 0.5 * calls, calls, anomalies)
+    assert anomalies == []
+    return state
+
+
+def test_ewma_update_converges(main):
+    mean, var = 0.0, 0.0
+    for _ in range(200):
+        mean, var = main.ewma_update(mean, var, 10.0)
+    assert abs(mean - 10.0) < 1e-6 and var < 1e-6
+
+
+def test_nothing_recorded_during_warmup(main):
+    state, anomalies = main.new_anomaly_state(), []
+    for i in range(main.ANOMALY_WARMUP_HOURS - 1):
+        main.observe_anomaly_calls(SERIES, state, START + timedelta(hours=i), 500 if i == 10 else 5, 0.0, 0, anomalies)
+    assert anomalies == []
+    assert state["HoursObserved"] == main.ANOMALY_WARMUP_HOURS - 2
+
+
+def test_volume_spike_is_recorded_when_the_hour_closes(main):
+    state, anomalies = warmed_state(main), []
+    spike_hour = START + timedelta(hours=48)
+    main.observe_anomaly_calls(SERIES, state, spike_hour, 90, 45.0, 90, anomalies)
+    assert anomalies == []
+    main.observe_anomaly_calls(SERIES, state, spike_hour + timedelta(hours=1), 20, 10.0, 20, anomalies)
+    assert [(a[2], a[3], a[4]) for a in anomalies] == [(spike_hour, "volume", 90)]
+    assert 18 < anomalies[0][5] < 22 and anomalies[0][6] > main.ANOMALY_RECORD_Z
+
+
+def test_sentiment_drop_is_recorded(main):
+    state, anomalies = warmed_state(main), []
+    hour = START + timedelta(hours=48)
+    main.observe_anomaly_calls(SERIES, state, hour, 20, -16.0, 20, anomalies)
+    main.observe_anomaly_calls(SERIES, state, hour + timedelta(hours=1), 20, 10.0, 20, anomalies)
+    assert [(a[2], a[3]) for a in anomalies] == [(hour, "sentiment")]
+    assert anomalies[0][6] < -main.ANOMALY_RECORD_Z
+
+
+def test_late_calls_for_a_closed_hour_are_ignored(main):
+    state = warmed_state(main)
+    before = dict(state)
+    main.observe_anomaly_calls(SERIES, state, START, 1000, 0.0, 0, [])
+    assert state == before
+
+
+def test_silent_hours_are_scored_as_zero_volume(main):
+    state, anomalies = warmed_state(main), []
+    last_open = state["CurrentHour"]
+    main.advance_anomaly_hour(SERIES, state, last_open + timedelta(hours=4), anomalies)
+    assert anomalies and anomalies[0][2] == last_open + timedelta(hours=1)
+    assert anomalies[0][3] == "volume" and anomalies[0][4] == 0
+    assert state["CurrentHour"] == last_open + timedelta(hours=4) and state["HourCalls"] == 0
+    observed = state["HoursObserved"]
+    main.advance_anomaly_hour(SERIES, state, state["CurrentHour"] + timedelta(days=30), [])
+    assert state["HoursObserved"] == observed + 30 * 24
+
+
+class StateCursor:
+    def __init__(self, main, state):
+        self.main, self.state, self.last = main, state, ""
+
+    def execute(self, sql, params=None):
+        self.last = sql
+
+    def fetchall(self):
+        if "CallAnomalyState" in self.last:
+            return [SERIES + tuple(self.state[c] for c in self.main.ANOMALY_STATE_COLUMNS)]
+        return []
+
+
+def test_call_anomalies_scores_only_the_current_hour_live(main):
+    now_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    state = warmed_state(main, start=now_hour - timedelta(hours=47))
+    state["HourCalls"] = 95
+    _, result = main.call_anomalies(StateCursor(main, state), 3.0, None, None)
+    assert [(r["Hour"], r["Metric"], r["InProgress"]) for r in result] == [(now_hour.isoformat(), "volume", True)]
+
+    _, result = main.call_anomalies(StateCursor(main, state), 3.0, None, now_hour)
+    assert result == []
+
+
+def test_call_anomalies_closes_a_silent_series_at_query_time(main):
+    now_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    state = warmed_state(main, start=now_hour - timedelta(hours=60))
+    _, result = main.call_anomalies(StateCursor(main, state), 3.0, None, None)
+    assert result and all(not r["InProgress"] for r in result)
+    assert result[0]["Metric"] == "volume" and result[0]["Observed"] == 0
+    assert state["CurrentHour"] == now_hour - timedelta(hours=13)
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeMySQL
+
+
+def test_step_refs_resolve_paths_and_escape(main):
+    results = {"find": {"response": {"result": [{"Id": 42, "Name": "Ann"}]}}}
+    args = {"customer_id": "$find.result.0.Id", "whole": "$find", "literal": "$$find.result",
+            "other": "$price", "nested": ["$find.result.0.Name", {"x": "$$"}]}
+    assert main.step_refs(args, {"find"}) == {"find"}
+    assert main.resolve_step_refs(args, results, {"find"}) == {
+        "customer_id": 42, "whole": {"result": [{"Id": 42, "Name": "Ann"}]}, "literal": "$find.result",
+        "other": "$price", "nested": ["Ann", {"x": "$"}]}
+
+
+@pytest.fixture
+def db(main, monkeypatch):
+    # Patches connect_mysql rather than get_mysql_conn, so steps still get the pinned connection.
+    db = FakeMySQL({"Customers", "SalesChangeLog"})
+    monkeypatch.setattr(main, "connect_mysql", lambda *args: db.connection())
+    return db
+
+
+@pytest.fixture
+def tools(main, monkeypatch):
+    # Tools that write through get_mysql_conn() the way the real ones do, committing and closing.
+    calls = []
+
+    def tool(name):
+        async def run(operation, **args):
+            calls.append((name, operation, args))
+            conn = main.get_mysql_conn()
+            cur = conn.cursor()
+            cur.execute("START TRANSACTION")
+            cur.execute("UPDATE Customers SET Name = %s WHERE Id = %s", (args.get("name"), args.get("customer_id")))
+            cur.execute("COMMIT")
+            conn.commit()
+            conn.close()
+            if args.get("fail"):
+                return {"sql": None, "result": "❌ Customer not found."}
+            return {"sql": None, "result": [{"Id": 42}]}
+        return run
+
+    monkeypatch.setattr(main, "batch_tools", lambda: {"sqlserver_crud": tool("sqlserver_crud"),
+                                                      "sales_crud": tool("sales_crud")})
+    return calls
+
+
+def run_batch(main, steps, transaction=False):
+    return asyncio.run(getattr(main.batch, "fn", main.batch)(steps, transaction))["result"]
+
+
+def test_batch_passes_earlier_results_to_later_steps(main, db, tools):
+    result = run_batch(main, [
+        {"id": "find", "tool": "sqlserver_crud", "operation": "read"},
+        {"tool": "sales_crud", "operation": "create", "args": {"customer_id": "$find.result.0.Id", "name": "$$5"}},
+    ])
+    assert result["message"] == "✅ 2 steps completed."
+    assert tools[1] == ("sales_crud", "create", {"customer_id": 42, "name": "$5"})
+
+
+def test_transaction_rolls_back_on_failed_step(main, db, tools):
+    result = run_batch(main, [
+        {"tool": "sqlserver_crud", "operation": "update", "args": {"customer_id": 1, "name": "A"}},
+        {"tool": "sqlserver_crud", "operation": "update", "args": {"customer_id": 2, "name": "B", "fail": True}},
+        {"tool": "sales_crud", "operation": "create", "args": {"customer_id": 3}},
+    ], transaction=True)
+    assert result["transaction"] == "rolled back"
+    assert [step["status"] for step in result["steps"]] == ["ok", "error", "skipped"]
+    assert len(tools) == 2
+    statements = [sql for sql, _ in db.statements if not sql.startswith("CREATE")]
+    # Both steps ran on the pinned connection; their own START TRANSACTION/COMMIT were swallowed.
+    assert statements == ["START TRANSACTION", "UPDATE Customers SET Name = %s WHERE Id = %s",
+                          "UPDATE Customers SET Name = %s WHERE Id = %s", "ROLLBACK"]
+
+
+def test_transaction_commits_once_when_every_step_succeeds(main, db, tools):
+    result = run_batch(main, [
+        {"tool": "sqlserver_crud", "operation": "update", "args": {"customer_id": 1, "name": "A"}},
+        {"tool": "sales_crud", "operation": "create", "args": {"customer_id": 1}},
+    ], transaction=True)
+    assert result["transaction"] == "committed"
+    assert [sql for sql, _ in db.statements].count("COMMIT") == 1
+    assert db.statements[-1] == ("COMMIT", None)
+
+
+def test_transaction_rejects_operations_outside_mysql(main, tools):
+    result = run_batch(main, [{"tool": "sqlserver_crud", "operation": "dedupe"}], transaction=True)
+    assert result == "❌ Step '0': sqlserver_crud 'dedupe' cannot run inside a MySQL transaction."
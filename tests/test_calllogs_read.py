@@ -0,0 +1,57 @@
+import re
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def calllogs(fake_mysql):
+    fake_mysql.tables.update({"CallLogs", "Customers"})
+    return fake_mysql
+
+
+def selected(db):
+    (sql, params), = db.executed(r"^SELECT .* FROM CallLogs cl")
+    select = re.match(r"SELECT (.*) FROM CallLogs cl", sql).group(1)
+    return {alias: column for column, alias in re.findall(r"(.+?) AS (\w+)(?:, |$)", select)}
+
+
+def test_default_read_leaves_out_transcripts(main, calllogs, calllogs_crud):
+    response = calllogs_crud(operation="read")
+    columns = selected(calllogs)
+    assert "call_transcript" not in columns
+    assert columns["transcript_length"] == "cl.TranscriptLength"
+    assert columns["transcript_hash"] == "LEFT(SHA2(cl.CallTranscript, 256), 16)"
+    assert list(columns)[:2] == ["log_id", "call_date"]
+    assert response["result"] == [] and response["response_bytes"] == 2
+
+
+def test_preview_truncates_in_sql(main, calllogs, calllogs_crud, monkeypatch):
+    monkeypatch.setattr(main, "TRANSCRIPT_PREVIEW_CHARS", 40)
+    calllogs_crud(operation="read", preview=True)
+    assert selected(calllogs)["call_transcript"] == (
+        "CASE WHEN CHAR_LENGTH(cl.CallTranscript) > 40 "
+        "THEN CONCAT(LEFT(cl.CallTranscript, 40), '...') ELSE cl.CallTranscript END")
+
+
+@pytest.mark.parametrize("flag", ["include_transcripts", "full_text"])
+def test_full_transcripts_on_request(main, calllogs, calllogs_crud, flag):
+    calllogs_crud(operation="read", **{flag: True})
+    assert selected(calllogs)["call_transcript"] == "cl.CallTranscript"
+
+
+def test_star_and_explicit_columns(main, calllogs, calllogs_crud):
+    calllogs_crud(operation="read", columns="*,-call_notes,-customer_name")
+    columns = selected(calllogs)
+    assert {"call_notes", "customer_name", "call_transcript"}.isdisjoint(columns) and "transcript_hash" in columns
+
+    calllogs.statements.clear()
+    calllogs_crud(operation="read", columns="log_id, transcript_length, transcript_hash")
+    assert list(selected(calllogs)) == ["log_id", "transcript_length", "transcript_hash"]
+
+
+def test_rows_are_keyed_by_alias(main, calllogs, calllogs_crud):
+    calllogs.on(r"^SELECT .* FROM CallLogs cl", [(7, datetime(2024, 5, 6, 10, 15), 812, "3f2a9c0d1e4b5a67")])
+    response = calllogs_crud(operation="read", columns="log_id, call_date, transcript_length, transcript_hash")
+    assert response["result"] == [{"log_id": 7, "call_date": "2024-05-06T10:15:00", "transcript_length": 812,
+                                   "transcript_hash": "3f2a9c0d1e4b5a67"}]
@@ -0,0 +1,76 @@
+from functools import reduce
+
+import pytest
+
+
+class DigestSide:
+    # Answers check_products_consistency's queries from {id: row hash}, as one side's database would.
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.queries.append(sql)
+        in_range = lambda lo, hi: {i: h for i, h in self.hashes.items() if lo <= i <= hi}
+        if "MIN(id), MAX(id)" in sql:
+            self.rows = [(min(self.hashes, default=None), max(self.hashes, default=None))]
+        elif "GROUP BY bucket" in sql:
+            lo, width, _, hi = params
+            buckets = {}
+            for i, h in in_range(lo, hi).items():
+                buckets.setdefault((i - lo) // width, []).append(h)
+            self.rows = [(b, len(hs), reduce(lambda a, c: a ^ c, hs)) for b, hs in buckets.items()]
+        else:
+            self.rows = list(in_range(*params).items())
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sides(main, monkeypatch):
+    source = {i: i * 2654435761 % (1 << 64) for i in range(1, 10001)}
+    pg, mysql = DigestSide(source), DigestSide(dict(source))
+    monkeypatch.setattr(main, "get_pg_conn", lambda: pg)
+    monkeypatch.setattr(main, "get_mysql_conn", lambda: mysql)
+    monkeypatch.setattr(main, "CONSISTENCY_FANOUT", 16)
+    monkeypatch.setattr(main, "CONSISTENCY_LEAF_ROWS", 256)
+    return pg, mysql
+
+
+def test_single_changed_row_is_found_by_bisection(main, sides):
+    pg, mysql = sides
+    mysql.hashes[4321] ^= 1
+
+    report = main.check_products_consistency()
+    assert (report["consistent"], report["changed"], report["missing_in_cache"], report["extra_in_cache"]) == (
+        False, [4321], [], [])
+    # 10000 ids -> 16 ranges of 625 -> 16 of 40, one of which is hashed row by row.
+    assert (report["ranges_compared"], report["leaf_ranges"], report["rows_hashed"]) == (32, 1, 80)
+    assert report["round_trips"] == len(pg.queries) + len(mysql.queries) == 8
+
+
+def test_missing_and_extra_rows_in_different_ranges(main, sides):
+    _, mysql = sides
+    del mysql.hashes[17], mysql.hashes[9000]
+    mysql.hashes[10001] = 99  # extends the id range compared
+
+    report = main.check_products_consistency()
+    assert report["missing_in_cache"] == [17, 9000]
+    assert report["extra_in_cache"] == [10001]
+    assert report["changed"] == [] and report["leaf_ranges"] == 3
+
+
+def test_matching_sides_compare_only_the_top_level(main, sides):
+    report = main.check_products_consistency()
+    assert report["consistent"] and report["leaf_ranges"] == 0
+    assert report["ranges_compared"] == 16 and report["round_trips"] == 4
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from conftest import FakeConnection, FakeMySQL
+
+
+class FakePool:
+    # Hands out connections the way connect_mysql's pool does; close() returns them.
+    def __init__(self, db, parties):
+        self.db = db
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.lock = threading.Lock()
+        self.checked_out = set()
+        self.opened = []
+
+    def connect(self, *args):
+        pool = self
+        # Every lookup has to be waiting here at once, or the barrier breaks.
+        self.barrier.wait()
+
+        class PooledConnection(FakeConnection):
+            def close(self):
+                with pool.lock:
+                    pool.checked_out.discard(self)
+
+        conn = PooledConnection(self.db)
+        with self.lock:
+            self.checked_out.add(conn)
+            self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def pool(main, monkeypatch):
+    db = FakeMySQL({"Customers", "Sales", "ProductsCache", "CallLogs"})
+    db.on(r"FROM Customers WHERE Id = %s", lambda sql, params: [
+        (7, "Ada", "Lovelace", "Ada Lovelace", "ada@example.com", datetime(2023, 5, 1))] if params[0] == 7 else [])
+    db.on(r"^SELECT COUNT\(\*\), COALESCE\(SUM\(quantity\)", [(2, 3, 30.5, datetime(2024, 2, 2))])
+    db.on(r"FROM Sales s JOIN ProductsCache", [(12, "Widget", 2, 10.0, 20.0, datetime(2024, 2, 2)),
+                                              (11, "Gadget", 1, 10.5, 10.5, datetime(2024, 1, 9))])
+    db.on(r"^SELECT COUNT\(\*\), AVG\(SentimentScore\)", [(1, 0.5, datetime(2024, 2, 3), datetime(2024, 2, 3))])
+    db.on(r"^SELECT LogID, CallDate", [(5, datetime(2024, 2, 3, 9), "Ann", "Billing", "resolved", 0.5, 120)])
+    pool = FakePool(db, 3)
+    monkeypatch.setattr(main, "connect_mysql", pool.connect)
+    monkeypatch.setattr(main, "result_cache", main.ResultCache(1 << 20, 60))
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    return pool
+
+
+def customer_360(main, **kwargs):
+    return asyncio.run(getattr(main.customer_360, "fn", main.customer_360)(**kwargs))
+
+
+def test_lookups_run_concurrently_on_their_own_connections(main, pool):
+    response = customer_360(main, customer_id=7, limit=2)
+    assert len(pool.opened) == 3 and not pool.checked_out
+    result = response["result"]
+    assert result["Profile"]["Name"] == "Ada Lovelace"
+    assert result["Purchases"]["Summary"] == {"Orders": 2, "Units": 3, "TotalSpent": 30.5,
+                                              "LastPurchase": "2024-02-02T00:00:00"}
+    assert [p["SaleId"] for p in result["Purchases"]["Recent"]] == [12, 11]
+    assert result["Support"]["Summary"]["TotalCalls"] == 1
+    assert result["Support"]["RecentCalls"][0]["LogID"] == 5 and result["Support"]["NextCursor"] is None
+    assert len(response["sql"]) == 4
+    assert set(response["timings_ms"]) == {"profile", "purchases", "support", "total"}
+
+
+def test_unknown_customer_returns_every_connection(main, pool):
+    response = customer_360(main, customer_id=8)
+    assert response["result"] == "❌ Customer 8 not found."
+    assert len(pool.opened) == 3 and not pool.checked_out
+
+
+def test_name_is_resolved_before_the_lookups(main, pool, monkeypatch):
+    monkeypatch.setattr(main, "find_customer_by_name_enhanced", lambda name: {
+        "found": True, "multiple_matches": False, "customer_id": 7, "customer_name": "Ada Lovelace"})
+    assert customer_360(main, customer_name="ada")["result"]["Profile"]["Id"] == 7
+    assert customer_360(main)["result"] == "❌ 'customer_id' or 'customer_name' required for customer_360."
@@ -0,0 +1,64 @@
+import re
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def history(main, fake_mysql, monkeypatch):
+    # Customer 7's calls, with ties on CallDate, answered like the index scan would.
+    fake_mysql.tables.add("CallLogs")
+    monkeypatch.setattr(main, "get_customer_name", lambda customer_id: "Ada Lovelace")
+    rows = [(log_id, datetime(2024, 2, 1 + log_id // 3, 10), "Ann", "Billing", "resolved", 0.25, 60 + log_id)
+            for log_id in range(1, 12)]
+
+    def page(sql, params):
+        customer_id, *keyset, limit = params
+        matching = [r for r in rows if customer_id == 7]
+        if keyset:
+            cursor_date, _, cursor_log_id = keyset
+            matching = [r for r in matching if (r[1], r[0]) < (cursor_date, cursor_log_id)]
+        return sorted(matching, key=lambda r: (r[1], r[0]), reverse=True)[:limit]
+
+    fake_mysql.on(r"^SELECT COUNT\(\*\), AVG\(SentimentScore\)", [(len(rows), 0.25, rows[-1][1], rows[0][1])])
+    fake_mysql.on(r"^SELECT LogID, CallDate", page)
+    return rows
+
+
+def test_history_reads_only_indexed_columns(main, fake_mysql, history, calllogs_crud):
+    page_cursor = calllogs_crud(operation="customer_history", customer_id=7, limit=3)["result"]["NextCursor"]
+    calllogs_crud(operation="customer_history", customer_id=7, limit=3, page_cursor=page_cursor)
+    assert len(fake_mysql.executed(r"FROM CallLogs")) == 3  # summary, first page, second page
+    _, columns = main.CALLLOG_SCHEMA_INDEXES["idx_customer_history"]
+    indexed = columns.strip("()").split(", ")
+    # Equality on the first column, then the keyset order, so no filesort and no row lookups.
+    assert indexed[:3] == ["CustomerID", "CallDate", "LogID"]
+    for sql, _ in fake_mysql.executed(r"FROM CallLogs"):
+        referenced = set(re.findall(r"\b[A-Z][A-Za-z]+\b", sql)) - {
+            "SELECT", "COUNT", "AVG", "MAX", "MIN", "FROM", "CallLogs", "WHERE", "AND", "OR", "ORDER", "BY",
+            "DESC", "LIMIT"}
+        assert referenced <= set(indexed), sql
+
+
+def test_keyset_pages_walk_every_call_once(main, fake_mysql, history, calllogs_crud):
+    seen, page_cursor, pages = [], None, []
+    while True:
+        response = calllogs_crud(operation="customer_history", customer_id=7, limit=4, page_cursor=page_cursor)
+        pages.append(response["result"])
+        seen += [call["LogID"] for call in response["result"]["Calls"]]
+        page_cursor = response["result"]["NextCursor"]
+        if page_cursor is None:
+            break
+    # Newest first; calls sharing a CallDate are ordered by LogID, across page boundaries too.
+    assert seen == sorted(range(1, 12), key=lambda log_id: (log_id // 3, log_id), reverse=True)
+    assert [len(p["Calls"]) for p in pages] == [4, 4, 3]
+    assert pages[0]["Summary"]["TotalCalls"] == 11 and all("Summary" not in p for p in pages[1:])
+    assert pages[0]["NextCursor"] == "2024-02-03T10:00:00|8"  # 7 and 6 share its CallDate
+    assert pages[0]["CustomerName"] == "Ada Lovelace"
+    _, params = fake_mysql.executed(r"LogID < %s\)\) ORDER BY CallDate DESC, LogID DESC LIMIT %s$")[0]
+    assert params == [7, datetime(2024, 2, 3, 10), datetime(2024, 2, 3, 10), 8, 5]
+
+
+def test_malformed_cursor_is_rejected(main, history, calllogs_crud):
+    response = calllogs_crud(operation="customer_history", customer_id=7, page_cursor="yesterday")
+    assert response["result"] == "❌ Invalid page_cursor 'yesterday'."
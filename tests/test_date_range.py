@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+NOW = datetime(2024, 3, 15, 14, 30)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("today", (datetime(2024, 3, 15), datetime(2024, 3, 16))),
+    ("Yesterday", (datetime(2024, 3, 14), datetime(2024, 3, 15))),
+    ("this week", (datetime(2024, 3, 11), None)),
+    ("this month", (datetime(2024, 3, 1), None)),
+    ("  This   Month ", (datetime(2024, 3, 1), None)),
+    ("this year", (datetime(2024, 1, 1), None)),
+    ("last 7 days", (NOW - timedelta(days=7), None)),
+    ("past hour", (NOW - timedelta(hours=1), None)),
+    ("last2weeks", (NOW - timedelta(weeks=2), None)),
+    ("since 2024-03-01", (datetime(2024, 3, 1), None)),
+    ("since 2024-03-01 08:15", (datetime(2024, 3, 1, 8, 15), None)),
+    ("before 2024-02-01", (None, datetime(2024, 2, 1))),
+    ("2024-02-29", (datetime(2024, 2, 29), datetime(2024, 3, 1))),
+    ("2024-01-01 to 2024-01-31", (datetime(2024, 1, 1), datetime(2024, 2, 1))),
+    ("between 2024-01-01 and 2024-01-31", (datetime(2024, 1, 1), datetime(2024, 2, 1))),
+    ("from 2024-01-01 until 2024-01-02 12:00", (datetime(2024, 1, 1), datetime(2024, 1, 2, 12))),
+    ("2024-01-01..2024-01-07", (datetime(2024, 1, 1), datetime(2024, 1, 8))),
+    ("2024-01-01 - 2024-01-07", (datetime(2024, 1, 1), datetime(2024, 1, 8))),
+])
+def test_parse_date_range(main, text, expected):
+    assert main.parse_date_range(text, now=NOW) == expected
+
+
+def test_this_month_on_the_first(main):
+    assert main.parse_date_range("this month", now=datetime(2024, 4, 1, 0, 5)) == (datetime(2024, 4, 1), None)
+
+
+@pytest.mark.parametrize("text", ["next week", "since yesterday", "2024-13-01", "2024-01-01 to", "soon"])
+def test_parse_date_range_rejects_unknown_text(main, text):
+    with pytest.raises(ValueError):
+        main.parse_date_range(text, now=NOW)
+
+
+def test_date_range_clauses_are_half_open(main):
+    start, end = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    assert main.date_range_clauses(start, end, "CallDate") == (["CallDate >= %s", "CallDate < %s"], [start, end])
+    assert main.date_range_clauses(None, None, "CallDate") == ([], [])
@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("martha", "marhta", 0.9611),
+    ("dwayne", "duane", 0.84),
+    ("dixon", "dicksonx", 0.8133),
+    ("jellyfish", "smellyfish", 0.8963),
+])
+def test_jaro_winkler_reference_values(main, a, b, expected):
+    assert main.jaro_winkler(a, b) == pytest.approx(expected, abs=1e-4)
+
+
+def test_jaro_winkler_bounds(main):
+    assert main.jaro_winkler("bob smith", "bob smith") == 1.0
+    assert main.jaro_winkler("", "bob") == 0.0
+    assert main.jaro_winkler("abc", "xyz") == 0.0
+    assert main.jaro_winkler("robert", "rupert") == main.jaro_winkler("rupert", "robert")
+
+
+def test_customer_similarity_uses_email_as_evidence(main):
+    plain = main.normalize_customer((1, None, None, "Jon Smith", None))
+    same_email = main.normalize_customer((2, "John", "Smith", None, " JSMITH@example.com"))
+    other = main.normalize_customer((3, None, None, "John  Smith!", "john@elsewhere.org"))
+    assert plain == (1, "jon smith", "")
+    assert same_email[1:] == ("john smith", "jsmith@example.com")
+    name_only = main.customer_similarity(plain, same_email)
+    assert name_only == main.jaro_winkler("jon smith", "john smith")
+    matching = main.customer_similarity(same_email, same_email[:2] + ("jsmith@example.com",))
+    assert matching == 1.0
+    assert main.customer_similarity(same_email, other) < main.jaro_winkler("john smith", "john smith")
+
+
+def test_merge_clusters_are_transitive_and_keep_oldest_with_email(main):
+    records = {1: {"Email": ""}, 2: {"Email": "a@x.com"}, 3: {"Email": "b@x.com"}, 7: {"Email": ""}, 8: {"Email": ""}}
+    candidates = {(1, 2): (0.95, "block"), (2, 3): (0.93, "block"), (7, 8): (0.9, "block"), (8, 9): (0.9, "block")}
+    assert main.customer_merge_clusters(candidates, records) == [
+        {"survivor": 2, "duplicates": [3, 1]},
+        {"survivor": 7, "duplicates": [8]},
+    ]
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+
+COLUMNS = {"product_name": "p.name", "customer_name": "c.Name", "total_price": "s.total_price"}
+
+
+class FakePostgres:
+    def __init__(self, products):
+        self.products = products
+        self.queries = []
+
+    def connection(self):
+        return self
+
+    def cursor(self, name=None):
+        return self
+
+    def execute(self, sql, params=()):
+        self.queries.append((" ".join(sql.split()), list(params)))
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def fetchall(self):
+        return list(self.products)
+
+    def close(self):
+        pass
+
+
+def test_product_filters_keep_equality_literal(main):
+    filters = main.parse_sales_filters("product name = 'Widget_100%'", None, COLUMNS)
+    assert filters == [("p.name", "=", "widget_100%")]
+    assert main.federated_product_filters(filters) == (["lower(name) = lower(%s)"], ["widget_100%"])
+
+
+def test_product_filters_translate_like_and_leave_values_alone(main):
+    filters = main.parse_sales_filters(None, {"product_name": "p.o"}, COLUMNS)
+    assert filters == [("p.name", "LIKE", "%p.o%")]
+    assert main.federated_product_filters(filters) == (["name ILIKE %s"], ["%p.o%"])
+    assert main.federated_product_filters([("p.price", ">", 5)]) == (["price > %s"], [5])
+
+
+@pytest.fixture
+def sales(fake_mysql):
+    # (Id, product_id, sale_date, c.Name, s.total_price); two sales share a timestamp and one has no date.
+    rows = [
+        (1, 10, datetime(2024, 1, 1), "Ann", 5.0),
+        (2, 11, datetime(2024, 1, 3), "Bob", 7.0),
+        (3, 10, datetime(2024, 1, 3), "Cy", 9.0),
+        (4, 12, datetime(2024, 1, 2), "Di", 2.0),
+        (5, 10, None, "Ed", 4.0),
+        (6, 11, datetime(2024, 1, 1), "Flo", 6.0),
+    ]
+    ordered = sorted(rows, key=lambda r: (r[2] is not None, r[2] or datetime.min, r[0]), reverse=True)
+
+    def probe(sql, params):
+        *keyset, size = params[1:]  # params[0] is the pushed-down total_price filter
+        if len(keyset) == 1:
+            page = [r for r in ordered if r[2] is None and r[0] < keyset[0]]
+        elif keyset:
+            date, _, last_id = keyset
+            page = [r for r in ordered if r[2] is None or r[2] < date or (r[2] == date and r[0] < last_id)]
+        else:
+            page = ordered
+        return [r for r in page if r[4] > params[0]][:size]
+
+    fake_mysql.tables.update({"Sales", "Customers"})
+    fake_mysql.on(r"^SELECT s\.Id, s\.product_id, s\.sale_date", probe)
+    return fake_mysql
+
+
+@pytest.mark.parametrize("build_max_rows", [100, 1])
+def test_hash_join_streams_in_read_order(main, monkeypatch, sales, build_max_rows):
+    postgres = FakePostgres([(10, "Widget"), (11, "Gadget")])  # product 12 is filtered out
+    monkeypatch.setattr(main, "get_pg_conn", postgres.connection)
+    monkeypatch.setattr(main, "FEDERATION_BATCH_SIZE", 2)
+    monkeypatch.setattr(main, "FEDERATION_BUILD_MAX_ROWS", build_max_rows)
+    filters = [("s.total_price", ">", 3.0), ("p.name", "LIKE", "%g%")]
+
+    sql, rows = main.federated_sales_read(["s.Id", "c.Name", "p.name"], filters, None)
+    # sale_date DESC, Id DESC with the undated sale last, as in the ProductsCache read.
+    assert rows == [(3, "Cy", "Widget"), (2, "Bob", "Gadget"), (6, "Flo", "Gadget"), (1, "Ann", "Widget"),
+                    (5, "Ed", "Widget")]
+    assert f"ORDER BY {main.SALES_READ_ORDER}" in sql
+    assert postgres.queries[0] == ("SELECT id, name FROM products WHERE name ILIKE %s", ["%g%"])
+    if build_max_rows == 1:
+        # The build side overflowed, so each probe batch looked its products up by id.
+        assert all(q.endswith("AND id = ANY(%s)") for q, _ in postgres.queries[1:])
+        assert len(postgres.queries) > 2
+    probes = sales.executed(r"^SELECT s\.Id, s\.product_id")
+    assert [params[-1] for _, params in probes] == [2, 2, 2]
+
+
+def test_hash_join_stops_at_limit(main, monkeypatch, sales):
+    monkeypatch.setattr(main, "get_pg_conn", FakePostgres([(10, "Widget"), (11, "Gadget")]).connection)
+    monkeypatch.setattr(main, "FEDERATION_BATCH_SIZE", 2)
+    _, rows = main.federated_sales_read(["s.Id", "p.name"], [("s.total_price", ">", 0.0)], 2)
+    assert rows == [(3, "Widget"), (2, "Gadget")]
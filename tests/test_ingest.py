@@ -0,0 +1,82 @@
+import re
+from datetime import datetime
+
+import pytest
+
+@pytest.fixture
+def upgraded_db(main, fake_mysql):
+    # A database that predates the derived tables: CallLogs has rows and every column and index.
+    fake_mysql.tables.update({"CallLogs", "Customers"})
+    columns = ["LogID", "CallDate", "CustomerID", "AgentName", "CallTranscript"] + [
+        column for column, _ in main.CALLLOG_SCHEMA_COLUMNS]
+    fake_mysql.on(r"information_schema\.COLUMNS", [(column,) for column in columns])
+    fake_mysql.on(r"information_schema\.STATISTICS", [(index,) for index in main.CALLLOG_SCHEMA_INDEXES])
+    fake_mysql.on(r"^SELECT EXISTS", lambda sql, params: [
+        tuple(int(table == "CallLogs") for table in re.findall(r"SELECT 1 FROM (\w+)", sql))])
+    fake_mysql.on(r"^SELECT Id FROM Customers", lambda sql, params: [(i,) for i in params])
+    fake_mysql.on(r"^SELECT LogID, IngestKey FROM CallLogs",
+                  lambda sql, params: [(100 + i, key) for i, key in enumerate(params)])
+    fake_mysql.on(r"GET_LOCK\('transcript_keywords'", [(1,)])
+    fake_mysql.on(r"^SELECT COALESCE\(MAX\(LastLogID\), 0\) FROM TranscriptKeywordCategories$", [(0,)])
+    return fake_mysql
+
+
+def calls(main, n=3):
+    return [main.normalize_call_log({
+        "call_date": datetime(2024, 5, 6, 10, 15 + i), "customer_id": 7, "agent_name": "Sarah Chen",
+        "issue_category": "Billing", "resolution_status": "resolved", "sentiment_score": 0.4,
+        "call_duration": 300 + i, "wait_time": 20,
+        "call_transcript": "Customer was charged twice for the premium plan; refund issued.",
+        "ingest_key": f"call-{i}",
+    }) for i in range(n)]
+
+
+def test_schema_upgrade_builds_derived_tables_once(main, upgraded_db):
+    main.ensure_calllog_schema(upgraded_db.connection().cursor())
+    assert {"CallRollupHourly", "CallRollupDaily", "CallSketches", "CallAnomalyState", "CallAnomalies",
+            "TranscriptLshBands"} <= upgraded_db.tables
+    assert not upgraded_db.executed(r"^ALTER TABLE CallLogs")
+    assert len(upgraded_db.executed(r"^INSERT INTO CallRollupHourly .* FROM CallLogs")) == 1
+    assert len(upgraded_db.executed(r"^DELETE FROM CallSketches")) == 1
+    assert len(upgraded_db.executed(r"^DELETE FROM CallAnomalyState")) == 1
+
+
+def test_ingest_into_upgraded_database(main, upgraded_db):
+    main.ensure_calllog_schema(upgraded_db.connection().cursor())
+    stats = main.write_call_log_batch(calls(main))
+    assert stats == {"inserted": 3, "duplicates": 0, "unknown_customers": 0}
+    assert upgraded_db.executed(r"INTO CallSketches")
+    assert upgraded_db.executed(r"^REPLACE INTO CallAnomalyState")
+    assert upgraded_db.executed(r"^INSERT IGNORE INTO TranscriptLshBands")
+    assert [sql for sql, _ in upgraded_db.statements[-2:]] == [
+        "COMMIT", "SELECT RELEASE_LOCK('transcript_keywords')"]
+    # The keyword counts were never built, so ingest leaves them to the first analysis.
+    assert "TranscriptKeywordCategories" in upgraded_db.tables
+    assert not upgraded_db.executed(r"^INSERT INTO TranscriptKeyword")
+
+
+def test_ingest_folds_into_built_keyword_counts(main, upgraded_db):
+    main.ensure_calllog_schema(upgraded_db.connection().cursor())
+    upgraded_db.on(r"^SELECT COALESCE\(MAX\(LastLogID\), 0\) FROM TranscriptKeywordCategories$", [(50,)])
+    upgraded_db.statements.clear()
+    main.write_call_log_batch(calls(main))
+
+    (_, counts), = upgraded_db.executed(r"^INSERT INTO TranscriptKeywordCounts")
+    words = main.tokenize_transcript(calls(main)[0][main.CALLLOG_INSERT_COLUMNS.index("CallTranscript")])
+    assert sorted(counts) == sorted(("Billing", word, 3 * words.count(word)) for word in set(words))
+    (sql, categories), = upgraded_db.executed(r"^INSERT INTO TranscriptKeywordCategories")
+    assert categories == [("Billing", 3, 102)]
+    assert "GREATEST(LastLogID, VALUES(LastLogID))" in sql
+    # Folded inside the batch transaction, under the lock the keyword refresh takes.
+    order = [sql for sql, _ in upgraded_db.statements]
+    assert (order.index("SELECT GET_LOCK('transcript_keywords', 2)") < order.index("START TRANSACTION")
+            < order.index(sql) < order.index("COMMIT"))
+
+
+def test_ingest_skips_keyword_counts_without_the_lock(main, upgraded_db):
+    main.ensure_calllog_schema(upgraded_db.connection().cursor())
+    upgraded_db.on(r"GET_LOCK\('transcript_keywords'", [(0,)])
+    upgraded_db.on(r"^SELECT COALESCE\(MAX\(LastLogID\), 0\) FROM TranscriptKeywordCategories$", [(50,)])
+    assert main.write_call_log_batch(calls(main))["inserted"] == 3
+    assert not upgraded_db.executed(r"^INSERT INTO TranscriptKeyword")
+    assert not upgraded_db.executed(r"RELEASE_LOCK")
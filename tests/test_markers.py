@@ -0,0 +1,61 @@
+import pytest
+
+
+def flags(main, transcript):
+    return dict(zip(main.CALLLOG_MARKER_COLUMNS, main.detect_transcript_markers(transcript)))
+
+
+def test_markers_match_case_insensitively(main):
+    found = flags(main, "Customer was UPSET; agent Apologized, ESCALATED to tier 2 and the issue was Resolved.")
+    assert {column for column in main.TRANSCRIPT_MARKERS if found[column]} == {
+        "HasNegative", "HasApology", "HasEscalation", "HasSolution"}
+    assert found["MarkersVersion"] == main.TRANSCRIPT_MARKERS_VERSION
+
+
+@pytest.mark.parametrize("transcript, column", [
+    ("Caller was frustrated.", "HasNegative"),
+    ("Customer was grateful for the help.", "HasPositive"),
+    ("I'm sorry about that.", "HasApology"),
+    ("A fix was found and the problem fixed.", "HasSolution"),
+    ("Escalation requested.", "HasEscalation"),
+    ("Third time calling about this again.", "HasRecurring"),
+    ("Repeated billing error.", "HasRecurring"),
+])
+def test_each_marker_word(main, transcript, column):
+    found = flags(main, transcript)
+    assert [c for c in main.TRANSCRIPT_MARKERS if found[c]] == [column]
+
+
+def test_empty_transcript_and_length_in_bytes(main):
+    assert flags(main, None) == {**dict.fromkeys(main.TRANSCRIPT_MARKERS, 0), "TranscriptLength": 0,
+                                 "MarkersVersion": main.TRANSCRIPT_MARKERS_VERSION}
+    assert flags(main, "café")["TranscriptLength"] == 5
+    assert not any(flags(main, "Routine address change, nothing else.")[c] for c in main.TRANSCRIPT_MARKERS)
+
+
+@pytest.fixture
+def calllogs(fake_mysql):
+    fake_mysql.tables.add("CallLogs")
+    return fake_mysql
+
+
+@pytest.mark.parametrize("args", [{"operation": "analyze", "analysis_type": "agent_communication"},
+                                  {"operation": "analyze_many",
+                                   "analysis_types": ["agent_communication", "problem_patterns"]}])
+def test_marker_analyses_report_a_pending_backfill(main, calllogs, calllogs_crud, args):
+    calllogs.on(r"WHERE MarkersVersion < %s", [(12,)])
+    response = calllogs_crud(**args)
+    results = response["result"].values() if args["operation"] == "analyze_many" else [response["result"]]
+    assert list(results) and all(r == ("ℹ️ Language markers are not computed yet for 12 call log(s) in this "
+                                       "range; run operation 'backfill_markers' first.") for r in results)
+    assert not calllogs.executed(r"SUM\(HasNegative\)")
+
+
+def test_marker_analysis_runs_once_backfilled(main, calllogs, calllogs_crud):
+    calllogs.on(r"WHERE MarkersVersion < %s", [(0,)])
+    # AgentName, then the MARKER_MEASURES totals.
+    calllogs.on(r"SUM\(HasNegative\)", [("Ann", 4, 2.0, 4, 1200, 4, 4000, 1, 3, 2, 4, 1, 0, 1)])
+    response = calllogs_crud(operation="analyze", analysis_type="agent_communication")
+    assert response["result"] == [{"AgentName": "Ann", "TotalCalls": 4, "AvgTranscriptLength": 1000,
+                                   "ApologyRate": 50.0, "SolutionOrientedRate": 100.0, "EscalationRate": 25.0,
+                                   "AvgDuration": 300.0}]
@@ -0,0 +1,51 @@
+import random
+import string
+
+
+def words(rng, n):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(n)]
+
+
+def shingles(main, text):
+    tokens = main.tokenize_transcript(text)
+    return {" ".join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def test_signature_similarity_estimates_jaccard(main):
+    rng = random.Random(3)
+    for keep in (0.95, 0.8, 0.5, 0.2):
+        base = words(rng, 400)
+        other = [w if rng.random() < keep else words(rng, 1)[0] for w in base]
+        a, b = " ".join(base), " ".join(other)
+        expected = jaccard(shingles(main, a), shingles(main, b))
+        estimate = main.signature_similarity(main.transcript_minhash(a), main.transcript_minhash(b))
+        # 64 permutations: standard error is at most 0.5 / sqrt(64) = 0.0625.
+        assert abs(estimate - expected) < 0.2, (keep, expected, estimate)
+
+
+def test_signatures_are_deterministic(main):
+    text = "customer reported billing discrepancy after upgrading their subscription plan"
+    assert main.transcript_minhash(text) == main.transcript_minhash(text)
+    assert main.minhash_coefficients(main.MINHASH_PERMUTATIONS, main.MINHASH_SEED) == main.MINHASH_COEFFICIENTS
+    assert main.transcript_minhash("a an the") is None
+
+
+def test_lsh_buckets_collide_for_near_duplicates_only(main):
+    rng = random.Random(5)
+    base = words(rng, 200)
+    near = base[:]
+    near[100] = "different"
+    unrelated = words(rng, 200)
+
+    def shared_bands(x, y):
+        bx = main.lsh_buckets(main.transcript_minhash(" ".join(x)))
+        by = main.lsh_buckets(main.transcript_minhash(" ".join(y)))
+        return len(set(bx) & set(by))
+
+    assert len(main.lsh_buckets(main.transcript_minhash(" ".join(base)))) == main.MINHASH_BANDS
+    assert shared_bands(base, near) > 0
+    assert shared_bands(base, unrelated) == 0
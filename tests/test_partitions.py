@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+
+
+class PartitionCursor:
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append(" ".join(sql.split()))
+
+    def fetchall(self):
+        return [(name,) for name in self.partitions]
+
+
+@pytest.fixture
+def may_2024(main, monkeypatch):
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 5, 20, 13, 45)
+
+    monkeypatch.setattr(main, "datetime", FixedDatetime)
+    monkeypatch.setattr(main, "CALLLOGS_PARTITION_MONTHS_AHEAD", 2)
+
+
+def test_definitions_are_monthly_upper_bounds_across_years(main):
+    assert main.calllog_partition_definitions(datetime(2023, 11, 17, 8), datetime(2024, 2, 1)) == [
+        "PARTITION p202311 VALUES LESS THAN ('2023-12-01')",
+        "PARTITION p202312 VALUES LESS THAN ('2024-01-01')",
+        "PARTITION p202401 VALUES LESS THAN ('2024-02-01')",
+        "PARTITION p202402 VALUES LESS THAN ('2024-03-01')",
+    ]
+    assert main.calllog_partition_definitions(datetime(2024, 3, 1), datetime(2024, 2, 1)) == []
+
+
+def test_clause_covers_existing_rows_and_months_ahead(main, monkeypatch):
+    monkeypatch.setattr(main, "CALLLOGS_PARTITION_MONTHS_AHEAD", 2)
+    clause = main.calllog_partition_clause(datetime(2024, 1, 15), datetime(2024, 3, 31, 23, 59))
+    partitions = [line.strip().rstrip(",") for line in clause.splitlines()[2:-1]]
+    assert clause.splitlines()[1].strip() == "PARTITION BY RANGE COLUMNS (CallDate) ("
+    assert [p.split()[1] for p in partitions] == ["p202401", "p202402", "p202403", "p202404", "p202405", "pmax"]
+    assert partitions[-2] == "PARTITION p202405 VALUES LESS THAN ('2024-06-01')"
+    assert partitions[-1] == "PARTITION pmax VALUES LESS THAN (MAXVALUE)"
+
+
+def test_maintenance_splits_pmax_after_the_newest_partition(main, may_2024):
+    cur = PartitionCursor(["p202402", "p202403", "pmax"])
+    assert main.maintain_calllog_partitions(cur) == ["p202404", "p202405", "p202406", "p202407"]
+    assert cur.statements[-1] == (
+        "ALTER TABLE CallLogs REORGANIZE PARTITION pmax INTO ( "
+        "PARTITION p202404 VALUES LESS THAN ('2024-05-01'), PARTITION p202405 VALUES LESS THAN ('2024-06-01'), "
+        "PARTITION p202406 VALUES LESS THAN ('2024-07-01'), PARTITION p202407 VALUES LESS THAN ('2024-08-01'), "
+        "PARTITION pmax VALUES LESS THAN (MAXVALUE) )")
+
+
+@pytest.mark.parametrize("partitions", [["p202405", "p202406", "p202407", "pmax"], ["p202405", "p202407"], []])
+def test_maintenance_is_a_no_op_when_covered_or_unpartitioned(main, may_2024, partitions):
+    cur = PartitionCursor(partitions)
+    assert main.maintain_calllog_partitions(cur) == []
+    assert not any(s.startswith("ALTER") for s in cur.statements)
+
+
+def test_maintenance_of_an_empty_range_starts_this_month(main, may_2024):
+    cur = PartitionCursor(["pmax"])
+    assert main.maintain_calllog_partitions(cur) == ["p202405", "p202406", "p202407"]
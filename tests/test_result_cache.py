@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def swr(main, monkeypatch):
+    # A zero TTL makes every stored entry stale at once, but still within SWR_MAX_STALENESS.
+    monkeypatch.setattr(main, "result_cache", main.ResultCache(1 << 20, 0))
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    monkeypatch.setattr(main, "SWR_MAX_STALENESS", 900)
+    state = {"calls": 0, "release": None}
+
+    @main.cached_tool("sales_crud")
+    async def tool(operation="aggregate", group_by="day"):
+        state["calls"] += 1
+        if state["release"] is not None:
+            await state["release"].wait()
+        return {"sql": "SELECT ...", "result": [{"total": state["calls"]}]}
+
+    return tool, state
+
+
+def test_stale_entry_served_while_one_revalidation_runs(main, swr):
+    tool, state = swr
+
+    async def scenario():
+        first = await tool(operation="aggregate", group_by="day")
+        state["release"] = asyncio.Event()
+        stale = [await tool(operation="aggregate", group_by="day") for _ in range(3)]
+        await asyncio.sleep(0)
+        assert state["calls"] == 2 and main.single_flight.stats()["in_flight"] == 1
+        state["release"].set()
+        while main.single_flight.flights:
+            await asyncio.sleep(0)
+        return first, stale
+
+    first, stale = asyncio.run(scenario())
+    assert first == {"sql": "SELECT ...", "result": [{"total": 1}]}
+    assert [r["result"] for r in stale] == [[{"total": 1}]] * 3
+    assert all(r["stale"] and r["age_seconds"] >= 0 for r in stale)
+    assert main.single_flight.stats()["coalesced"] == 2
+    assert main.result_cache.counters["stale_served"] == 3
+    # The revalidation replaced the entry.
+    (value, *_), = main.result_cache.entries.values()
+    assert value["result"] == [{"total": 2}]
+
+
+def test_invalidated_entry_is_never_served_stale(main, swr):
+    tool, state = swr
+
+    async def scenario():
+        await tool(operation="aggregate", group_by="day")
+        main.result_cache.invalidate(("Sales",), publish=False)
+        return await tool(operation="aggregate", group_by="day")
+
+    result = asyncio.run(scenario())
+    assert result == {"sql": "SELECT ...", "result": [{"total": 2}]}
+
+
+def test_non_swr_operation_waits_for_a_fresh_result(main, swr):
+    tool, state = swr
+    asyncio.run(tool(operation="read", group_by="day"))
+    result = asyncio.run(tool(operation="read", group_by="day"))
+    assert "stale" not in result and state["calls"] == 2
+
+
+def test_lru_eviction_keeps_recently_used_entries(main):
+    size = main.response_size({"rows": "x" * 100})
+    cache = main.ResultCache(3 * size, 60)
+    for key in "abc":
+        cache.put(key, {"rows": "x" * 100}, ("Sales",), (0,))
+    assert cache.get("a", ("Sales",)) is not None  # a is now the most recently used
+    cache.put("d", {"rows": "x" * 100}, ("Sales",), (0,))
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.bytes == 3 * size and cache.counters["evictions"] == 1
+    # Re-putting a key replaces it rather than counting it twice.
+    cache.put("d", {"rows": "y" * 100}, ("Sales",), (0,))
+    assert cache.bytes == 3 * size and cache.get("d", ("Sales",)) == {"rows": "y" * 100}
+    # A value larger than the whole cache is not stored and evicts nothing.
+    cache.put("big", {"rows": "x" * 1000}, ("Sales",), (0,))
+    assert list(cache.entries) == ["c", "a", "d"]
+
+
+def test_write_to_any_table_invalidates_entry(main):
+    cache = main.ResultCache(1 << 20, 60)
+    tables = ("Sales", "Customers")
+    cache.put("sales", {"rows": [1]}, tables, cache.snapshot(tables))
+    cache.put("products", {"rows": [2]}, ("products",), cache.snapshot(("products",)))
+    cache.invalidate(("Customers",), publish=False)
+    assert cache.snapshot(tables) == (0, 1)
+    assert cache.get("sales", tables) is None
+    assert cache.get("products", ("products",)) == {"rows": [2]}
+    assert cache.counters["invalidated"] == 1 and "sales" not in cache.entries
+
+
+def test_result_computed_across_a_write_is_not_stored(main):
+    cache = main.ResultCache(1 << 20, 60)
+    generations = cache.snapshot(("Sales",))
+    cache.invalidate(("Sales",), publish=False)  # a write lands while the read runs
+    cache.put("sales", {"rows": [1]}, ("Sales",), generations)
+    assert cache.get("sales", ("Sales",)) is None
+    assert cache.counters["stale_puts"] == 1
+    cache.put("sales", {"rows": [2]}, ("Sales",), cache.snapshot(("Sales",)))
+    assert cache.get("sales", ("Sales",)) == {"rows": [2]}
@@ -0,0 +1,118 @@
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+
+
+class RollupStore:
+    # Applies apply_call_rollups' upserts to in-memory tables, as MySQL's ON DUPLICATE KEY would.
+    def __init__(self):
+        self.tables = defaultdict(dict)
+
+    def executemany(self, sql, rows):
+        table = sql.split("INTO")[1].split()[0]
+        for bucket, agent, category, *measures in rows:
+            totals = self.tables[table].setdefault((bucket, agent, category), [0] * len(measures))
+            self.tables[table][(bucket, agent, category)] = [a + b for a, b in zip(totals, measures)]
+
+    def totals(self, main, table, key_position):
+        # rollup_totals_sql: SUM of every measure grouped by one key column.
+        grouped = defaultdict(lambda: [0] * len(main.ROLLUP_MEASURES))
+        for key, measures in self.tables[table].items():
+            grouped[key[key_position]] = [a + b for a, b in zip(grouped[key[key_position]], measures)]
+        return [(key, main.rollup_measures(measures)) for key, measures in grouped.items()]
+
+
+@pytest.fixture
+def calls(main):
+    # Sentiments are multiples of 0.25, so float sums are exact in any order.
+    rng = random.Random(7)
+    rows = []
+    for i in range(400):
+        rows.append(main.normalize_call_log({
+            "call_date": datetime(2024, 3, 1) + timedelta(minutes=rng.randrange(0, 7 * 24 * 60)),
+            "customer_id": rng.randrange(1, 50), "agent_name": rng.choice(["Ann", "Bob", "Cy"]),
+            "issue_category": rng.choice(["Billing", "Technical", "Account", None]),
+            "resolution_status": rng.choice(["resolved", "escalated", "pending"]),
+            "sentiment_score": rng.choice([None, -1.0, -0.5, 0.0, 0.25, 0.5, 0.75, 1.0]),
+            "call_duration": rng.randrange(30, 1800), "wait_time": rng.randrange(0, 300),
+            "transfer_count": rng.randrange(0, 3), "call_transcript": "", "ingest_key": f"call-{i}",
+        }))
+    return [dict(zip(main.CALLLOG_INSERT_COLUMNS, row)) for row in rows], rows
+
+
+def raw_groups(calls, key):
+    groups = defaultdict(list)
+    for call in calls:
+        groups[key(call)].append(call)
+    return groups
+
+
+def avg(values):
+    return round(sum(values) / len(values), 4) if values else 0
+
+
+def test_buckets_truncate_to_the_hour_and_day(main, calls):
+    call_dicts, rows = calls
+    store = RollupStore()
+    main.apply_call_rollups(store, rows)
+    hourly, daily = store.tables["CallRollupHourly"], store.tables["CallRollupDaily"]
+    assert all(b.minute == b.second == 0 and isinstance(b, datetime) for b, _, _ in hourly)
+    assert all(type(b) is date for b, _, _ in daily)
+    # Daily totals are the hourly ones summed by day, as rebuild_call_rollups derives them.
+    by_day = defaultdict(lambda: [0] * len(main.ROLLUP_MEASURES))
+    for (bucket, agent, category), measures in hourly.items():
+        key = (bucket.date(), agent, category)
+        by_day[key] = [a + b for a, b in zip(by_day[key], measures)]
+    assert by_day == daily
+    assert sum(m[0] for m in daily.values()) == len(rows)
+    assert ("Ann", "") in {(a, c) for _, a, c in daily}  # NULL category keyed as ''
+
+
+def test_rollup_aggregates_match_the_raw_calls(main, calls):
+    call_dicts, rows = calls
+    store = RollupStore()
+    main.apply_call_rollups(store, rows[:150])
+    main.apply_call_rollups(store, rows[150:])  # folded across batches
+
+    by_agent = raw_groups(call_dicts, lambda c: c["AgentName"])
+    sentiments = lambda group: [c["SentimentScore"] for c in group if c["SentimentScore"] is not None]
+    assert main.format_rollup_analysis("sentiment_by_agent", store.totals(main, "CallRollupDaily", 1)) == sorted([
+        {"AgentName": agent, "AvgSentiment": avg(sentiments(group)), "TotalCalls": len(group),
+         "PositiveCalls": sum(s >= 0.5 for s in sentiments(group))}
+        for agent, group in by_agent.items()], key=lambda r: r["AvgSentiment"], reverse=True)
+
+    assert main.format_rollup_analysis("agent_performance", store.totals(main, "CallRollupHourly", 1)) == sorted([
+        {"AgentName": agent, "TotalCalls": len(group), "AvgCallDuration": avg([c["CallDuration"] for c in group]),
+         "AvgSentiment": avg(sentiments(group)),
+         "ResolutionRate": avg([100.0 if c["ResolutionStatus"] == "resolved" else 0 for c in group]),
+         "AvgTransfers": avg([c["TransferCount"] for c in group])}
+        for agent, group in by_agent.items()], key=lambda r: r["ResolutionRate"], reverse=True)
+
+    by_category = raw_groups(call_dicts, lambda c: c["IssueCategory"])
+    assert main.format_rollup_analysis("escalation_analysis", store.totals(main, "CallRollupDaily", 2)) == sorted([
+        {"IssueCategory": category, "TotalCalls": len(group),
+         "EscalatedCalls": sum(c["ResolutionStatus"] == "escalated" for c in group),
+         "EscalationRate": avg([100.0 if c["ResolutionStatus"] == "escalated" else 0 for c in group])}
+        for category, group in by_category.items()], key=lambda r: r["EscalationRate"], reverse=True)
+
+    by_day = raw_groups(call_dicts, lambda c: c["CallDate"].date())
+    assert main.format_rollup_analysis("call_volume_trends", store.totals(main, "CallRollupDaily", 0)) == sorted([
+        {"Date": day.isoformat(), "CallCount": len(group), "AvgWaitTime": avg([c["WaitTime"] for c in group]),
+         "AvgDuration": avg([c["CallDuration"] for c in group])}
+        for day, group in by_day.items()], key=lambda r: r["Date"], reverse=True)
+
+
+@pytest.mark.parametrize("start, end, table, params", [
+    (datetime(2024, 3, 1), datetime(2024, 3, 8), "CallRollupDaily", [date(2024, 3, 1), date(2024, 3, 8)]),
+    (None, None, "CallRollupDaily", []),
+    (datetime(2024, 3, 1, 9, 30), datetime(2024, 3, 1, 17, 0), "CallRollupHourly",
+     [datetime(2024, 3, 1, 9), datetime(2024, 3, 1, 17)]),
+    (datetime(2024, 3, 1), datetime(2024, 3, 2, 12, 15), "CallRollupHourly",
+     [datetime(2024, 3, 1), datetime(2024, 3, 2, 13)]),
+])
+def test_rollup_source_picks_the_table_and_widens_to_buckets(main, start, end, table, params):
+    source_table, where, source_params = main.rollup_source(start, end)
+    assert (source_table, source_params) == (table, params)
+    assert where == ("BucketStart >= %s AND BucketStart < %s" if params else "1=1")
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def routing(main, monkeypatch):
+    # One MySQL replica, a second behind.
+    monkeypatch.setattr(main, "replica_sets", {"mysql": main.ReplicaSet([("replica", 3306)], lambda *host: 1.0)})
+    monkeypatch.setattr(main, "session_last_write", {})
+    session = {"id": "a"}
+    monkeypatch.setattr(main, "current_session_id", lambda: session["id"])
+
+    @main.route_reads("sqlserver_crud")
+    async def tool(operation: str = "read", merge: bool = False):
+        return main.read_replicas.get()
+
+    def call(session_id="a", **kwargs):
+        session["id"] = session_id
+        return asyncio.run(tool(**kwargs))
+
+    return call
+
+
+def test_reads_go_to_a_replica_within_the_lag_bound(main, routing):
+    assert routing(operation="read") == {"mysql": ("replica", 3306)}
+    assert routing(operation="create") == {}
+    assert main.session_last_write.keys() == {"a"}
+
+
+def test_session_reads_its_own_writes_from_the_primary(main, routing):
+    routing(operation="update")
+    assert routing(operation="read") == {"mysql": None}
+    assert routing("b", operation="read") == {"mysql": ("replica", 3306)}
+    # Once the replica's lag is shorter than the time since the write, it serves the session again.
+    main.session_last_write["a"] -= 2
+    assert routing(operation="read") == {"mysql": ("replica", 3306)}
+
+
+@pytest.mark.parametrize("kwargs, writes", [
+    ({"operation": "dedupe"}, False),
+    ({"operation": "dedupe", "merge": True}, True),
+    ({"operation": "describe"}, False),
+    ({"operation": "delete"}, True),
+])
+def test_only_writes_stamp_the_session(main, routing, kwargs, writes):
+    routing(**kwargs)
+    assert ("a" in main.session_last_write) == writes
+
+
+def test_unlisted_operations_do_not_stamp(main, monkeypatch):
+    monkeypatch.setattr(main, "session_last_write", {})
+    monkeypatch.setattr(main, "current_session_id", lambda: "a")
+
+    @main.route_reads("calllogs_crud")
+    async def tool(operation: str):
+        return main.read_replicas.get()
+
+    assert asyncio.run(tool(operation="ingest_stats")) == {}
+    assert main.session_last_write == {}
+    asyncio.run(tool(operation="ingest"))
+    assert "a" in main.session_last_write
+
+
+def test_expired_sessions_are_pruned(main, routing):
+    now = time.monotonic()
+    main.session_last_write.update({"old": now - main.REPLICA_MAX_LAG_SECONDS - 1, "recent": now})
+    routing("a", operation="create")
+    assert list(main.session_last_write) == ["recent", "a"]
+    routing("recent", operation="create")
+    assert list(main.session_last_write) == ["a", "recent"]
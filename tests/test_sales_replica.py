@@ -0,0 +1,110 @@
+import asyncio
+import csv
+from datetime import datetime
+
+import pytest
+
+
+class FakeReplica:
+    # The PG sales database: the sales table, the replication marks and the COPY staging table.
+    def __init__(self):
+        self.sales = {}
+        self.state = None
+        self.staging = []
+        self.commits = 0
+
+    def connection(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.rows = []
+        if sql.startswith("SELECT last_sale_id, last_change_id"):
+            self.rows = [tuple(self.state)] if self.state else []
+        elif sql == "TRUNCATE sales":
+            self.sales.clear()
+        elif sql.startswith("INSERT INTO sales_replication_state"):
+            self.state = [0, params[0]]
+        elif sql.startswith("INSERT INTO sales ("):
+            self.sales.update((int(row[0]), row) for row in self.staging)
+            self.staging = []
+        elif sql.startswith("UPDATE sales_replication_state SET last_sale_id"):
+            self.state[0] = params[0]
+        elif sql.startswith("UPDATE sales_replication_state SET last_change_id"):
+            self.state[1] = params[0]
+        elif sql.startswith("DELETE FROM sales WHERE id = ANY"):
+            for sale_id in params[0]:
+                self.sales.pop(sale_id, None)
+
+    def copy_expert(self, sql, buffer):
+        self.staging.extend(csv.reader(buffer))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def source(main, fake_mysql, monkeypatch):
+    # MySQL Sales and SalesChangeLog, answered from in-memory state.
+    fake_mysql.tables.update({"Sales", "SalesChangeLog"})
+    sales = {i: (i, 1, 10, 1, 2.5, 2.5, datetime(2024, 1, i)) for i in range(1, 6)}
+    changes = [(1, 2)]  # logged before the first sync
+    fake_mysql.on(r"^SELECT COALESCE\(MAX\(ChangeId\), 0\) FROM SalesChangeLog", lambda sql, params: [
+        (max((c for c, _ in changes), default=0),)])
+    fake_mysql.on(r"FROM Sales WHERE Id > %s ORDER BY Id LIMIT %s", lambda sql, params: [
+        sales[i] for i in sorted(sales) if i > params[0]][:params[1]])
+    fake_mysql.on(r"^SELECT ChangeId, SaleId FROM SalesChangeLog", lambda sql, params: [
+        c for c in changes if c[0] > params[0]][:params[1]])
+    fake_mysql.on(r"FROM Sales WHERE Id IN", lambda sql, params: [sales[i] for i in params if i in sales])
+    replica = FakeReplica()
+    monkeypatch.setattr(main, "get_pg_sales_conn", replica.connection)
+    return sales, changes, replica
+
+
+def test_first_sync_copies_by_high_water_mark(main, fake_mysql, source):
+    sales, changes, replica = source
+    stats = main.sync_sales_replica(batch_size=2)
+    assert stats == {"copied": 5, "changed": 0, "deleted": 0, "last_sale_id": 5, "last_change_id": 1}
+    assert sorted(replica.sales) == [1, 2, 3, 4, 5] and replica.state == [5, 1]
+    assert [params for _, params in fake_mysql.executed(r"WHERE Id > %s")] == [(0, 2), (2, 2), (4, 2), (5, 2)]
+    # The first run marks the changes logged before the copy as applied.
+    assert not fake_mysql.executed(r"WHERE Id IN")
+
+
+def test_incremental_sync_replays_the_changelog(main, fake_mysql, source):
+    sales, changes, replica = source
+    main.sync_sales_replica(batch_size=2)
+    sales[6] = (6, 1, 11, 1, 4.0, 4.0, datetime(2024, 1, 6))
+    sales[2] = (2, 1, 10, 3, 2.5, 7.5, datetime(2024, 1, 2))
+    del sales[3]
+    changes.extend([(2, 2), (3, 3), (4, 2)])
+
+    stats = main.sync_sales_replica(batch_size=2)
+    # Sale 2's two changes fall in different changelog batches, so it is re-read twice.
+    assert stats == {"copied": 1, "changed": 2, "deleted": 1, "last_sale_id": 6, "last_change_id": 4}
+    assert sorted(replica.sales) == [1, 2, 4, 5, 6]
+    assert replica.sales[2][3:6] == ["3", "2.5", "7.5"]
+    assert replica.state == [6, 4]
+    # Nothing new: no rows copied and the marks stay put.
+    assert main.sync_sales_replica(batch_size=2)["copied"] == 0 and replica.state == [6, 4]
+
+
+def test_sales_crud_does_not_start_the_replicator(main, monkeypatch):
+    started = []
+    monkeypatch.setattr(main.sales_replicator, "ensure_started", lambda: started.append(True))
+    tool = getattr(main.sales_crud, "fn", main.sales_crud)
+    response = asyncio.run(tool(operation="aggregate", group_by="weekday"))
+    assert response["result"].startswith("❌ 'group_by' must be one of")
+    assert started == []
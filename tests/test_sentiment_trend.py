@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+
+class RollupCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def execute(self, sql, params):
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+
+def series(result, agent):
+    return [(p["Date"], p["RollingSentiment"], p["RollingResolutionRate"], p["RollingCalls"])
+            for r in result if r["AgentName"] == agent for p in r["Series"]]
+
+
+def test_steps_stay_fixed_across_days_without_calls(main):
+    # (AgentName, BucketStart, SumSentiment, SentimentCount, ResolvedCalls, CallCount) per day.
+    cur = RollupCursor([
+        ("Ann", date(2024, 1, 1), 1.0, 2, 1, 2),
+        ("Ann", date(2024, 1, 5), 0.5, 1, 1, 1),
+        ("Bob", date(2023, 12, 31), -0.5, 1, 0, 1),  # before the range, inside the first window
+    ])
+    _, result = main.sentiment_trend(cur, datetime(2024, 1, 1), datetime(2024, 1, 10), 3, 2)
+    # The scan reaches window_days - 1 days before the start; the end date is exclusive.
+    assert cur.params == [date(2023, 12, 30), date(2024, 1, 10)]
+    assert [r["AgentName"] for r in result] == ["Ann", "Bob"]
+    assert series(result, "Ann") == [
+        ("2024-01-01", 0.5, 50.0, 2),
+        ("2024-01-03", 0.5, 50.0, 2),
+        ("2024-01-05", 0.5, 100.0, 1),
+        ("2024-01-07", 0.5, 100.0, 1),
+        ("2024-01-09", None, None, 0),
+    ]
+    assert [p[0] for p in series(result, "Bob")] == [p[0] for p in series(result, "Ann")]
+    assert series(result, "Bob")[:2] == [("2024-01-01", -0.5, 0.0, 1), ("2024-01-03", None, None, 0)]
+
+
+def test_end_inside_a_day_includes_that_day(main):
+    cur = RollupCursor([("Ann", date(2024, 1, 3), 0.9, 1, 1, 1)])
+    _, result = main.sentiment_trend(cur, datetime(2024, 1, 1), datetime(2024, 1, 3, 12), 1, 1)
+    assert cur.params == [date(2024, 1, 1), date(2024, 1, 4)]
+    assert [p[0] for p in series(result, "Ann")] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert series(result, "Ann")[-1] == ("2024-01-03", 0.9, 100.0, 1)
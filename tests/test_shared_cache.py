@@ -0,0 +1,117 @@
+import queue
+import sys
+import threading
+import time
+import types
+
+
+def fake_redis_module():
+    # Just enough of redis-py for SharedCache, with every client talking to one in-memory server.
+    store, hashes, subscribers = {}, {}, []
+    lock = threading.Lock()
+
+    class Pipeline:
+        def __init__(self, client):
+            self.client = client
+            self.calls = []
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+        def execute(self):
+            return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+    class PubSub:
+        def __init__(self):
+            self.messages = queue.Queue()
+
+        def subscribe(self, channel):
+            with lock:
+                subscribers.append(self)
+
+        def listen(self):
+            while True:
+                yield self.messages.get()
+
+    class Redis:
+        @classmethod
+        def from_url(cls, url, **kwargs):
+            return cls()
+
+        def ping(self):
+            return True
+
+        def pipeline(self, transaction=True):
+            return Pipeline(self)
+
+        def get(self, key):
+            return store.get(key)
+
+        def set(self, key, value, ex=None):
+            store[key] = value
+
+        def hmget(self, key, fields):
+            return [hashes.get(key, {}).get(f) for f in fields]
+
+        def hincrby(self, key, field, amount):
+            with lock:
+                fields = hashes.setdefault(key, {})
+                fields[field] = fields.get(field, 0) + amount
+                return fields[field]
+
+        def publish(self, channel, data):
+            with lock:
+                for subscriber in subscribers:
+                    subscriber.messages.put({"data": data})
+
+        def pubsub(self, ignore_subscribe_messages=False):
+            return PubSub()
+
+    module = types.ModuleType("redis")
+    module.Redis = Redis
+    module.subscribers = subscribers
+    return module
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_invalidation_round_trip(main, monkeypatch):
+    redis = fake_redis_module()
+    monkeypatch.setitem(sys.modules, "redis", redis)
+    local = main.SharedCache("redis://cache", 60)
+    other = main.SharedCache("redis://cache", 60)  # another server process
+    monkeypatch.setattr(main, "shared_cache", local)
+    key, tables = "sales_crud:read", ("Sales",)
+
+    value, generations = other.lookup(key, tables)
+    assert value is None and generations == [0]
+    other.put(key, {"rows": [1]}, generations)
+    assert local.lookup(key, tables)[0] == {"rows": [1]}
+    # Both listeners clear the local cache when they subscribe.
+    wait_for(lambda: len(redis.subscribers) == 2)
+
+    main.result_cache.put(key, {"rows": [1]}, tables, main.result_cache.snapshot(tables))
+    assert main.result_cache.get(key, tables) == {"rows": [1]}
+    other.publish(tables)
+    wait_for(lambda: main.result_cache.get(key, tables) is None)
+    assert local.counters["remote_invalidations"] == 1
+    assert other.counters["remote_invalidations"] == 0
+    # The shared entry was stored under the old generation, so it no longer counts.
+    assert local.lookup(key, tables) == (None, [1])
+    main.result_cache.clear()
+
+
+def test_local_write_publishes_without_blocking(main, monkeypatch):
+    redis = fake_redis_module()
+    monkeypatch.setitem(sys.modules, "redis", redis)
+    local = main.SharedCache("redis://cache", 60)
+    monkeypatch.setattr(main, "shared_cache", local)
+
+    main.result_cache.invalidate(("Customers",))
+    wait_for(lambda: local.counters["published"] == 1)
+    assert redis.Redis().hmget(local.GENERATIONS_KEY, ["Customers"]) == [1]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def cache(main, monkeypatch):
+    monkeypatch.setattr(main, "result_cache", main.ResultCache(1 << 20, 60))
+    monkeypatch.setattr(main, "single_flight", main.SingleFlight())
+    return main.result_cache
+
+
+def slow_tool(main, outcome):
+    # A cached sales_crud read that blocks until released, counting executions.
+    state = {"calls": 0, "release": None}
+
+    @main.cached_tool("sales_crud")
+    async def tool(operation="read", customer_id=None):
+        state["calls"] += 1
+        await state["release"].wait()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"sql": "SELECT ...", "result": outcome}
+
+    return tool, state
+
+
+def test_concurrent_misses_share_one_execution(main, cache):
+    tool, state = slow_tool(main, [{"Id": 1}])
+
+    async def scenario():
+        state["release"] = asyncio.Event()
+        calls = [asyncio.ensure_future(tool(operation="read", customer_id=1)) for _ in range(3)]
+        other = asyncio.ensure_future(tool(operation="read", customer_id=2))
+        await asyncio.sleep(0)
+        assert main.single_flight.stats()["in_flight"] == 2
+        state["release"].set()
+        return await asyncio.gather(*calls), await other
+
+    same, other = asyncio.run(scenario())
+    assert same == [{"sql": "SELECT ...", "result": [{"Id": 1}]}] * 3
+    assert state["calls"] == 2  # one per distinct key
+    stats = main.single_flight.stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (2, 2, 0)
+    assert stats["coalesced_by_tool"] == {"sales_crud": 2}
+    assert cache.stats()["entries"] == 2
+
+
+def test_error_reaches_every_waiter_and_is_not_cached(main, cache):
+    tool, state = slow_tool(main, RuntimeError("connection reset"))
+
+    async def scenario():
+        state["release"] = asyncio.Event()
+        calls = [asyncio.ensure_future(tool(operation="read", customer_id=1)) for _ in range(3)]
+        await asyncio.sleep(0)
+        state["release"].set()
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["connection reset"] * 3
+    assert state["calls"] == 1
+    assert main.single_flight.stats()["failed"] == 1
+    assert main.single_flight.flights == {} and cache.stats()["entries"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_flight(main, cache):
+    tool, state = slow_tool(main, [{"Id": 1}])
+
+    async def scenario():
+        state["release"] = asyncio.Event()
+        first = asyncio.ensure_future(tool(operation="read", customer_id=1))
+        second = asyncio.ensure_future(tool(operation="read", customer_id=1))
+        await asyncio.sleep(0)
+        first.cancel()
+        state["release"].set()
+        return await second
+
+    assert asyncio.run(scenario())["result"] == [{"Id": 1}]
+    assert state["calls"] == 1
+
+
+def test_cached_lookup_caches_only_found_names(main, cache):
+    calls = []
+
+    @main.cached_lookup("customer", ("Customers",))
+    def find(name):
+        calls.append(name)
+        return {"found": name != "nobody", "id": 7}
+
+    assert find("Ann ") == {"found": True, "id": 7}
+    found = find("ann")
+    found["id"] = 8  # callers get a copy
+    assert find("ANN") == {"found": True, "id": 7}
+    find("nobody")
+    find("nobody")
+    assert calls == ["Ann ", "nobody", "nobody"]
+    cache.invalidate(("Customers",), publish=False)
+    find("ann")
+    assert calls[-1] == "ann"
@@ -0,0 +1,58 @@
+import random
+
+
+def test_tdigest_quantiles_within_one_percent_rank(main):
+    rng = random.Random(7)
+    values = [rng.expovariate(1 / 300) for _ in range(20000)]
+    digest = main.TDigest()
+    for value in values:
+        digest.add(value)
+    ordered = sorted(values)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        estimate = digest.quantile(q)
+        rank = sum(v <= estimate for v in ordered) / len(ordered)
+        assert abs(rank - q) < 0.01, (q, rank)
+    assert len(digest.centroids) < len(values) // 20
+
+
+def test_tdigest_merge_matches_single_digest(main):
+    rng = random.Random(11)
+    days = [[rng.gauss(600, 120) for _ in range(500)] for _ in range(30)]
+    merged = main.TDigest()
+    for day in days:
+        digest = main.TDigest()
+        for value in day:
+            digest.add(value)
+        merged.merge(main.TDigest.from_bytes(digest.to_bytes()))
+    everything = sorted(v for day in days for v in day)
+    assert merged.count == len(everything)
+    for q in (0.1, 0.5, 0.95):
+        estimate = merged.quantile(q)
+        rank = sum(v <= estimate for v in everything) / len(everything)
+        assert abs(rank - q) < 0.01, (q, rank)
+
+
+def test_tdigest_empty_and_single_value(main):
+    assert main.TDigest().quantile(0.5) is None
+    digest = main.TDigest()
+    digest.add(42)
+    assert digest.quantile(0.99) == 42
+
+
+def test_hyperloglog_cardinality_error(main):
+    # p=10 gives a standard error of about 1.04 / sqrt(1024) = 3.25%.
+    for n in (50, 1000, 20000):
+        hll = main.HyperLogLog()
+        for i in range(n):
+            hll.add(f"customer-{i}")
+        assert abs(hll.cardinality() - n) / n < 0.1, n
+
+
+def test_hyperloglog_merge_is_union(main):
+    a, b = main.HyperLogLog(), main.HyperLogLog()
+    for i in range(3000):
+        a.add(i)
+    for i in range(2000, 5000):
+        b.add(i)
+    a.merge(main.HyperLogLog(registers=b.to_bytes()))
+    assert abs(a.cardinality() - 5000) / 5000 < 0.1
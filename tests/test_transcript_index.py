@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+CALLS = [
+    (1, datetime(2024, 3, 1, 9), "Customer asked for a refund. Refund approved after the refund policy review."),
+    (2, datetime(2024, 3, 2, 9), "Agent explained the refund policy and the billing cycle."),
+    (3, datetime(2024, 3, 3, 9), "Password reset completed; customer could log in again."),
+    (4, datetime(2024, 3, 4, 9), "Policy on refunds was unclear, so the customer asked for a callback."),
+]
+
+
+@pytest.fixture
+def index(main, tmp_path):
+    index = main.TranscriptIndex(str(tmp_path / "transcripts.bin"))
+    for log_id, call_date, transcript in CALLS:
+        index.add_document(log_id, call_date, transcript)
+    return index
+
+
+def ids(hits):
+    return [doc_id for doc_id, _ in hits]
+
+
+def test_bm25_ranks_by_term_frequency(index):
+    hits = index.search("refund", 10)
+    assert ids(hits) == [1, 2]
+    assert hits[0][1] > hits[1][1]
+    assert index.search("password", 10)[0][0] == 3
+    assert index.search("nothing matches", 10) == []
+
+
+def test_phrase_requires_adjacent_terms(index):
+    assert sorted(ids(index.search('"refund policy"', 10))) == [1, 2]
+    assert ids(index.search('"policy refund"', 10)) == []
+    assert ids(index.search('"billing cycle" refund', 10)) == [2]
+
+
+def test_date_window_filters_hits(index):
+    hits = index.search("refund", 10, start=datetime(2024, 3, 2), end=datetime(2024, 3, 3))
+    assert ids(hits) == [2]
+
+
+def test_saved_index_matches_in_memory_and_takes_new_calls(main, index):
+    before = index.search("refund policy", 10)
+    index.save()
+    reopened = main.TranscriptIndex(index.path)
+    after = reopened.search("refund policy", 10)
+    assert ids(after) == ids(before)
+    assert [score for _, score in after] == pytest.approx([score for _, score in before])
+    assert reopened.last_log_id == 4
+    reopened.add_document(5, datetime(2024, 3, 5, 9), "Second refund refund refund request this month.")
+    assert ids(reopened.search("refund", 1)) == [5]
+    assert reopened.stats()["unsaved_documents"] == 1
+    reopened.save()
+    assert reopened.stats()["documents"] == 5
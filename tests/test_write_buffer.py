@@ -0,0 +1,102 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+
+def rows(main, n):
+    return [main.normalize_call_log({
+        "call_date": datetime(2024, 5, 6, 10, i), "customer_id": 7, "agent_name": "Sarah Chen",
+        "issue_category": "Billing", "resolution_status": "resolved", "sentiment_score": 0.4,
+        "call_duration": 300, "wait_time": 20, "call_transcript": "Refund issued.", "ingest_key": f"call-{i}",
+    }) for i in range(n)]
+
+
+def key(main, row):
+    return row[main.CALLLOG_INSERT_COLUMNS.index("IngestKey")]
+
+
+@pytest.fixture
+def spool(main, tmp_path):
+    return main.CallLogSpool(str(tmp_path / "spool.db"))
+
+
+@pytest.fixture
+def writes(main, monkeypatch):
+    # Stands in for write_call_log_batch: records each batch's keys and fails like MySQL would.
+    state = {"batches": [], "poisoned": set(), "down": False}
+
+    def write(batch):
+        keys = [key(main, row) for row in batch]
+        state["batches"].append(keys)
+        if state["down"]:
+            raise main.mysql.connector.errors.InterfaceError("2003: Can't connect to MySQL server")
+        if state["poisoned"] & set(keys):
+            raise main.mysql.connector.errors.DatabaseError("1366: Incorrect integer value")
+        return {"inserted": len(batch), "duplicates": 0, "unknown_customers": 0}
+
+    monkeypatch.setattr(main, "write_call_log_batch", write)
+    return state
+
+
+def buffer(main, spool):
+    return main.CallLogWriteBuffer(batch_size=8, flush_seconds=0.01, max_queued=100, spool=spool, replay_seconds=0.01)
+
+
+def test_spool_round_trip(main, spool):
+    assert spool.depth() == 0
+    batch = rows(main, 3)
+    spool.append(batch)
+    spool.append(batch[:1])  # already spooled under its IngestKey
+    assert spool.depth() == 3
+    assert spool.peek(2) == batch[:2]
+    spool.remove(batch[:2])
+    assert spool.peek(10) == batch[2:]
+
+
+def test_poisoned_row_is_isolated_by_halving(main, spool, writes):
+    batch = rows(main, 8)
+    spool.append(batch)
+    writes["poisoned"] = {"call-5"}
+
+    stats = buffer(main, spool)._write_isolating(batch)
+    assert (stats["inserted"], stats["quarantined"]) == (7, 1)
+    assert [len(b) for b in writes["batches"]] == [8, 4, 4, 2, 1, 1, 2]
+    assert spool.quarantine_depth() == 1
+    quarantined = spool._connect().execute("SELECT ingest_key, error FROM quarantine").fetchall()
+    assert quarantined == [("call-5", "1366: Incorrect integer value")]
+    # The quarantined row also leaves the spool, so a replay does not retry it forever.
+    assert "call-5" not in [key(main, row) for row in spool.peek(10)]
+
+
+def test_connectivity_error_is_not_split(main, spool, writes):
+    writes["down"] = True
+    with pytest.raises(main.mysql.connector.errors.InterfaceError):
+        buffer(main, spool)._write_isolating(rows(main, 4))
+    assert len(writes["batches"]) == 1
+    assert spool.quarantine_depth() == 0
+
+
+def test_outage_spools_and_replay_drains(main, spool, writes):
+    async def scenario():
+        buf = buffer(main, spool)
+        batch = rows(main, 5)
+        writes["down"] = True
+        await buf._flush([(row, time.monotonic()) for row in batch])
+        assert not buf.db_available and spool.depth() == 5
+
+        writes["down"] = False
+        buf.ensure_started()
+        buf.replay_wakeup.set()
+        deadline = time.monotonic() + 2
+        while spool.depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        buf.task.cancel()
+        buf.replay_task.cancel()
+        return buf.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["spool_depth"] == 0 and stats["db_available"]
+    assert stats["spooled_rows"] == 5 and stats["replayed_rows"] == 5
+    assert writes["batches"][-1] == [f"call-{i}" for i in range(5)]